@@ -0,0 +1,37 @@
+import os
+from sqlalchemy import event
+
+# Ajustes del motor de base de datos para servir con varios procesos e hilos.
+# En SQLite cada conexión nueva se configura con:
+#   - journal_mode=WAL: los lectores no bloquean al que escribe ni al revés (queda guardado en el archivo)
+#   - busy_timeout: espera el bloqueo de escritura en lugar de fallar con "database is locked"
+#   - synchronous=NORMAL: con WAL es seguro ante cortes del proceso y evita un fsync por commit
+# Además, al hacer fork (gunicorn con preload) el proceso hijo descarta las conexiones heredadas.
+
+
+def _es_memoria(motor) -> bool:
+    return motor.url.database in (None, '', ':memory:')
+
+
+def configurar_motor(app, db) -> None:
+    with app.app_context():
+        motor = db.engine
+
+    if motor.name == 'sqlite':
+        wal = app.config.get('SQLITE_WAL', True) and not _es_memoria(motor)
+        busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+        synchronous = str(app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL')).upper()
+        if synchronous not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f'SQLITE_SYNCHRONOUS inválido: {synchronous}')
+
+        @event.listens_for(motor, 'connect')
+        def _pragmas(conexion, registro):
+            cursor = conexion.cursor()
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.close()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: motor.dispose(close=False))
@@ -0,0 +1,184 @@
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models.models import db
+from migraciones import migrar, version_actual
+from services.saldos import recalcular_saldos
+from services.resumenes import reconstruir_resumenes
+from services.busqueda import reconstruir_busqueda
+from services.inventario import reconstruir_inventario
+from services.importacion import importar, IMPORTABLES
+from services.cierres import auditar_cierres, cerrar_dia, cerrar_dias, cerrar_pendientes
+from tareas import crear_programador
+
+# Comandos de mantenimiento (`flask --app app <comando>`). Se registran en create_app.
+
+
+# Crea las tablas que falten y aplica las migraciones pendientes (ver migraciones.py).
+# Es el único paso que toca el esquema: la aplicación no lo hace al iniciar.
+@click.command('migrar', help='Crea las tablas y aplica las migraciones pendientes.')
+@with_appcontext
+def migrar_command():
+    aplicadas = migrar()
+    if aplicadas:
+        click.echo(f"Migraciones aplicadas: {', '.join(map(str, aplicadas))}.")
+    if db.engine.name == 'sqlite':
+        click.echo(f'Esquema al día (versión {version_actual(db.engine)}).')
+    else:
+        click.echo('Esquema al día.')
+
+
+# Reconstruye los saldos materializados de las recetas a partir de sus pagos
+@click.command('recalcular-saldos', help='Recalcula los saldos de las recetas desde los pagos.')
+@with_appcontext
+@click.option('--verificar', is_flag=True, help='Solo informar diferencias, sin corregirlas.')
+def recalcular_saldos_command(verificar):
+    inconsistentes = recalcular_saldos(corregir=not verificar)
+    if not inconsistentes:
+        click.echo('Saldos de recetas consistentes con los pagos.')
+        return
+    click.echo(f"{len(inconsistentes)} recetas con saldos desactualizados: {', '.join(map(str, inconsistentes[:20]))}"
+               f"{' ...' if len(inconsistentes) > 20 else ''}")
+    if verificar:
+        raise SystemExit(1)
+    click.echo('Saldos recalculados.')
+
+
+# Reconstruye el resumen diario de caja (rollup por día y método de pago) desde Pago y Gasto
+@click.command('reconstruir-resumenes', help='Reconstruye el resumen diario de caja.')
+@with_appcontext
+def reconstruir_resumenes_command():
+    filas = reconstruir_resumenes()
+    click.echo(f'Resumen diario reconstruido: {filas} filas.')
+
+
+# Reconstruye los índices de búsqueda (FTS5) desde las tablas de la aplicación
+@click.command('reconstruir-busqueda', help='Reconstruye los índices de búsqueda.')
+@with_appcontext
+def reconstruir_busqueda_command():
+    with db.engine.begin() as conn:
+        if not reconstruir_busqueda(conn):
+            click.echo('FTS5 no disponible: la búsqueda usa LIKE.')
+            return
+    click.echo('Índices de búsqueda reconstruidos.')
+
+
+# Recalcula la marca de bajo stock y la valuación por categoría desde la tabla de productos
+@click.command('reconstruir-inventario', help='Recalcula bajo stock y la valuación por categoría.')
+@with_appcontext
+def reconstruir_inventario_command():
+    with db.engine.begin() as conn:
+        categorias = reconstruir_inventario(conn)
+    click.echo(f'Inventario reconstruido: {categorias} categorías.')
+
+
+# Importa productos o pacientes desde un CSV o XLSX, con upsert por código o DNI
+@click.command('importar', help='Importa productos o pacientes desde un archivo CSV o XLSX.')
+@with_appcontext
+@click.argument('entidad', type=click.Choice(IMPORTABLES))
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', type=int, help='Filas por lote, un commit por lote (por defecto IMPORTACION_LOTE).')
+@click.option('--solo-altas', is_flag=True, help='No actualizar los registros existentes (son un error).')
+@click.option('--simular', is_flag=True, help='Validar el archivo sin guardar nada.')
+def importar_command(entidad, archivo, lote, solo_altas, simular):
+    def progreso(estado):
+        click.echo(f"  {estado['filas']} filas: {estado['creados']} nuevas, {estado['actualizados']} actualizadas, "
+                   f"{estado['sin_cambios']} sin cambios, {estado['errores']} con errores ({estado['segundos']}s)")
+
+    try:
+        with open(archivo, 'rb') as contenido:
+            estado = importar(entidad, contenido, archivo, progreso=progreso,
+                              modo='insertar' if solo_altas else 'upsert', simular=simular,
+                              tamaño_lote=lote or current_app.config['IMPORTACION_LOTE'])
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    if estado['columnas_ignoradas']:
+        click.echo(f"Columnas ignoradas: {', '.join(estado['columnas_ignoradas'])}")
+    for fallida in estado['detalle_errores']:
+        detalle = '; '.join(f'{campo}: {mensaje}' for campo, mensaje in fallida['errores'].items())
+        click.echo(f"Fila {fallida['fila']}: {detalle}")
+    if estado['errores'] > len(estado['detalle_errores']):
+        click.echo(f"... y {estado['errores'] - len(estado['detalle_errores'])} filas más con errores")
+    click.echo(f"{'Simulación' if simular else 'Importación'} terminada en {estado['segundos']}s: "
+               f"{estado['creados']} nuevas, {estado['actualizados']} actualizadas, {estado['sin_cambios']} sin cambios, "
+               f"{estado['errores']} con errores.")
+    if estado['errores']:
+        raise SystemExit(1)
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        raise click.BadParameter('Use fechas AAAA-MM-DD')
+
+
+# Cierra (o concilia) la caja de un día y los días anteriores que quedaron sin cerrar; es lo mismo
+# que hace la tarea diaria (tareas.py), para programarlo con cron o correrlo a mano
+@click.command('cerrar-caja', help='Cierra la caja del día y los días anteriores pendientes.')
+@with_appcontext
+@click.option('--fecha', help='Día a cerrar (AAAA-MM-DD, por defecto hoy).')
+@click.option('--desde', help='Cerrar solo los pendientes desde este día (AAAA-MM-DD, por defecto todos).')
+@click.option('--solo-pendientes', is_flag=True, help='No cerrar el día indicado, solo los anteriores.')
+def cerrar_caja_command(fecha, desde, solo_pendientes):
+    dia = _fecha(fecha) or date.today()
+    cerrados = cerrar_pendientes(dia - timedelta(days=1), _fecha(desde))
+    click.echo(f'Días anteriores cerrados: {cerrados}.')
+    if not solo_pendientes:
+        click.echo(f'Caja del {dia.isoformat()}: {cerrar_dia(dia)}.')
+
+
+# Corre las tareas diarias (tareas.py) en primer plano hasta Ctrl+C: es el proceso designado para
+# el cierre automático cuando el servidor no las corre (TAREAS_AUTOMATICAS=0)
+@click.command('tareas', help='Corre las tareas diarias (cierre de caja y reportes) en primer plano.')
+@with_appcontext
+def tareas_command():
+    programador = crear_programador(current_app._get_current_object())
+    click.echo(f'Tareas diarias a las {programador.hora:%H:%M}, recuperando hasta '
+               f'{programador.dias_pendientes} días sin cerrar (Ctrl+C para detener).')
+    programador.correr()
+
+
+# Compara los cierres guardados con los pagos de cada día (en una pasada, sin consultas por día)
+# y con --conciliar corrige los descuadrados con los totales de sus pagos
+@click.command('auditar-cierres', help='Compara los cierres de caja con los pagos registrados.')
+@with_appcontext
+@click.option('--desde', help='Primer día a auditar (AAAA-MM-DD, por defecto el primer cierre).')
+@click.option('--hasta', help='Último día a auditar (AAAA-MM-DD, por defecto el último cierre).')
+@click.option('--conciliar', is_flag=True, help='Corregir los cierres descuadrados.')
+def auditar_cierres_command(desde, hasta, conciliar):
+    controles = auditar_cierres(_fecha(desde), _fecha(hasta))
+    descuadrados = [control for control in controles if control['descuadrado']]
+    for control in descuadrados[:50]:
+        detalle = ', '.join(f"{metodo or 'Sin especificar'} {valores['guardado']} -> {valores['calculado']}"
+                            for metodo, valores in control['diferencias'].items())
+        click.echo(f"{control['fecha'].isoformat()}: total {control['total_guardado']}, según pagos "
+                   f"{control['total_calculado']}{f' ({detalle})' if detalle else ''}")
+    if len(descuadrados) > 50:
+        click.echo(f'... y {len(descuadrados) - 50} cierres más descuadrados')
+    click.echo(f'{len(controles)} cierres auditados, {len(descuadrados)} descuadrados.')
+    if not descuadrados:
+        return
+    if not conciliar:
+        raise SystemExit(1)
+    cerrar_dias([control['fecha'] for control in descuadrados], desde_pagos=True)
+    click.echo('Cierres conciliados.')
+
+
+COMANDOS = [
+    migrar_command,
+    recalcular_saldos_command,
+    reconstruir_resumenes_command,
+    reconstruir_busqueda_command,
+    reconstruir_inventario_command,
+    importar_command,
+    cerrar_caja_command,
+    tareas_command,
+    auditar_cierres_command,
+]
+
+
+def registrar(app) -> None:
+    for comando in COMANDOS:
+        app.cli.add_command(comando)
@@ -1,9 +1,62 @@
 import os
 
 
+# Opciones del motor para la base configurada. SQLite en archivo y los motores con servidor usan un
+# pool de conexiones dimensionado; SQLite en memoria conserva el pool de una conexión de SQLAlchemy.
+def engine_options(uri: str) -> dict:
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        return {}
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True,
+    }
+    if uri.startswith('sqlite'):
+        # Esperar el bloqueo de escritura en lugar de fallar enseguida con "database is locked"
+        options['connect_args'] = {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')) / 1000}
+    return options
+
+
 class Config:
     # Database URL from environment (supports sqlite/mysql/postgres). Fallback to local sqlite file.
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///optica.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Pragmas de cada conexión SQLite (ver base_datos.py): WAL deja leer mientras la caja escribe,
+    # busy_timeout espera el bloqueo de escritura y synchronous=NORMAL es seguro con WAL y mucho más rápido.
+    SQLITE_WAL = os.getenv('SQLITE_WAL', '1') == '1'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    # Servidor de producción (serve.py): procesos (workers) e hilos por proceso
+    SERVIDOR_HOST = os.getenv('WEB_HOST', '127.0.0.1')
+    SERVIDOR_PUERTO = int(os.getenv('WEB_PORT', '5000'))
+    SERVIDOR_WORKERS = int(os.getenv('WEB_WORKERS', '2'))
+    SERVIDOR_HILOS = int(os.getenv('WEB_THREADS', '8'))
     # Do NOT hardcode secrets in source. Provide via env var, fallback to a dev-safe default.
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-change-me')
\ No newline at end of file
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-change-me')
+    # Medición de rendimiento por request, opcional (ver rendimiento.py): cabecera Server-Timing, una
+    # línea de log JSON por request y la página /_debug/perf. Las sentencias lentas son las que superan el umbral.
+    PERF_INSTRUMENTACION = os.getenv('PERF_INSTRUMENTACION', '0') == '1'
+    PERF_UMBRAL_LENTO_MS = float(os.getenv('PERF_UMBRAL_LENTO_MS', '100'))
+    PERF_MAX_SENTENCIAS = int(os.getenv('PERF_MAX_SENTENCIAS', '5'))
+    # Cache de los datos calculados de los reportes (KPIs y gráfico del dashboard, comisiones, resumen
+    # del mes), ver services/cache.py. Las escrituras invalidan las entradas de su período; las que
+    # incluyen el día de hoy además vencen a los CACHE_TTL segundos.
+    CACHE_REPORTES = os.getenv('CACHE_REPORTES', '1') == '1'
+    CACHE_MAX_ENTRADAS = int(os.getenv('CACHE_MAX_ENTRADAS', '256'))
+    CACHE_TTL = float(os.getenv('CACHE_TTL', '300'))
+    # Importación de archivos (services/importacion.py): filas por lote (un commit cada uno) y tamaño
+    # máximo de los archivos subidos
+    IMPORTACION_LOTE = int(os.getenv('IMPORTACION_LOTE', '1000'))
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+    # Tareas diarias (tareas.py): a CIERRE_AUTOMATICO_HORA (HH:MM) cierra o concilia la caja del día,
+    # cierra los días anteriores que quedaron abiertos y precalcula los reportes del día siguiente.
+    # Apagadas por defecto. Corren en un solo proceso: `flask tareas`, o `python serve.py` con
+    # TAREAS_AUTOMATICAS=1 (proceso principal de gunicorn o el de waitress), nunca en cada worker.
+    # Al arrancar y en cada cierre se recuperan como mucho los últimos CIERRE_PENDIENTES_DIAS días
+    # sin cerrar (0: ninguno); los anteriores se cierran a mano con `flask cerrar-caja --desde`.
+    TAREAS_AUTOMATICAS = os.getenv('TAREAS_AUTOMATICAS', '0') == '1'
+    CIERRE_AUTOMATICO_HORA = os.getenv('CIERRE_AUTOMATICO_HORA', '23:30')
+    CIERRE_PENDIENTES_DIAS = int(os.getenv('CIERRE_PENDIENTES_DIAS', '7'))
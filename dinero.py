@@ -0,0 +1,123 @@
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Integer, cast, func, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+# Montos de dinero en punto fijo. En la base se guardan como enteros de centavos (tipo Dinero)
+# y en Python se leen como Decimal con dos decimales: las sumas son exactas, en SQL y en Python.
+# Política de redondeo única: cada monto derivado (neto de un pago, total con descuento,
+# comisión) se redondea una sola vez al centavo, la mitad hacia arriba. Los totales son sumas
+# de esos montos ya redondeados, así el resumen diario, los cierres y los reportes coinciden.
+# Los porcentajes (descuento, comisión) siguen siendo float y se aplican en puntos básicos enteros.
+
+CENTAVO = Decimal('0.01')
+CERO = Decimal('0.00')
+
+
+# Monto como Decimal redondeado al centavo. Acepta int, float, Decimal o texto ('1250.5')
+def redondear(valor) -> Decimal:
+    if isinstance(valor, float):
+        valor = repr(valor)
+    try:
+        return Decimal(valor).quantize(CENTAVO, ROUND_HALF_UP)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f'Monto inválido: {valor}') from None
+
+
+def a_centavos(valor) -> int:
+    return int(redondear(valor).scaleb(2))
+
+
+def desde_centavos(centavos) -> Decimal:
+    return Decimal(int(centavos)).scaleb(-2)
+
+
+class Dinero(TypeDecorator):
+    impl = Integer
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return Decimal
+
+    def process_bind_param(self, valor, dialect):
+        return None if valor is None else a_centavos(valor)
+
+    def process_literal_param(self, valor, dialect):
+        return 'NULL' if valor is None else str(a_centavos(valor))
+
+    def process_result_value(self, valor, dialect):
+        if valor is None:
+            return None
+        # Las bases migradas conservan la afinidad REAL: el entero llega como float (1250.0)
+        if isinstance(valor, float):
+            valor = round(valor)
+        return desde_centavos(valor)
+
+
+# ---------- Porcentajes ----------
+
+# Porcentaje en puntos básicos enteros (12,5 % -> 1250), con el mismo redondeo que ROUND() en SQL
+def _puntos(pct) -> int:
+    return math.floor(float(pct or 0) * 100 + 0.5)
+
+
+def _proporcion(centavos: int, puntos: int) -> int:
+    signo = -1 if centavos < 0 else 1
+    return signo * ((abs(centavos) * puntos + 5000) // 10000)
+
+
+# Monto con el descuento (%) aplicado, redondeado al centavo
+def neto(monto, descuento) -> Decimal:
+    return desde_centavos(_proporcion(a_centavos(monto or 0), 10000 - _puntos(descuento)))
+
+
+# Porcentaje de un monto (comisión), redondeado al centavo
+def porcentaje(monto, pct) -> Decimal:
+    return desde_centavos(_proporcion(a_centavos(monto or 0), _puntos(pct)))
+
+
+# Total antes de un descuento (%) ya aplicado en el primer pago (0 < descuento < 100)
+def sin_descuento(monto, descuento):
+    restante = 10000 - _puntos(descuento)
+    if monto is None or not 0 < restante < 10000:
+        return monto
+    return redondear(Decimal(a_centavos(monto)) * 100 / restante)
+
+
+# Brutos, netos y descuentos sumados de un lote de pagos, `pagos` son pares (monto, descuento %).
+# El neto de cada pago se redondea antes de sumar, igual que `neto_sql` y el resumen diario.
+def sumar_netos(pagos) -> tuple:
+    brutos = netos = 0
+    for monto, descuento in pagos:
+        centavos = a_centavos(monto or 0)
+        brutos += centavos
+        netos += _proporcion(centavos, 10000 - _puntos(descuento))
+    return desde_centavos(brutos), desde_centavos(netos), desde_centavos(brutos - netos)
+
+
+# ---------- SQL ----------
+
+# Neto de un pago calculado en SQL con la misma política que `neto`: aritmética entera sobre
+# los centavos (los montos nunca son negativos), para sumar con SUM() sin pasar por float
+def neto_sql(monto, descuento):
+    centavos = type_coerce(monto, Integer)
+    puntos = cast(func.round(func.coalesce(descuento, 0) * 100), Integer)
+    return type_coerce((centavos * (10000 - puntos) + 5000) // 10000, Dinero)
+
+
+# Suma de montos en SQL (0 si no hay filas), leída como Decimal
+def suma(expresion):
+    return type_coerce(func.coalesce(func.sum(type_coerce(expresion, Integer)), 0), Dinero)
+
+
+# ---------- JSON ----------
+
+# Los montos (Decimal) salen en JSON como número, no como texto
+class ProveedorJSON(DefaultJSONProvider):
+    @staticmethod
+    def default(valor):
+        if isinstance(valor, Decimal):
+            return float(valor)
+        return DefaultJSONProvider.default(valor)
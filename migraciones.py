@@ -0,0 +1,229 @@
+import logging
+from sqlalchemy import Integer, inspect, text
+from sqlalchemy.schema import CreateTable
+from models.models import db
+
+logger = logging.getLogger(__name__)
+
+
+# Migraciones versionadas para bases SQLite existentes. db.create_all() crea las tablas nuevas,
+# pero no agrega columnas ni índices a tablas que ya existen: de eso se encargan estas migraciones.
+# La versión aplicada se guarda en `PRAGMA user_version`. Cada migración recibe la conexión
+# (dentro de una transacción) y puede devolver una función a ejecutar después del commit,
+# por ejemplo para reconstruir datos derivados con la sesión de la aplicación.
+
+def _columnas(conn, tabla: str) -> set:
+    if not inspect(conn).has_table(tabla):
+        return set()
+    return {columna['name'] for columna in inspect(conn).get_columns(tabla)}
+
+
+def _agregar_columna(conn, tabla: str, columna: str, ddl: str) -> bool:
+    columnas = _columnas(conn, tabla)
+    if columnas and columna not in columnas:
+        conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {ddl}"))
+        return True
+    return False
+
+
+# 1: columnas agregadas antes de existir el versionado
+def _columnas_iniciales(conn):
+    _agregar_columna(conn, 'pago', 'descuento', 'REAL DEFAULT 0')
+    _agregar_columna(conn, 'receta', 'armazon_id', 'INTEGER')
+    _agregar_columna(conn, 'cierre_caja', 'estado_abierta', 'BOOLEAN DEFAULT 1')
+
+
+# 2: saldos materializados en receta, reconstruidos desde los pagos
+def _saldos_de_recetas(conn):
+    if not _agregar_columna(conn, 'receta', 'saldo', 'REAL DEFAULT 0'):
+        return None
+    _agregar_columna(conn, 'receta', 'total_pagado', 'REAL DEFAULT 0')
+    _agregar_columna(conn, 'receta', 'descuento_aplicado', 'REAL DEFAULT 0')
+    _agregar_columna(conn, 'receta', 'fecha_ultimo_pago', 'DATE')
+    _agregar_columna(conn, 'receta', 'fecha_orden', 'DATE')
+    from services.saldos import recalcular_saldos
+    return recalcular_saldos
+
+
+# 3: resumen diario de caja (la tabla la crea create_all), construido desde el historial
+def _resumen_diario(conn):
+    vacio = conn.execute(text("SELECT 1 FROM resumen_diario LIMIT 1")).first() is None
+    con_datos = (
+        conn.execute(text("SELECT 1 FROM pago LIMIT 1")).first() is not None
+        or conn.execute(text("SELECT 1 FROM gasto LIMIT 1")).first() is not None
+    )
+    if vacio and con_datos:
+        from services.resumenes import reconstruir_resumenes
+        return reconstruir_resumenes
+    return None
+
+
+# Crea los índices declarados en los modelos que falten. Si un índice único no se puede crear
+# porque ya hay valores repetidos, se crea sin UNIQUE y se avisa en el log para depurar los datos.
+# Los índices sobre columnas que todavía no existen los crea la migración que agrega la columna.
+def crear_indices(conn) -> None:
+    for tabla in db.metadata.sorted_tables:
+        existentes = _columnas(conn, tabla.name)
+        if not existentes:
+            continue
+        for indice in tabla.indexes:
+            if any(columna.name not in existentes for columna in indice.columns):
+                continue
+            columnas = ', '.join(columna.name for columna in indice.columns)
+            if indice.unique:
+                repetido = conn.execute(text(
+                    f"SELECT 1 FROM {tabla.name} WHERE {' AND '.join(f'{c.name} IS NOT NULL' for c in indice.columns)} "
+                    f"GROUP BY {columnas} HAVING COUNT(*) > 1 LIMIT 1"
+                )).first()
+                if repetido:
+                    logger.warning('Valores repetidos en %s(%s): se crea %s sin UNIQUE', tabla.name, columnas, indice.name)
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {indice.name} ON {tabla.name} ({columnas})"))
+                    continue
+            indice.create(conn, checkfirst=True)
+
+
+# 4: índices de las columnas de filtro frecuentes (fechas, claves foráneas, DNI único, cierre único por día)
+def _indices(conn):
+    if _columnas(conn, 'paciente'):
+        # DNI vacío pasa a NULL para que no choque con el índice único
+        conn.execute(text("UPDATE paciente SET dni = NULL WHERE TRIM(dni) = ''"))
+    crear_indices(conn)
+
+
+# 5: índices de texto completo (FTS5) para la búsqueda; sin FTS5 se sigue buscando con LIKE
+def _busqueda(conn):
+    from services.busqueda import reconstruir_busqueda
+    reconstruir_busqueda(conn)
+
+
+# 7: marca de bajo stock, valuación por categoría y movimiento de alta con el stock existente
+def _inventario(conn):
+    _agregar_columna(conn, 'producto', 'bajo_stock', 'BOOLEAN NOT NULL DEFAULT 0')
+    crear_indices(conn)
+    from services.inventario import reconstruir_inventario, registrar_stock_inicial
+    reconstruir_inventario(conn)
+    registrar_stock_inicial(conn)
+
+
+# 8: montos de dinero en centavos enteros (ver dinero.py). SQLite no cambia el tipo de una columna:
+# cada tabla con montos se recrea con el esquema del modelo y se copia convirtiendo los pesos (REAL)
+# a centavos. El resumen diario y la valuación del inventario se reconstruyen desde los datos ya
+# convertidos, y los saldos de las recetas se recalculan con el redondeo nuevo.
+MONTOS = {
+    'producto': ('precio_unitario',),
+    'receta': ('total', 'total_pagado', 'saldo'),
+    'venta': ('monto',),
+    'cierre_caja': ('total_efectivo', 'total_tarjeta', 'total_transferencia', 'total_general'),
+    'pago': ('monto',),
+    'gasto': ('monto',),
+    'resumen_diario': ('ingresos_netos', 'ingresos_brutos', 'descuentos', 'gastos'),
+    'inventario_categoria': ('valor',),
+}
+
+
+def _en_centavos(conn, nombre: str, montos: tuple) -> bool:
+    if not inspect(conn).has_table(nombre):
+        return False
+    tipos = {columna['name']: columna['type'] for columna in inspect(conn).get_columns(nombre)}
+    if all(isinstance(tipos.get(columna), Integer) for columna in montos if columna in tipos):
+        return False
+    tabla = db.metadata.tables[nombre]
+    nueva = f'{nombre}__centavos'
+    ddl = str(CreateTable(tabla).compile(conn)).replace(f'CREATE TABLE {nombre} ', f'CREATE TABLE {nueva} ', 1)
+    conn.execute(text(ddl))
+    columnas = [columna.name for columna in tabla.columns if columna.name in tipos]
+    valores = [f'CAST(ROUND({c} * 100) AS INTEGER)' if c in montos else c for c in columnas]
+    conn.execute(text(f"INSERT INTO {nueva} ({', '.join(columnas)}) SELECT {', '.join(valores)} FROM {nombre}"))
+    conn.execute(text(f"DROP TABLE {nombre}"))
+    conn.execute(text(f"ALTER TABLE {nueva} RENAME TO {nombre}"))
+    return True
+
+
+def _montos_en_centavos(conn):
+    convertidas = [nombre for nombre, montos in MONTOS.items() if _en_centavos(conn, nombre, montos)]
+    if not convertidas:
+        return None
+    crear_indices(conn)
+    from services.inventario import reconstruir_inventario
+    reconstruir_inventario(conn)
+    logger.info('Montos convertidos a centavos en: %s', ', '.join(convertidas))
+
+    def reconstruir():
+        from services.resumenes import reconstruir_resumenes
+        from services.saldos import recalcular_saldos
+        reconstruir_resumenes()
+        recalcular_saldos()
+    return reconstruir
+
+
+# 9: detalle de los cierres por método de pago. La tabla es nueva; los cierres existentes se
+# completan con la recaudación por método de su día en el resumen diario
+def _detalle_de_cierres(conn):
+    db.metadata.tables['cierre_caja_detalle'].create(conn, checkfirst=True)
+    from services.cierres import completar_detalles
+    completados = completar_detalles(conn)
+    if completados:
+        logger.info('Detalle por método agregado a los cierres existentes: %s filas', completados)
+
+
+# 10: fecha de orden de las recetas en la caja (último pago o fecha de la receta) e índice parcial
+# de las pendientes en ese orden, para paginarlas por clave
+def _orden_de_recetas(conn):
+    _agregar_columna(conn, 'receta', 'fecha_orden', 'DATE')
+    if _columnas(conn, 'receta'):
+        conn.execute(text("UPDATE receta SET fecha_orden = COALESCE(fecha_ultimo_pago, fecha)"))
+    crear_indices(conn)
+
+
+# 11: índice parcial de las recetas finalizadas en el orden de la caja; reemplaza al índice sobre
+# saldo, que solo servía para el filtro y dejaba ordenar casi toda la tabla
+def _orden_de_finalizadas(conn):
+    conn.execute(text("DROP INDEX IF EXISTS ix_receta_saldo"))
+    crear_indices(conn)
+
+
+MIGRACIONES = [
+    (1, 'Columnas pago.descuento, receta.armazon_id y cierre_caja.estado_abierta', _columnas_iniciales),
+    (2, 'Saldos materializados en receta', _saldos_de_recetas),
+    (3, 'Resumen diario de caja', _resumen_diario),
+    (4, 'Índices de columnas de filtro', _indices),
+    (5, 'Búsqueda de texto completo', _busqueda),
+    (6, 'Índices de orden de los listados paginados', crear_indices),
+    (7, 'Inventario: bajo stock, valuación por categoría y libro de movimientos', _inventario),
+    (8, 'Montos de dinero en centavos enteros', _montos_en_centavos),
+    (9, 'Detalle de los cierres de caja por método de pago', _detalle_de_cierres),
+    (10, 'Orden de las recetas en la caja con índice parcial de pendientes', _orden_de_recetas),
+    (11, 'Índice parcial de recetas finalizadas en lugar del índice de saldo', _orden_de_finalizadas),
+]
+
+
+def version_actual(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+# Aplica las migraciones pendientes (solo SQLite; en otros motores el esquema lo crea create_all).
+# Devuelve la lista de versiones aplicadas.
+def aplicar_migraciones(engine) -> list:
+    if engine.name != 'sqlite':
+        return []
+    aplicadas = []
+    version = version_actual(engine)
+    for numero, descripcion, migracion in MIGRACIONES:
+        if numero <= version:
+            continue
+        with engine.begin() as conn:
+            posterior = migracion(conn)
+            conn.execute(text(f"PRAGMA user_version = {int(numero)}"))
+        if posterior:
+            posterior()
+        logger.info('Migración %s aplicada: %s', numero, descripcion)
+        aplicadas.append(numero)
+    return aplicadas
+
+
+# Esquema completo: crea las tablas que falten y aplica las migraciones pendientes.
+# Requiere un contexto de aplicación; lo usan `flask migrar`, las herramientas y las pruebas.
+def migrar() -> list:
+    db.create_all()
+    return aplicar_migraciones(db.engine)
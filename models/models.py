@@ -1,22 +1,33 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from dinero import Dinero
 
 db = SQLAlchemy()
 
+# Los montos de dinero usan el tipo Dinero (centavos enteros en la base, Decimal en Python, ver
+# dinero.py); los porcentajes de descuento y comisión siguen siendo Float.
+
 class Producto(db.Model):
+    # Widget de bajo stock: filtra por la marca y ordena por cantidad
+    __table_args__ = (db.Index('ix_producto_bajo_stock_cantidad', 'bajo_stock', 'cantidad'),)
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(20), unique=True, nullable=False)
-    nombre = db.Column(db.String(100), nullable=False)
+    nombre = db.Column(db.String(100), nullable=False, index=True)
     descripcion = db.Column(db.String(200))
     categoria = db.Column(db.String(50))
-    precio_unitario = db.Column(db.Float, nullable=False)
+    precio_unitario = db.Column(Dinero, nullable=False)
     cantidad = db.Column(db.Integer, nullable=False)
     stock_minimo = db.Column(db.Integer, nullable=False)
+    bajo_stock = db.Column(db.Boolean, nullable=False, default=False)  # cantidad <= stock_minimo (services/inventario.py)
+    movimientos = db.relationship('MovimientoStock', backref='producto', cascade='all, delete-orphan')
 
 class Paciente(db.Model):
+    # Orden del listado (paginación por clave)
+    __table_args__ = (db.Index('ix_paciente_apellido_nombre', 'apellido', 'nombre'),)
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100))
     apellido = db.Column(db.String(100))
-    dni = db.Column(db.String(20))
+    dni = db.Column(db.String(20), unique=True, index=True)  # NULL si no se informa
     fecha_nacimiento = db.Column(db.Date)
     obra_social = db.Column(db.String(100))
     contacto = db.Column(db.String(100))
@@ -34,49 +45,132 @@ class Medico(db.Model):
     recetas = db.relationship('Receta', backref='medico', cascade='all, delete-orphan')
 
 class Receta(db.Model):
+    __table_args__ = (
+        db.Index('ix_receta_medico_fecha', 'medico_id', 'fecha'),
+        db.Index('ix_receta_paciente_fecha', 'paciente_id', 'fecha'),
+        # Recetas pendientes y finalizadas de la caja en su orden (paginación por clave, sin ordenar
+        # en memoria): un índice parcial por lista, con la misma condición que la consulta
+        db.Index('ix_receta_pendientes_orden', 'fecha_orden', 'id', sqlite_where=db.text('saldo > 0')),
+        db.Index('ix_receta_finalizadas_orden', 'fecha_orden', 'id', sqlite_where=db.text('saldo <= 0')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     paciente_id = db.Column(db.Integer, db.ForeignKey('paciente.id'))
     medico_id = db.Column(db.Integer, db.ForeignKey('medico.id'), nullable=True)
-    fecha = db.Column(db.Date)
+    fecha = db.Column(db.Date, index=True)
     tipo_lente = db.Column(db.String(100))
     medida_od = db.Column(db.String(50))
     medida_os = db.Column(db.String(50))
     observaciones = db.Column(db.String(200))
-    total = db.Column(db.Float)
+    total = db.Column(Dinero)
     # Producto (armazón) asociado a la venta
     armazon_id = db.Column(db.Integer, db.ForeignKey('producto.id'))
+    armazon = db.relationship('Producto')
+    # Saldos materializados: se actualizan en la misma transacción que los pagos
+    # (ver services/saldos.py y el comando `flask recalcular-saldos`)
+    total_pagado = db.Column(Dinero, default=0)
+    saldo = db.Column(Dinero, default=0)
+    descuento_aplicado = db.Column(db.Float, default=0)
+    fecha_ultimo_pago = db.Column(db.Date)
+    # Orden de las recetas en la caja: fecha del último pago o, sin pagos, la de la receta
+    fecha_orden = db.Column(db.Date)
     # Pagos relacionados
-    pagos = db.relationship('Pago', backref='receta', cascade='all, delete-orphan')
+    pagos = db.relationship('Pago', backref='receta', cascade='all, delete-orphan', order_by='[Pago.fecha, Pago.id]')
+    movimientos_stock = db.relationship('MovimientoStock', backref='receta')
     venta = db.relationship('Venta', backref='receta', uselist=False, cascade='all, delete-orphan')
 
 class Venta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     receta_id = db.Column(db.Integer, db.ForeignKey('receta.id'))
     metodo_pago = db.Column(db.String(50))
-    monto = db.Column(db.Float)
+    monto = db.Column(Dinero)
     fecha = db.Column(db.Date)
 
 class CierreCaja(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    fecha = db.Column(db.Date)
-    total_efectivo = db.Column(db.Float)
-    total_tarjeta = db.Column(db.Float)
-    total_transferencia = db.Column(db.Float)
-    total_general = db.Column(db.Float)
+    fecha = db.Column(db.Date, unique=True, index=True)
+    total_efectivo = db.Column(Dinero)
+    total_tarjeta = db.Column(Dinero)
+    total_transferencia = db.Column(Dinero)
+    total_general = db.Column(Dinero)
     estado_abierta = db.Column(db.Boolean, default=True)  # True = abierta, False = cerrada
+    # Totales por método de pago; las columnas de arriba quedan para los tres métodos habituales
+    detalles = db.relationship('CierreCajaDetalle', backref='cierre', cascade='all, delete-orphan',
+                               order_by='CierreCajaDetalle.metodo_pago')
+
+# Recaudación neta de un cierre por método de pago, una fila por método con pagos ese día:
+# los métodos nuevos (QR, cuenta corriente) no requieren columnas nuevas (ver services/cierres.py)
+class CierreCajaDetalle(db.Model):
+    __table_args__ = (db.UniqueConstraint('cierre_id', 'metodo_pago', name='uq_cierre_detalle_metodo'),)
+    id = db.Column(db.Integer, primary_key=True)
+    cierre_id = db.Column(db.Integer, db.ForeignKey('cierre_caja.id', ondelete='CASCADE'), nullable=False)
+    metodo_pago = db.Column(db.String(50), nullable=False, default='')
+    cantidad_pagos = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(Dinero, nullable=False, default=0)
 
 # Nuevos modelos para pagos parciales y gastos
 class Pago(db.Model):
+    __table_args__ = (
+        db.Index('ix_pago_receta_fecha', 'receta_id', 'fecha'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     receta_id = db.Column(db.Integer, db.ForeignKey('receta.id'), nullable=False)
     metodo_pago = db.Column(db.String(50), nullable=False)
-    monto = db.Column(db.Float, nullable=False)
-    fecha = db.Column(db.Date, nullable=False)
+    monto = db.Column(Dinero, nullable=False)
+    fecha = db.Column(db.Date, nullable=False, index=True)
     descuento = db.Column(db.Float, default=0)
 
 class Gasto(db.Model):
+    __table_args__ = (
+        db.Index('ix_gasto_fecha_categoria', 'fecha', 'categoria'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     fecha = db.Column(db.Date, nullable=False)
     categoria = db.Column(db.String(100))
     descripcion = db.Column(db.String(200))
-    monto = db.Column(db.Float, nullable=False)
\ No newline at end of file
+    monto = db.Column(Dinero, nullable=False)
+
+# Resumen diario de caja por método de pago, mantenido de forma incremental
+# al insertar/eliminar pagos y gastos (ver services/resumenes.py).
+# Los gastos no tienen método de pago y se acumulan en la fila con metodo_pago = ''.
+class ResumenDiario(db.Model):
+    __table_args__ = (db.UniqueConstraint('fecha', 'metodo_pago', name='uq_resumen_diario_fecha_metodo'),)
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False)
+    metodo_pago = db.Column(db.String(50), nullable=False, default='')
+    cantidad_pagos = db.Column(db.Integer, nullable=False, default=0)
+    ingresos_netos = db.Column(Dinero, nullable=False, default=0)
+    ingresos_brutos = db.Column(Dinero, nullable=False, default=0)
+    descuentos = db.Column(Dinero, nullable=False, default=0)
+    gastos = db.Column(Dinero, nullable=False, default=0)
+
+# Versión de los datos por grupo (pago, gasto, receta, comision, medico, cierre) y día, para invalidar
+# los reportes cacheados (ver services/cache.py). Solo crece: cada escritura suma 1 a los días
+# que toca. Los cambios que no dependen de una fecha (médicos) usan la fila con fecha NULL.
+class VersionCache(db.Model):
+    __table_args__ = (db.Index('ix_version_cache_grupo_fecha', 'grupo', 'fecha'),)
+    id = db.Column(db.Integer, primary_key=True)
+    grupo = db.Column(db.String(20), nullable=False)
+    fecha = db.Column(db.Date)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Libro de movimientos de stock: cada descuento o reposición de un producto, con el motivo
+# (alta, venta, devolucion, reposicion, ajuste), la receta que lo originó y el stock resultante
+class MovimientoStock(db.Model):
+    __table_args__ = (db.Index('ix_movimiento_stock_producto_fecha', 'producto_id', 'fecha'),)
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+    receta_id = db.Column(db.Integer, db.ForeignKey('receta.id', ondelete='SET NULL'), index=True)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    cantidad = db.Column(db.Integer, nullable=False)  # positiva = ingreso, negativa = egreso
+    motivo = db.Column(db.String(30), nullable=False)
+    stock_resultante = db.Column(db.Integer, nullable=False)
+
+# Valuación del inventario por categoría (productos, unidades, valor = cantidad x precio y
+# productos bajo stock), mantenida de forma incremental con cada cambio de producto
+class InventarioCategoria(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    categoria = db.Column(db.String(50), nullable=False, unique=True, default='')
+    productos = db.Column(db.Integer, nullable=False, default=0)
+    unidades = db.Column(db.Integer, nullable=False, default=0)
+    valor = db.Column(Dinero, nullable=False, default=0)
+    bajo_stock = db.Column(db.Integer, nullable=False, default=0)
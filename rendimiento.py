@@ -0,0 +1,136 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from flask import g, has_request_context, jsonify, render_template, request
+from sqlalchemy import event
+
+logger = logging.getLogger('optica.rendimiento')
+
+# Instrumentación opcional por request (PERF_INSTRUMENTACION=1): cantidad de consultas SQL,
+# tiempo total en la base y las sentencias más lentas. Se informa en el header Server-Timing,
+# en una línea de log JSON por request y en /_debug/perf, que agrupa por endpoint.
+# Las respuestas en streaming (CSV) se miden hasta que empieza el envío del cuerpo.
+
+# Últimas duraciones que se guardan por endpoint para calcular percentiles
+MUESTRAS_POR_RUTA = 200
+
+
+class Estadisticas:
+    def __init__(self, max_sentencias: int):
+        self.max_sentencias = max_sentencias
+        self._lock = threading.Lock()
+        self._rutas = defaultdict(lambda: {
+            'requests': 0, 'duraciones': deque(maxlen=MUESTRAS_POR_RUTA), 'consultas_total': 0,
+            'consultas_max': 0, 'db_ms_total': 0.0, 'repetidas_max': 0, 'repetida_sql': '', 'lentas': [],
+        })
+
+    def registrar(self, ruta: str, ms: float, consultas: int, db_ms: float, repetidas: int, repetida_sql: str,
+                  lentas: list) -> None:
+        with self._lock:
+            r = self._rutas[ruta]
+            r['requests'] += 1
+            r['duraciones'].append(ms)
+            r['consultas_total'] += consultas
+            r['consultas_max'] = max(r['consultas_max'], consultas)
+            r['db_ms_total'] += db_ms
+            if repetidas > r['repetidas_max']:
+                r['repetidas_max'], r['repetida_sql'] = repetidas, repetida_sql
+            r['lentas'] = sorted(r['lentas'] + lentas, key=lambda s: s['ms'], reverse=True)[:self.max_sentencias]
+
+    # Endpoints ordenados de peor a mejor por p95
+    def resumen(self) -> list:
+        with self._lock:
+            filas = []
+            for ruta, r in self._rutas.items():
+                duraciones = sorted(r['duraciones'])
+                filas.append({
+                    'ruta': ruta,
+                    'requests': r['requests'],
+                    'p50_ms': round(duraciones[len(duraciones) // 2], 2),
+                    'p95_ms': round(duraciones[min(len(duraciones) - 1, int(len(duraciones) * 0.95))], 2),
+                    'max_ms': round(duraciones[-1], 2),
+                    'consultas_promedio': round(r['consultas_total'] / r['requests'], 1),
+                    'consultas_max': r['consultas_max'],
+                    'db_ms_promedio': round(r['db_ms_total'] / r['requests'], 2),
+                    'repetidas_max': r['repetidas_max'],
+                    'repetida_sql': r['repetida_sql'],
+                    'lentas': list(r['lentas']),
+                })
+        return sorted(filas, key=lambda f: f['p95_ms'], reverse=True)
+
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._rutas.clear()
+
+
+# Registra los eventos del motor y los hooks de request. Devuelve las estadísticas acumuladas.
+def instalar(app, db) -> Estadisticas:
+    umbral_lento = app.config.get('PERF_UMBRAL_LENTO_MS', 100)
+    max_sentencias = app.config.get('PERF_MAX_SENTENCIAS', 5)
+    estadisticas = Estadisticas(max_sentencias)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.handlers and not logging.getLogger().handlers:
+        logger.addHandler(logging.StreamHandler())
+
+    with app.app_context():
+        motor = db.engine
+
+    @event.listens_for(motor, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('perf_inicio', []).append(time.perf_counter())
+
+    @event.listens_for(motor, 'after_cursor_execute')
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        ms = (time.perf_counter() - conn.info['perf_inicio'].pop()) * 1000
+        if not has_request_context() or 'perf' not in g:
+            return
+        perf = g.perf
+        perf['consultas'] += 1
+        perf['db_ms'] += ms
+        perf['por_sentencia'][statement] += 1
+        if ms >= umbral_lento:
+            perf['lentas'].append({'ms': round(ms, 2), 'sql': ' '.join(statement.split())[:500]})
+
+    @app.before_request
+    def _iniciar_medicion():
+        g.perf = {'inicio': time.perf_counter(), 'consultas': 0, 'db_ms': 0.0,
+                  'por_sentencia': defaultdict(int), 'lentas': []}
+
+    @app.after_request
+    def _informar_medicion(response):
+        perf = g.pop('perf', None)
+        if perf is None:
+            return response
+        ms = (time.perf_counter() - perf['inicio']) * 1000
+        ruta = request.endpoint or request.path
+        # La sentencia que más se repite en el request delata los N+1 (misma consulta por fila)
+        repetida_sql, repetidas = max(perf['por_sentencia'].items(), key=lambda par: par[1], default=('', 0))
+        repetida_sql = ' '.join(repetida_sql.split())[:500] if repetidas > 1 else ''
+        lentas = sorted(perf['lentas'], key=lambda s: s['ms'], reverse=True)[:max_sentencias]
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={perf["db_ms"]:.1f};desc="{perf["consultas"]} consultas", app;dur={ms:.1f}'
+        )
+        logger.info(json.dumps({
+            'ruta': ruta, 'metodo': request.method, 'status': response.status_code, 'ms': round(ms, 2),
+            'consultas': perf['consultas'], 'db_ms': round(perf['db_ms'], 2), 'repetidas': repetidas,
+            'repetida_sql': repetida_sql, 'lentas': lentas,
+        }, ensure_ascii=False))
+        if ruta != 'debug_perf':
+            estadisticas.registrar(ruta, ms, perf['consultas'], perf['db_ms'], repetidas, repetida_sql, lentas)
+        return response
+
+    # Peores endpoints desde que arrancó el proceso (o desde ?reiniciar=1)
+    @app.route('/_debug/perf')
+    def debug_perf():
+        if request.args.get('reiniciar'):
+            estadisticas.reiniciar()
+        filas = estadisticas.resumen()
+        if request.args.get('formato') == 'json':
+            return jsonify({'umbral_lento_ms': umbral_lento, 'rutas': filas})
+        return render_template('perf.html', filas=filas, umbral_lento=umbral_lento)
+
+    return estadisticas
@@ -26,11 +26,20 @@ REM Variables de entorno básicas
 set FLASK_ENV=production
 set PYTHONUTF8=1
 
+REM Crear tablas y aplicar migraciones pendientes (la aplicación no lo hace al iniciar)
+echo === Óptica Mia: Actualizando base de datos ===
+python -m flask --app app migrar
+if errorlevel 1 (
+  echo Error al migrar la base de datos. El servidor no se inicia.
+  pause >nul
+  exit /b 1
+)
+
 echo === Óptica Mia: Levantando servidor ===
 start "Óptica Mia" http://127.0.0.1:5000/
 
-REM Ejecutar la app
-python app.py
+REM Ejecutar la app con el servidor de producción (waitress, ver serve.py)
+python serve.py
 
 echo.
 echo Servidor detenido. Presione una tecla para salir.
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify
+from services.busqueda import autocompletar
+from rutas.comunes import pagina_listado, item_listado
+
+# JSON compartido por las pantallas de todos los subsistemas: listados para scroll infinito
+# y autocompletado de los buscadores
+bp = Blueprint('api', __name__)
+
+
+# Listados en JSON para scroll infinito: ?q=&por_pagina=&despues=<cursor>; el total solo con ?contar=1
+@bp.route('/api/<any(productos, pacientes, medicos, recetas, gastos):listado>')
+def api_listado(listado: str):
+    try:
+        pagina = pagina_listado(listado, con_total=request.args.get('contar') == '1')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    respuesta = {
+        'items': [item_listado(listado, item) for item in pagina['items']],
+        'siguiente': pagina['siguiente'],
+        'anterior': pagina['anterior'],
+        'por_pagina': pagina['por_pagina'],
+    }
+    if pagina['total'] is not None:
+        respuesta['total'] = pagina['total']
+    return jsonify(respuesta)
+
+
+# Autocompletado por prefijo (nombre, apellido, DNI, código...) para los buscadores: id y etiqueta
+@bp.route('/api/buscar/<entidad>')
+def api_buscar(entidad: str):
+    entidades = {'pacientes': 'paciente', 'medicos': 'medico', 'productos': 'producto', 'armazones': 'producto',
+                 'recetas': 'receta'}
+    if entidad not in entidades:
+        return jsonify({'error': f"Entidad inválida. Use una de: {', '.join(entidades)}"}), 404
+    limite = min(max(request.args.get('limite', 10, type=int), 1), 50)
+    return jsonify({'resultados': autocompletar(entidades[entidad], request.args.get('q', ''), limite)})
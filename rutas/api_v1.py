@@ -0,0 +1,151 @@
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify
+from models.models import db, Producto, Paciente, Medico, Receta, Pago, Gasto
+from services.carga_masiva import cargar, ENTIDADES, MAX_FILAS, MODOS
+from rutas.comunes import pagina_listado
+
+# API JSON versionada para integraciones: listados con filtros y paginación por cursor, detalle,
+# alta de a uno y cargas masivas (altas o upsert de miles de filas en una sola transacción, con
+# los errores de validación por fila). Ver services/carga_masiva.py.
+bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+# Por entidad: modelo y filtros exactos aceptados en el listado (?campo=valor)
+MODELOS = {
+    'productos': (Producto, ('codigo', 'categoria', 'bajo_stock')),
+    'pacientes': (Paciente, ('dni', 'obra_social')),
+    'medicos': (Medico, ('matricula', 'especialidad')),
+    'recetas': (Receta, ('paciente_id', 'medico_id', 'armazon_id')),
+    'pagos': (Pago, ('receta_id', 'metodo_pago')),
+    'gastos': (Gasto, ('categoria',)),
+}
+
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _serializar(item) -> dict:
+    return {columna.name: _valor_json(getattr(item, columna.name)) for columna in item.__table__.columns}
+
+
+def _error(mensaje: str, estado: int):
+    return jsonify({'error': mensaje}), estado
+
+
+def _convertir(columna, valor: str):
+    tipo = columna.type.python_type
+    if tipo is bool:
+        if valor.lower() not in ('1', '0', 'true', 'false'):
+            raise ValueError(f'{columna.name}: use 1 o 0')
+        return valor.lower() in ('1', 'true')
+    if tipo is date:
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f'{columna.name}: fecha inválida, use AAAA-MM-DD') from None
+    try:
+        return tipo(valor)
+    except ValueError:
+        raise ValueError(f'{columna.name}: valor inválido') from None
+
+
+# Condiciones del listado a partir de request.args: filtros exactos, desde/hasta sobre la fecha
+# y ?con_saldo=1 en recetas. Lanza ValueError si algún valor no es válido.
+def _filtros(entidad: str) -> list:
+    modelo, campos = MODELOS[entidad]
+    columnas = modelo.__table__.columns
+    filtros = []
+    for campo in campos:
+        valor = request.args.get(campo)
+        if valor is not None and valor != '':
+            filtros.append(columnas[campo] == _convertir(columnas[campo], valor))
+    if 'fecha' in columnas and entidad != 'productos':
+        for parametro, operador in (('desde', '__ge__'), ('hasta', '__le__')):
+            valor = request.args.get(parametro)
+            if valor:
+                filtros.append(getattr(columnas['fecha'], operador)(_convertir(columnas['fecha'], valor)))
+    if entidad == 'recetas' and request.args.get('con_saldo') == '1':
+        filtros.append(Receta.saldo > 0)
+    return filtros
+
+
+# Listado: ?q=&por_pagina=&despues=<cursor>&antes=<cursor>, filtros por campo; el total solo con ?contar=1
+@bp.route('/<any(productos, pacientes, medicos, recetas, pagos, gastos):entidad>')
+def listar(entidad: str):
+    try:
+        pagina = pagina_listado(entidad, con_total=request.args.get('contar') == '1', filtros=_filtros(entidad))
+    except ValueError as exc:
+        return _error(str(exc), 400)
+    respuesta = {
+        'items': [_serializar(item) for item in pagina['items']],
+        'siguiente': pagina['siguiente'],
+        'anterior': pagina['anterior'],
+        'por_pagina': pagina['por_pagina'],
+    }
+    if pagina['total'] is not None:
+        respuesta['total'] = pagina['total']
+    return jsonify(respuesta)
+
+
+@bp.route('/<any(productos, pacientes, medicos, recetas, pagos, gastos):entidad>/<int:id>')
+def detalle(entidad: str, id: int):
+    item = db.session.get(MODELOS[entidad][0], id)
+    if item is None:
+        return _error(f'No existe el registro {id}', 404)
+    return jsonify(_serializar(item))
+
+
+# Alta de un registro: 201 con el registro creado o 422 con los errores por campo
+@bp.route('/<any(productos, pacientes, medicos, recetas, pagos, gastos):entidad>', methods=['POST'])
+def crear(entidad: str):
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return _error('Se esperaba un objeto JSON', 400)
+    try:
+        resultado = cargar(entidad, [datos])
+        if resultado['errores']:
+            db.session.rollback()
+            return jsonify({'errores': resultado['errores'][0]['errores']}), 422
+        db.session.commit()
+    except ValueError as exc:
+        db.session.rollback()
+        return _error(str(exc), 409)
+    except Exception as exc:
+        db.session.rollback()
+        return _error(f'Error al guardar: {exc}', 500)
+    return jsonify(_serializar(db.session.get(MODELOS[entidad][0], resultado['ids'][0]))), 201
+
+
+# Carga masiva: {"items": [...], "modo": "insertar"|"upsert", "todo_o_nada": false} o directamente
+# la lista de items. Las filas válidas se guardan en una transacción y las inválidas vuelven con sus
+# errores (índice en "items"). 422 si no se guardó nada por errores; 409 si el stock cambió durante
+# la carga (no se guardó nada, se puede reintentar).
+@bp.route('/<any(productos, pacientes, medicos, recetas, pagos, gastos):entidad>/lote', methods=['POST'])
+def cargar_lote(entidad: str):
+    datos = request.get_json(silent=True)
+    if isinstance(datos, list):
+        datos = {'items': datos}
+    if not isinstance(datos, dict) or not isinstance(datos.get('items'), list):
+        return _error('Se esperaba {"items": [...]} o una lista JSON', 400)
+    if len(datos['items']) > MAX_FILAS:
+        return _error(f'Máximo {MAX_FILAS} filas por carga', 413)
+    modo = datos.get('modo', 'insertar')
+    if modo not in MODOS:
+        return _error(f"Modo inválido. Use uno de: {', '.join(MODOS)}", 400)
+    if modo == 'upsert' and not ENTIDADES[entidad]['clave']:
+        return _error(f'{entidad} no admite upsert: solo altas', 400)
+    try:
+        resultado = cargar(entidad, datos['items'], modo=modo, todo_o_nada=bool(datos.get('todo_o_nada')))
+    except ValueError as exc:
+        db.session.rollback()
+        return _error(str(exc), 409)
+    except Exception as exc:
+        db.session.rollback()
+        return _error(f'Error al guardar: {exc}', 500)
+    if resultado['errores'] and not (resultado['creados'] or resultado['actualizados']):
+        db.session.rollback()
+        return jsonify(resultado), 422
+    db.session.commit()
+    return jsonify(resultado)
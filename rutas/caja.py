@@ -0,0 +1,366 @@
+from datetime import date, datetime, timedelta
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, stream_with_context
+from dinero import CERO, neto, redondear
+from models.models import db, Receta, CierreCaja, Pago, Gasto
+from services.cierres import cerrar_dia, controlar_cierres
+from services.exportacion import csv_caja
+from services.resumenes import totales_por_metodo
+from services.saldos import recetas_por_saldo, actualizar_saldo
+from rutas.comunes import pagina_listado, totales_del_periodo
+
+# Caja: pagos parciales, gastos, cierres diarios y exportación CSV
+bp = Blueprint('caja', __name__)
+
+
+# ---------- Caja (Pagos parciales, Gastos, Cierres) ----------
+@bp.route('/caja')
+def caja_dashboard():
+    # Fecha de referencia
+    hoy = date.today()
+
+    # Pagos del día, con receta y paciente en la misma consulta (la tabla muestra el paciente de cada pago)
+    from sqlalchemy.orm import joinedload
+    pagos_hoy = Pago.query.options(joinedload(Pago.receta).joinedload(Receta.paciente)).filter_by(fecha=hoy).all()
+
+    # Resumen por método de pago (neto por pago con descuento %), leído del resumen diario
+    resumen_metodos = {fila['metodo']: fila['ingresos'] for fila in totales_por_metodo(hoy, hoy)}
+
+    # Gastos del día
+    gastos_hoy = Gasto.query.filter_by(fecha=hoy).all()
+    total_gastos_hoy = sum((g.monto or CERO for g in gastos_hoy), CERO)
+
+    # Cierre de caja de hoy: sin cierre la caja está abierta (el cierre lo crea quien cierra la caja
+    # o la tarea diaria, ver services/cierres.py)
+    cierre_hoy = CierreCaja.query.filter_by(fecha=hoy).first()
+
+    # Recetas pendientes y finalizadas (completamente pagadas), paginadas por cursor y con saldo
+    # calculado en SQL; cada lista conserva el cursor de la otra en sus enlaces
+    cursores = {
+        nombre: request.args.get(nombre)
+        for nombre in ('pendientes_despues', 'pendientes_antes', 'finalizadas_despues', 'finalizadas_antes')
+        if request.args.get(nombre)
+    }
+    try:
+        recetas_pendientes = recetas_por_saldo(
+            pendientes=True, despues=cursores.get('pendientes_despues'), antes=cursores.get('pendientes_antes'))
+        recetas_finalizadas = recetas_por_saldo(
+            pendientes=False, despues=cursores.get('finalizadas_despues'), antes=cursores.get('finalizadas_antes'))
+    except ValueError as exc:
+        flash(str(exc), 'warning')
+        return redirect(url_for('caja.caja_dashboard'))
+
+    # Recaudación mensual (pagos) y gastos mensuales
+    first_of_month = date(hoy.year, hoy.month, 1)
+    next_month = date(hoy.year + (1 if hoy.month == 12 else 0), (1 if hoy.month == 12 else hoy.month + 1), 1)
+    # Sumatoria neta mensual (aplicando descuento %)
+    totales_mes = totales_del_periodo(first_of_month, next_month - timedelta(days=1))
+    pagos_mes = totales_mes['ingresos']
+    gastos_mes = totales_mes['gastos']
+
+    return render_template(
+        'caja.html',
+        pagos_hoy=pagos_hoy,
+        resumen_metodos=resumen_metodos,
+        gastos_hoy=gastos_hoy,
+        total_gastos_hoy=total_gastos_hoy,
+        cierre_hoy=cierre_hoy,
+        recetas_finalizadas=recetas_finalizadas,
+        recetas_pendientes=recetas_pendientes,
+        cursores_pendientes={k: v for k, v in cursores.items() if k.startswith('pendientes_')},
+        cursores_finalizadas={k: v for k, v in cursores.items() if k.startswith('finalizadas_')},
+        pagos_mes=pagos_mes,
+        gastos_mes=gastos_mes,
+    )
+
+
+@bp.route('/caja/pago/new', methods=['GET', 'POST'])
+def caja_pago_create():
+    # Verificar si la caja está abierta
+    hoy = date.today()
+    cierre_hoy = CierreCaja.query.filter_by(fecha=hoy).first()
+    if cierre_hoy and not cierre_hoy.estado_abierta:
+        flash('La caja está cerrada. Debe reabrirla para registrar pagos.', 'warning')
+        return redirect(url_for('caja.caja_dashboard'))
+    
+    if request.method == 'POST':
+        try:
+            receta_id_val = int(request.form.get('receta_id') or 0)
+            monto_val = redondear(request.form.get('monto') or 0)
+            descuento_pct = float(request.form.get('descuento') or 0)
+            if descuento_pct < 0 or descuento_pct > 100:
+                raise Exception('El descuento debe estar entre 0 y 100%')
+            # Validar saldo restante de la receta
+            receta = Receta.query.get_or_404(receta_id_val)
+            tiene_pagos = db.session.query(Pago.id).filter_by(receta_id=receta.id).first() is not None
+
+            # Si es el primer pago con descuento, aplicar el descuento al total de la receta
+            if not tiene_pagos and descuento_pct > 0:
+                receta.total = neto(receta.total, descuento_pct)
+                # Mantener el descuento original en el pago para registro histórico
+
+            # Calcular saldo restante considerando que el total ya puede tener descuento aplicado
+            saldo_restante = (receta.total or CERO) - (receta.total_pagado or CERO)
+            
+            # Validar que el monto no supere el saldo restante (montos exactos al centavo)
+            if monto_val > saldo_restante:
+                raise Exception('El monto supera el saldo restante de la receta')
+
+            pago = Pago(
+                receta_id=receta.id,
+                metodo_pago=request.form.get('metodo_pago', '').strip(),
+                monto=monto_val,
+                fecha=date.today(),
+                descuento=descuento_pct,
+            )
+            db.session.add(pago)
+            actualizar_saldo(receta)
+            db.session.commit()
+            flash('Pago registrado correctamente')
+            return redirect(url_for('caja.caja_dashboard'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al registrar pago: {exc}')
+    
+    # Las recetas con saldo pendiente se buscan desde el formulario (ver caja_recetas_pendientes)
+    return render_template('pago_form.html')
+
+
+# Selector de recetas con saldo pendiente: búsqueda paginada en JSON (cursor `despues`, el
+# `siguiente` de la respuesta anterior)
+@bp.route('/caja/recetas-pendientes')
+def caja_recetas_pendientes():
+    por_pagina = min(max(request.args.get('por_pagina', 20, type=int), 1), 100)
+    term = (request.args.get('q') or '').strip() or None
+    try:
+        pagina = recetas_por_saldo(pendientes=True, despues=request.args.get('despues'),
+                                   por_pagina=por_pagina, term=term)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    recetas = []
+    for item in pagina['items']:
+        r = item['receta']
+        paciente = f"{r.paciente.apellido}, {r.paciente.nombre}" if r.paciente else 'Sin paciente'
+        medico = f"{r.medico.apellido}, {r.medico.nombre}" if r.medico else 'Sin médico'
+        recetas.append({
+            'id': r.id,
+            'etiqueta': f"{paciente} - {medico}",
+            'fecha': r.fecha.isoformat() if r.fecha else None,
+            'total': r.total or 0,
+            'pagado': item['pagado'],
+            'pagado_neto': item['pagado_neto'],
+            'cantidad_pagos': item['cantidad_pagos'],
+            'restante': item['saldo'],
+        })
+    return jsonify({'recetas': recetas, 'siguiente': pagina['siguiente'], 'hay_mas': bool(pagina['siguiente'])})
+
+
+@bp.route('/caja/cierre/new', methods=['GET', 'POST'])
+def caja_cierre_create():
+    if request.method == 'POST':
+        try:
+            # Verificar si ya existe cierre para hoy
+            hoy = date.today()
+            cierre_existente = CierreCaja.query.filter_by(fecha=hoy).first()
+            if cierre_existente and not cierre_existente.estado_abierta:
+                flash('Ya existe un cierre de caja para hoy')
+                return redirect(url_for('caja.caja_dashboard'))
+            
+            # Totales netos del día por método desde el resumen diario (ver services/cierres.py)
+            cerrar_dia(hoy)
+            flash('Caja cerrada correctamente')
+            return redirect(url_for('caja.caja_dashboard'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al cerrar caja: {exc}')
+    
+    return render_template('cierre_form.html')
+
+
+@bp.route('/caja/reabrir', methods=['POST'])
+def caja_reabrir():
+    try:
+        hoy = date.today()
+        cierre_hoy = CierreCaja.query.filter_by(fecha=hoy).first()
+        if not cierre_hoy:
+            flash('No hay cierre de caja para hoy')
+            return redirect(url_for('caja.caja_dashboard'))
+        
+        cierre_hoy.estado_abierta = True
+        db.session.commit()
+        flash('Caja reabierta correctamente')
+        return redirect(url_for('caja.caja_dashboard'))
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'Error al reabrir caja: {exc}')
+        return redirect(url_for('caja.caja_dashboard'))
+
+
+# Filtros de fecha del historial de cierres (?desde=&hasta=, AAAA-MM-DD, opcionales).
+# Lanza ValueError si no son válidos.
+def _filtros_cierres() -> list:
+    try:
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d').date() if request.args.get('desde') else None
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d').date() if request.args.get('hasta') else None
+    except ValueError:
+        raise ValueError('Fechas inválidas. Use AAAA-MM-DD') from None
+    if desde and hasta and desde > hasta:
+        raise ValueError('La fecha desde debe ser anterior a hasta')
+    filtros = []
+    if desde:
+        filtros.append(CierreCaja.fecha >= desde)
+    if hasta:
+        filtros.append(CierreCaja.fecha <= hasta)
+    return filtros
+
+
+# Historial de cierres paginado; cada día se compara con la recaudación recalculada desde los
+# pagos (una consulta agrupada por página) y se resaltan los descuadres
+@bp.route('/caja/cierres')
+def caja_cierres():
+    try:
+        pagina = pagina_listado('cierres', filtros=_filtros_cierres())
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('caja.caja_cierres'))
+    controles = controlar_cierres(pagina['items'])
+    return render_template('cierres.html', filas=list(zip(pagina['items'], controles)), pagina=pagina,
+                           desde=request.args.get('desde') or None, hasta=request.args.get('hasta') or None)
+
+
+# Historial de cierres en JSON: ?desde=&hasta=&por_pagina=&despues=<cursor>; el total solo con ?contar=1
+@bp.route('/api/cierres')
+def api_cierres():
+    try:
+        pagina = pagina_listado('cierres', con_total=request.args.get('contar') == '1', filtros=_filtros_cierres())
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    items = []
+    for cierre, control in zip(pagina['items'], controlar_cierres(pagina['items'])):
+        items.append({
+            'id': cierre.id,
+            'fecha': cierre.fecha.isoformat(),
+            'estado_abierta': control['estado_abierta'],
+            'total_efectivo': cierre.total_efectivo,
+            'total_tarjeta': cierre.total_tarjeta,
+            'total_transferencia': cierre.total_transferencia,
+            'total_general': control['total_guardado'],
+            'metodos': {d.metodo_pago: {'cantidad_pagos': d.cantidad_pagos, 'total': d.total} for d in cierre.detalles},
+            'total_calculado': control['total_calculado'],
+            'diferencias': control['diferencias'],
+            'descuadrado': control['descuadrado'],
+        })
+    respuesta = {
+        'items': items,
+        'siguiente': pagina['siguiente'],
+        'anterior': pagina['anterior'],
+        'por_pagina': pagina['por_pagina'],
+    }
+    if pagina['total'] is not None:
+        respuesta['total'] = pagina['total']
+    return jsonify(respuesta)
+
+
+@bp.route('/caja/pago/<int:pago_id>/delete', methods=['POST'])
+def caja_pago_delete(pago_id: int):
+    pago = Pago.query.get_or_404(pago_id)
+    try:
+        receta = pago.receta
+        db.session.delete(pago)
+        actualizar_saldo(receta)
+        db.session.commit()
+        flash('Pago eliminado')
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo eliminar: {exc}')
+    return redirect(url_for('caja.caja_dashboard'))
+
+
+# Gastos
+@bp.route('/gastos')
+def gastos_list():
+    try:
+        pagina = pagina_listado('gastos')
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('caja.gastos_list'))
+    return render_template('gastos.html', gastos=pagina['items'], pagina=pagina)
+
+@bp.route('/gastos/new', methods=['GET', 'POST'])
+def gastos_create():
+    # Verificar si la caja está abierta
+    hoy = date.today()
+    cierre_hoy = CierreCaja.query.filter_by(fecha=hoy).first()
+    if cierre_hoy and not cierre_hoy.estado_abierta:
+        flash('La caja está cerrada. Debe reabrirla para registrar gastos.', 'warning')
+        return redirect(url_for('caja.gastos_list'))
+    
+    if request.method == 'POST':
+        try:
+            fecha_str = (request.form.get('fecha') or '').strip()
+            fecha_val = date.today()
+            if fecha_str:
+                fecha_val = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+            gasto = Gasto(
+                fecha=fecha_val,
+                categoria=(request.form.get('categoria') or '').strip() or None,
+                descripcion=(request.form.get('descripcion') or '').strip() or None,
+                monto=redondear(request.form.get('monto') or 0),
+            )
+            db.session.add(gasto)
+            db.session.commit()
+            flash('Gasto registrado correctamente')
+            return redirect(url_for('caja.gastos_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al registrar gasto: {exc}')
+    return render_template('gasto_form.html', gasto=None)
+
+@bp.route('/gastos/<int:gasto_id>/delete', methods=['POST'])
+def gastos_delete(gasto_id: int):
+    gasto = Gasto.query.get_or_404(gasto_id)
+    try:
+        db.session.delete(gasto)
+        db.session.commit()
+        flash('Gasto eliminado')
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo eliminar: {exc}')
+    return redirect(url_for('caja.gastos_list'))
+
+
+# CSV export del cierre diario
+@bp.route('/caja/cierre/csv')
+def caja_cierre_csv():
+    fecha_str = request.args.get('fecha')
+    if fecha_str:
+        try:
+            dia = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        except ValueError:
+            dia = date.today()
+    else:
+        dia = date.today()
+
+    return Response(
+        stream_with_context(csv_caja(dia, dia)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=cierre_{dia.isoformat()}.csv'}
+    )
+
+
+# CSV de caja para un rango de fechas, generado en streaming (pensado para exportar años completos)
+@bp.route('/caja/export.csv')
+def caja_export_csv():
+    hoy = date.today()
+    try:
+        desde = datetime.strptime(request.args.get('desde') or hoy.isoformat(), '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.args.get('hasta') or hoy.isoformat(), '%Y-%m-%d').date()
+    except ValueError:
+        return Response('Fechas inválidas. Use AAAA-MM-DD', status=400, mimetype='text/plain')
+    if desde > hasta:
+        return Response('La fecha desde debe ser anterior a hasta', status=400, mimetype='text/plain')
+
+    return Response(
+        stream_with_context(csv_caja(desde, hasta)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=caja_{desde.isoformat()}_{hasta.isoformat()}.csv'}
+    )
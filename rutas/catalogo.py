@@ -0,0 +1,102 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from models.models import db, Producto
+from dinero import redondear
+from services.inventario import mover_stock, fijar_stock, movimientos
+from rutas.comunes import pagina_listado
+
+# Catálogo: productos y su libro de movimientos de stock
+bp = Blueprint('catalogo', __name__)
+
+
+# ---------- CRUD Productos ----------
+@bp.route('/productos')
+def productos_list():
+    term = request.args.get('q')
+    try:
+        pagina = pagina_listado('productos')
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('catalogo.productos_list', q=term))
+    return render_template('productos.html', productos=pagina['items'], pagina=pagina, term=term)
+
+
+@bp.route('/productos/new', methods=['GET', 'POST'])
+def productos_create():
+    if request.method == 'POST':
+        try:
+            producto = Producto(
+                codigo=request.form.get('codigo', '').strip(),
+                nombre=request.form.get('nombre', '').strip(),
+                descripcion=(request.form.get('descripcion') or '').strip() or None,
+                categoria=(request.form.get('categoria') or '').strip() or None,
+                precio_unitario=redondear(request.form.get('precio_unitario') or 0),
+                cantidad=0,
+                stock_minimo=int(request.form.get('stock_minimo') or 0),
+            )
+            db.session.add(producto)
+            # El stock inicial queda registrado como movimiento de alta
+            cantidad = int(request.form.get('cantidad') or 0)
+            if cantidad:
+                mover_stock(producto, cantidad, 'alta')
+            db.session.commit()
+            flash('Producto creado correctamente')
+            return redirect(url_for('catalogo.productos_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al crear producto: {exc}')
+    return render_template('producto_form.html', producto=None)
+
+
+@bp.route('/productos/<int:producto_id>/edit', methods=['GET', 'POST'])
+def productos_edit(producto_id: int):
+    producto = Producto.query.get_or_404(producto_id)
+    if request.method == 'POST':
+        try:
+            producto.codigo = request.form.get('codigo', '').strip()
+            producto.nombre = request.form.get('nombre', '').strip()
+            producto.descripcion = (request.form.get('descripcion') or '').strip() or None
+            producto.categoria = (request.form.get('categoria') or '').strip() or None
+            producto.precio_unitario = redondear(request.form.get('precio_unitario') or 0)
+            fijar_stock(producto, int(request.form.get('cantidad') or 0))
+            producto.stock_minimo = int(request.form.get('stock_minimo') or 0)
+            db.session.commit()
+            flash('Producto actualizado correctamente')
+            return redirect(url_for('catalogo.productos_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al actualizar producto: {exc}')
+    return render_template('producto_form.html', producto=producto)
+
+
+@bp.route('/productos/<int:producto_id>/delete', methods=['POST'])
+def productos_delete(producto_id: int):
+    producto = Producto.query.get_or_404(producto_id)
+    try:
+        db.session.delete(producto)
+        db.session.commit()
+        flash('Producto eliminado')
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo eliminar: {exc}')
+    return redirect(url_for('catalogo.productos_list'))
+
+
+# Movimientos de stock de un producto (libro), del más reciente al más antiguo
+@bp.route('/api/productos/<int:producto_id>/movimientos')
+def api_movimientos_producto(producto_id: int):
+    producto = Producto.query.get_or_404(producto_id)
+    limite = min(max(request.args.get('limite', 50, type=int), 1), 500)
+    return jsonify({
+        'producto_id': producto.id,
+        'cantidad': producto.cantidad,
+        'movimientos': [
+            {
+                'fecha': m.fecha.isoformat(timespec='seconds'),
+                'cantidad': m.cantidad,
+                'motivo': m.motivo,
+                'receta_id': m.receta_id,
+                'stock_resultante': m.stock_resultante,
+            }
+            for m in movimientos(producto.id, limite)
+        ],
+    })
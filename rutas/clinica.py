@@ -0,0 +1,366 @@
+from datetime import date, datetime
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from dinero import redondear
+from models.models import db, Producto, Paciente, Medico, Receta
+from services.busqueda import etiqueta
+from services.historial import RECETAS_POR_PAGINA, historia_paciente
+from services.inventario import mover_stock
+from services.saldos import actualizar_saldo
+from rutas.comunes import pagina_listado, item_listado, fecha_json
+
+# Clínica: pacientes, médicos y recetas (con la venta del armazón)
+bp = Blueprint('clinica', __name__)
+
+
+# ---------- CRUD Pacientes ----------
+@bp.route('/pacientes')
+def pacientes_list():
+    term = request.args.get('q')
+    try:
+        pagina = pagina_listado('pacientes')
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('clinica.pacientes_list', q=term))
+    return render_template('pacientes.html', pacientes=pagina['items'], pagina=pagina, term=term)
+
+
+@bp.route('/pacientes/new', methods=['GET', 'POST'])
+def pacientes_create():
+    if request.method == 'POST':
+        try:
+            fecha_nacimiento_str = (request.form.get('fecha_nacimiento') or '').strip()
+            fecha_nacimiento_val = None
+            if fecha_nacimiento_str:
+                try:
+                    fecha_nacimiento_val = datetime.strptime(fecha_nacimiento_str, '%Y-%m-%d').date()
+                except ValueError:
+                    flash('Fecha de nacimiento inválida. Use AAAA-MM-DD')
+                    return render_template('paciente_form.html', paciente=None)
+            dni = request.form.get('dni', '').strip() or None
+            if dni and Paciente.query.filter_by(dni=dni).first():
+                flash(f'Ya existe un paciente con DNI {dni}')
+                return render_template('paciente_form.html', paciente=None)
+            paciente = Paciente(
+                nombre=request.form.get('nombre', '').strip(),
+                apellido=request.form.get('apellido', '').strip(),
+                dni=dni,
+                fecha_nacimiento=fecha_nacimiento_val,
+                obra_social=(request.form.get('obra_social') or '').strip() or None,
+                contacto=(request.form.get('contacto') or '').strip() or None,
+            )
+            db.session.add(paciente)
+            db.session.commit()
+            flash('Paciente creado correctamente')
+            return redirect(url_for('clinica.pacientes_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al crear paciente: {exc}')
+    return render_template('paciente_form.html', paciente=None)
+
+
+@bp.route('/pacientes/<int:paciente_id>/edit', methods=['GET', 'POST'])
+def pacientes_edit(paciente_id: int):
+    paciente = Paciente.query.get_or_404(paciente_id)
+    if request.method == 'POST':
+        try:
+            paciente.nombre = request.form.get('nombre', '').strip()
+            paciente.apellido = request.form.get('apellido', '').strip()
+            dni = request.form.get('dni', '').strip() or None
+            if dni and Paciente.query.filter(Paciente.dni == dni, Paciente.id != paciente.id).first():
+                flash(f'Ya existe otro paciente con DNI {dni}')
+                return render_template('paciente_form.html', paciente=paciente)
+            paciente.dni = dni
+            fecha_nacimiento_str = (request.form.get('fecha_nacimiento') or '').strip()
+            if fecha_nacimiento_str:
+                try:
+                    paciente.fecha_nacimiento = datetime.strptime(fecha_nacimiento_str, '%Y-%m-%d').date()
+                except ValueError:
+                    flash('Fecha de nacimiento inválida. Use AAAA-MM-DD')
+                    return render_template('paciente_form.html', paciente=paciente)
+            else:
+                paciente.fecha_nacimiento = None
+            paciente.obra_social = (request.form.get('obra_social') or '').strip() or None
+            paciente.contacto = (request.form.get('contacto') or '').strip() or None
+            db.session.commit()
+            flash('Paciente actualizado correctamente')
+            return redirect(url_for('clinica.pacientes_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al actualizar paciente: {exc}')
+    return render_template('paciente_form.html', paciente=paciente)
+
+
+# Historia del paciente: recetas paginadas (médico, armazón y pagos), saldo pendiente y graduación
+@bp.route('/pacientes/<int:paciente_id>')
+def pacientes_detalle(paciente_id: int):
+    paciente = Paciente.query.get_or_404(paciente_id)
+    try:
+        historia = _historia(paciente)
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('clinica.pacientes_detalle', paciente_id=paciente.id))
+    return render_template('paciente_detalle.html', paciente=paciente, **historia)
+
+
+# Lo mismo en JSON: ?por_pagina=&despues=<cursor> pagina las recetas
+@bp.route('/api/pacientes/<int:paciente_id>/historia')
+def api_historia_paciente(paciente_id: int):
+    paciente = Paciente.query.get_or_404(paciente_id)
+    try:
+        historia = _historia(paciente)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    recetas = historia['recetas']
+    return jsonify({
+        'paciente': item_listado('pacientes', paciente),
+        'totales': {**historia['totales'], 'ultima_receta': fecha_json(historia['totales']['ultima_receta'])},
+        'graduacion': [{**g, 'fecha': fecha_json(g['fecha'])} for g in historia['graduacion']],
+        'recetas': [
+            {
+                'id': r.id, 'fecha': fecha_json(r.fecha), 'tipo_lente': r.tipo_lente,
+                'medida_od': r.medida_od, 'medida_os': r.medida_os, 'observaciones': r.observaciones,
+                'medico_id': r.medico_id,
+                'medico': f"{r.medico.apellido}, {r.medico.nombre}" if r.medico else None,
+                'armazon': {'id': r.armazon.id, 'codigo': r.armazon.codigo, 'nombre': r.armazon.nombre} if r.armazon else None,
+                'total': r.total, 'total_pagado': r.total_pagado, 'saldo': r.saldo,
+                'descuento_aplicado': r.descuento_aplicado,
+                'pagos': [
+                    {'id': p.id, 'fecha': fecha_json(p.fecha), 'metodo_pago': p.metodo_pago, 'monto': p.monto,
+                     'descuento': p.descuento}
+                    for p in r.pagos
+                ],
+            }
+            for r in recetas['items']
+        ],
+        'siguiente': recetas['siguiente'],
+        'anterior': recetas['anterior'],
+        'por_pagina': recetas['por_pagina'],
+    })
+
+
+def _historia(paciente: Paciente) -> dict:
+    return historia_paciente(
+        paciente.id,
+        despues=request.args.get('despues'),
+        antes=request.args.get('antes'),
+        por_pagina=request.args.get('por_pagina', RECETAS_POR_PAGINA, type=int),
+    )
+
+
+@bp.route('/pacientes/<int:paciente_id>/delete', methods=['POST'])
+def pacientes_delete(paciente_id: int):
+    paciente = Paciente.query.get_or_404(paciente_id)
+    try:
+        db.session.delete(paciente)
+        db.session.commit()
+        flash('Paciente eliminado')
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo eliminar: {exc}')
+    return redirect(url_for('clinica.pacientes_list'))
+
+
+# ---------- CRUD Médicos ----------
+@bp.route('/medicos')
+def medicos_list():
+    term = request.args.get('q')
+    try:
+        pagina = pagina_listado('medicos')
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('clinica.medicos_list', q=term))
+    return render_template('medicos.html', medicos=pagina['items'], pagina=pagina, term=term)
+
+
+@bp.route('/medicos/new', methods=['GET', 'POST'])
+def medicos_create():
+    if request.method == 'POST':
+        try:
+            medico = Medico(
+                nombre=request.form.get('nombre', '').strip(),
+                apellido=request.form.get('apellido', '').strip(),
+                matricula=request.form.get('matricula', '').strip(),
+                especialidad=(request.form.get('especialidad') or '').strip() or None,
+                contacto=(request.form.get('contacto') or '').strip() or None,
+                porcentaje_comision=float(request.form.get('porcentaje_comision') or 0),
+            )
+            db.session.add(medico)
+            db.session.commit()
+            flash('Médico creado correctamente')
+            return redirect(url_for('clinica.medicos_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al crear médico: {exc}')
+    return render_template('medico_form.html', medico=None)
+
+
+@bp.route('/medicos/<int:medico_id>/edit', methods=['GET', 'POST'])
+def medicos_edit(medico_id: int):
+    medico = Medico.query.get_or_404(medico_id)
+    if request.method == 'POST':
+        try:
+            medico.nombre = request.form.get('nombre', '').strip()
+            medico.apellido = request.form.get('apellido', '').strip()
+            medico.matricula = request.form.get('matricula', '').strip()
+            medico.especialidad = (request.form.get('especialidad') or '').strip() or None
+            medico.contacto = (request.form.get('contacto') or '').strip() or None
+            medico.porcentaje_comision = float(request.form.get('porcentaje_comision') or 0)
+            db.session.commit()
+            flash('Médico actualizado correctamente')
+            return redirect(url_for('clinica.medicos_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al actualizar médico: {exc}')
+    return render_template('medico_form.html', medico=medico)
+
+
+@bp.route('/medicos/<int:medico_id>/delete', methods=['POST'])
+def medicos_delete(medico_id: int):
+    medico = Medico.query.get_or_404(medico_id)
+    try:
+        db.session.delete(medico)
+        db.session.commit()
+        flash('Médico eliminado')
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo eliminar: {exc}')
+    return redirect(url_for('clinica.medicos_list'))
+
+
+# ---------- CRUD Recetas ----------
+@bp.route('/recetas')
+def recetas_list():
+    term = request.args.get('q')
+    try:
+        pagina = pagina_listado('recetas')
+    except ValueError as exc:
+        flash(str(exc))
+        return redirect(url_for('clinica.recetas_list', q=term))
+    return render_template('recetas.html', recetas=pagina['items'], pagina=pagina, term=term)
+
+
+# Formulario de receta sin listas completas: paciente, médico y armazón se buscan con /api/buscar.
+# Solo se cargan las opciones ya elegidas (las del formulario enviado o las de la receta).
+def _receta_form(receta=None):
+    def elegido(modelo, entidad, valor):
+        try:
+            item = db.session.get(modelo, int(valor)) if valor else None
+        except (TypeError, ValueError):
+            item = None
+        return {'id': item.id, 'etiqueta': etiqueta(entidad, item)} if item else None
+
+    if request.method == 'POST':
+        ids = {campo: request.form.get(campo) for campo in ('paciente_id', 'medico_id', 'armazon_id')}
+    else:
+        ids = {campo: getattr(receta, campo, None) for campo in ('paciente_id', 'medico_id', 'armazon_id')}
+    seleccion = {
+        'paciente': elegido(Paciente, 'paciente', ids['paciente_id']),
+        'medico': elegido(Medico, 'medico', ids['medico_id']),
+        'armazon': elegido(Producto, 'producto', ids['armazon_id']),
+    }
+    return render_template('receta_form.html', receta=receta, seleccion=seleccion)
+
+
+@bp.route('/recetas/new', methods=['GET', 'POST'])
+def recetas_create():
+    if request.method == 'POST':
+        try:
+            fecha_str = (request.form.get('fecha') or '').strip()
+            fecha_val = None
+            if fecha_str:
+                try:
+                    fecha_val = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+                except ValueError:
+                    flash('Fecha inválida. Use AAAA-MM-DD')
+                    return _receta_form(receta=None)
+            else:
+                fecha_val = date.today()
+            
+            # Manejar médico opcional
+            medico_id_val = request.form.get('medico_id', '').strip()
+            medico_id = int(medico_id_val) if medico_id_val else None
+            
+            receta = Receta(
+                paciente_id=int(request.form.get('paciente_id') or 0),
+                medico_id=medico_id,
+                fecha=fecha_val,
+                tipo_lente=(request.form.get('tipo_lente') or '').strip() or None,
+                medida_od=(request.form.get('medida_od') or '').strip() or None,
+                medida_os=(request.form.get('medida_os') or '').strip() or None,
+                observaciones=(request.form.get('observaciones') or '').strip() or None,
+                total=redondear(request.form.get('total') or 0),
+            )
+            db.session.add(receta)
+            # Descontar stock armazón si corresponde (UPDATE condicional, seguro ante ventas simultáneas)
+            armazon_id_val = request.form.get('armazon_id')
+            if armazon_id_val:
+                armazon = Producto.query.get(int(armazon_id_val))
+                if not armazon:
+                    raise Exception('Sin stock disponible para el armazón seleccionado')
+                mover_stock(armazon, -1, 'venta', receta)
+                receta.armazon_id = armazon.id
+            actualizar_saldo(receta)
+            db.session.commit()
+            flash('Receta creada correctamente')
+            return redirect(url_for('clinica.recetas_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al crear receta: {exc}')
+    return _receta_form(receta=None)
+
+
+@bp.route('/recetas/<int:receta_id>/edit', methods=['GET', 'POST'])
+def recetas_edit(receta_id: int):
+    receta = Receta.query.get_or_404(receta_id)
+    if request.method == 'POST':
+        try:
+            receta.paciente_id = int(request.form.get('paciente_id') or 0)
+            # Manejar médico opcional
+            medico_id_val = request.form.get('medico_id', '').strip()
+            receta.medico_id = int(medico_id_val) if medico_id_val else None
+            fecha_str = (request.form.get('fecha') or '').strip()
+            if fecha_str:
+                try:
+                    receta.fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+                except ValueError:
+                    flash('Fecha inválida. Use AAAA-MM-DD')
+                    return _receta_form(receta=receta)
+            receta.tipo_lente = (request.form.get('tipo_lente') or '').strip() or None
+            receta.medida_od = (request.form.get('medida_od') or '').strip() or None
+            receta.medida_os = (request.form.get('medida_os') or '').strip() or None
+            receta.observaciones = (request.form.get('observaciones') or '').strip() or None
+            receta.total = redondear(request.form.get('total') or 0)
+            # Manejar armazón y stock
+            new_armazon_id = int(request.form.get('armazon_id')) if request.form.get('armazon_id') else None
+            if new_armazon_id != getattr(receta, 'armazon_id', None):
+                if getattr(receta, 'armazon_id', None):
+                    prev = Producto.query.get(receta.armazon_id)
+                    if prev:
+                        mover_stock(prev, 1, 'devolucion', receta)
+                if new_armazon_id:
+                    nuevo = Producto.query.get(new_armazon_id)
+                    if not nuevo:
+                        raise Exception('Sin stock disponible para el armazón seleccionado')
+                    mover_stock(nuevo, -1, 'venta', receta)
+            receta.armazon_id = new_armazon_id
+            actualizar_saldo(receta)
+            db.session.commit()
+            flash('Receta actualizada correctamente')
+            return redirect(url_for('clinica.recetas_list'))
+        except Exception as exc:
+            db.session.rollback()
+            flash(f'Error al actualizar receta: {exc}')
+    return _receta_form(receta=receta)
+
+
+@bp.route('/recetas/<int:receta_id>/delete', methods=['POST'])
+def recetas_delete(receta_id: int):
+    receta = Receta.query.get_or_404(receta_id)
+    try:
+        db.session.delete(receta)
+        db.session.commit()
+        flash('Receta eliminada')
+    except Exception as exc:
+        db.session.rollback()
+        flash(f'No se pudo eliminar: {exc}')
+    return redirect(url_for('clinica.recetas_list'))
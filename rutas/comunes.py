@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from flask import request
+from models.models import Producto, Paciente, Medico, Receta, Pago, Gasto, CierreCaja
+from services.busqueda import buscar
+from services.cache import cache_actual
+from services.comisiones import comisiones_por_medico
+from services.paginacion import paginar
+from services.series import serie_diaria, totales_periodo
+
+# Lógica compartida por las rutas de varios subsistemas: los datos cacheados de los reportes
+# (dashboard, caja y reportes) y los listados paginados (páginas HTML y /api/<listado>).
+
+
+# ---------- Datos cacheados de los reportes ----------
+# Cada uno se guarda por período y se invalida con las escrituras de sus grupos (ver services/cache.py)
+def totales_del_periodo(desde: date, hasta: date) -> dict:
+    return cache_actual().obtener('totales', desde, hasta, ('pago', 'gasto'), lambda: totales_periodo(desde, hasta))
+
+
+def serie_del_periodo(desde: date, hasta: date) -> list:
+    return cache_actual().obtener('serie', desde, hasta, ('pago', 'gasto'), lambda: serie_diaria(desde, hasta))
+
+
+def comisiones_del_periodo(desde: date, hasta: date) -> list:
+    return cache_actual().obtener('comisiones', desde, hasta, ('receta', 'comision', 'medico'),
+                                  lambda: comisiones_por_medico(desde, hasta))
+
+
+# KPIs del dashboard que no salen del resumen diario: recetas del período y cierre de hoy
+def kpis_dashboard(desde: date, hasta: date, hoy: date) -> dict:
+    def calcular():
+        cierre = CierreCaja.query.filter_by(fecha=hoy).first()
+        return {
+            'recetas': Receta.query.filter(Receta.fecha >= desde, Receta.fecha <= hasta).count(),
+            'cierre_hoy': {'total_general': cierre.total_general, 'estado_abierta': cierre.estado_abierta} if cierre else None,
+        }
+    return cache_actual().obtener(f'kpis_dashboard:{hoy}', desde, hasta, ('receta', 'cierre'), calcular)
+
+
+# Resumen del mes: recaudación bruta (montos cobrados, sin descontar el % de cada pago), gastos,
+# comisiones (solo médicos con ventas) y saldo
+def resumen_mes(desde: date, hasta: date) -> dict:
+    totales = totales_del_periodo(desde, hasta)
+    comisiones = comisiones_del_periodo(desde, hasta)
+    total_comisiones = sum(c['comision'] for c in comisiones)
+    return {
+        'pagos_mes_bruto': totales['ingresos_brutos'],
+        'gastos_mes': totales['gastos'],
+        'comisiones_detalle': [c for c in comisiones if c['pagos_netos'] > 0],
+        'total_comisiones': total_comisiones,
+        'saldo_mes': totales['ingresos_brutos'] - totales['gastos'] - total_comisiones,
+    }
+
+
+# Calcula de antemano los datos cacheados que piden el dashboard, la caja y los reportes diario y
+# mensual en el día `dia` (mismas claves que usan esas rutas), para que el primer request no espere
+def precalcular_reportes(dia: date) -> None:
+    desde = date(dia.year, dia.month, 1)
+    hasta = date(dia.year + (dia.month == 12), dia.month % 12 + 1, 1) - timedelta(days=1)
+    with cache_actual().precalculando():
+        kpis_dashboard(desde, hasta, dia)
+        resumen_mes(desde, hasta)
+        serie_del_periodo(dia - timedelta(days=29), dia)
+        totales_del_periodo(dia, dia)
+
+
+# ---------- Listados paginados ----------
+# Por listado: entidad de búsqueda (None si no tiene buscador), orden (terminado en id, para la
+# paginación por clave) y consulta base. Las páginas HTML y /api/<listado> comparten la lógica.
+def _listados():
+    from sqlalchemy.orm import joinedload, selectinload
+    return {
+        'productos': ('producto', [Producto.nombre, Producto.id], Producto.query),
+        'pacientes': ('paciente', [Paciente.apellido, Paciente.nombre, Paciente.id], Paciente.query),
+        'medicos': ('medico', [Medico.apellido, Medico.nombre, Medico.id], Medico.query),
+        'recetas': ('receta', [Receta.fecha.desc(), Receta.id.desc()],
+                    Receta.query.options(joinedload(Receta.paciente), joinedload(Receta.medico))),
+        'pagos': (None, [Pago.fecha.desc(), Pago.id.desc()], Pago.query),
+        'gastos': (None, [Gasto.fecha.desc(), Gasto.id.desc()], Gasto.query),
+        'cierres': (None, [CierreCaja.fecha.desc(), CierreCaja.id.desc()],
+                    CierreCaja.query.options(selectinload(CierreCaja.detalles))),
+    }
+
+
+# Página pedida en request.args (q, despues, antes, por_pagina). Con término de búsqueda se ordena
+# primero por relevancia; `filtros` son condiciones extra sobre la consulta base (API /api/v1).
+# Lanza ValueError si el cursor no es válido.
+def pagina_listado(listado: str, con_total: bool = True, filtros: list = ()) -> dict:
+    entidad, orden, query = _listados()[listado]
+    if filtros:
+        query = query.filter(*filtros)
+    term = (request.args.get('q') or '').strip() or None
+    relevancia = []
+    if entidad and term:
+        query, relevancia = buscar(query, entidad, term)
+    return paginar(
+        query,
+        relevancia + orden,
+        despues=request.args.get('despues'),
+        antes=request.args.get('antes'),
+        por_pagina=request.args.get('por_pagina', type=int),
+        con_total=con_total,
+    )
+
+
+def fecha_json(valor):
+    return valor.isoformat() if valor else None
+
+
+def item_listado(listado: str, item) -> dict:
+    if listado == 'productos':
+        return {'id': item.id, 'codigo': item.codigo, 'nombre': item.nombre, 'categoria': item.categoria,
+                'precio_unitario': item.precio_unitario, 'cantidad': item.cantidad, 'stock_minimo': item.stock_minimo}
+    if listado == 'pacientes':
+        return {'id': item.id, 'apellido': item.apellido, 'nombre': item.nombre, 'dni': item.dni,
+                'fecha_nacimiento': fecha_json(item.fecha_nacimiento), 'obra_social': item.obra_social,
+                'contacto': item.contacto}
+    if listado == 'medicos':
+        return {'id': item.id, 'apellido': item.apellido, 'nombre': item.nombre, 'matricula': item.matricula,
+                'especialidad': item.especialidad, 'contacto': item.contacto,
+                'porcentaje_comision': item.porcentaje_comision}
+    if listado == 'recetas':
+        return {'id': item.id, 'fecha': fecha_json(item.fecha),
+                'paciente_id': item.paciente_id,
+                'paciente': f"{item.paciente.apellido}, {item.paciente.nombre}" if item.paciente else None,
+                'medico_id': item.medico_id,
+                'medico': f"{item.medico.apellido}, {item.medico.nombre}" if item.medico else None,
+                'tipo_lente': item.tipo_lente, 'total': item.total, 'saldo': item.saldo}
+    return {'id': item.id, 'fecha': fecha_json(item.fecha), 'categoria': item.categoria,
+            'descripcion': item.descripcion, 'monto': item.monto}
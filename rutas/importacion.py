@@ -0,0 +1,35 @@
+import itertools
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, stream_template
+from services.importacion import importar_por_lotes, IMPORTABLES
+
+# Importación de productos y pacientes desde CSV o XLSX (ver services/importacion.py).
+# La página de resultado se envía en streaming: se agrega una línea de progreso por lote.
+bp = Blueprint('importacion', __name__)
+
+
+@bp.route('/importar', methods=['GET', 'POST'])
+def importar():
+    entidad = request.values.get('entidad', 'productos')
+    if entidad not in IMPORTABLES:
+        entidad = 'productos'
+    if request.method == 'GET':
+        return render_template('importar.html', entidad=entidad, entidades=IMPORTABLES)
+
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        flash('Seleccione un archivo CSV o XLSX')
+        return redirect(url_for('importacion.importar', entidad=entidad))
+    try:
+        pasos = importar_por_lotes(
+            entidad, archivo.stream, archivo.filename,
+            modo='insertar' if request.form.get('solo_altas') else 'upsert',
+            tamaño_lote=current_app.config['IMPORTACION_LOTE'],
+            simular=bool(request.form.get('simular')),
+        )
+        # Los encabezados se validan antes de empezar a responder
+        primero = next(pasos)
+    except ValueError as exc:
+        flash(f'Error al importar: {exc}')
+        return redirect(url_for('importacion.importar', entidad=entidad))
+    return stream_template('importar.html', entidad=entidad, entidades=IMPORTABLES, archivo=archivo.filename,
+                           simular=bool(request.form.get('simular')), pasos=itertools.chain([primero], pasos))
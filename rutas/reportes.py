@@ -0,0 +1,324 @@
+from datetime import MAXYEAR, MINYEAR, date, datetime, timedelta
+from flask import Blueprint, abort, render_template, request, redirect, url_for, flash, jsonify
+from sqlalchemy import func
+from dinero import CERO
+from models.models import db, Receta, CierreCaja, Pago, Gasto, MovimientoStock
+from services.comisiones import comisiones_mensuales
+from services.inventario import productos_bajo_stock, valuacion_inventario
+from services.reportes import reporte_rango, MAX_MESES
+from services.resumenes import totales_por_metodo
+from services.saldos import total_original
+from rutas.comunes import comisiones_del_periodo, kpis_dashboard, resumen_mes, serie_del_periodo, totales_del_periodo
+
+# Reportes: dashboard, reportes diario, mensual, por rango y de inventario, y sus versiones JSON
+bp = Blueprint('reportes', __name__)
+
+
+@bp.route('/')
+def dashboard():
+    # Productos bajo stock (marca mantenida, ver services/inventario.py)
+    bajo_stock = productos_bajo_stock(10)
+
+    # Mes actual (usando año-mes para evitar errores con strftime en distintos backends)
+    today = date.today()
+    first_of_month = date(today.year, today.month, 1)
+    if today.month == 12:
+        next_month = date(today.year + 1, 1, 1)
+    else:
+        next_month = date(today.year, today.month + 1, 1)
+    fin_de_mes = next_month - timedelta(days=1)
+
+    # Recetas del mes y cierre de hoy
+    kpis = kpis_dashboard(first_of_month, fin_de_mes, today)
+    recetas_mes = kpis['recetas']
+    cierre_hoy = kpis['cierre_hoy']
+
+    # Comisiones por médico basadas en pagos NETOS (con descuento aplicado)
+    comisiones_detalle = comisiones_del_periodo(first_of_month, fin_de_mes)
+    comisiones = {item['medico']['id']: item['comision'] for item in comisiones_detalle}
+
+    # Saldo mensual (recaudado neto - gastos)
+    totales_mes = totales_del_periodo(first_of_month, fin_de_mes)
+    pagos_mes_neto = totales_mes['ingresos']
+    gastos_mes = totales_mes['gastos']
+    saldo_mes = pagos_mes_neto - gastos_mes
+
+    # Datos para gráfico de evolución diaria (últimos 30 días)
+    fecha_inicio = today - timedelta(days=29)
+    datos_grafico = [
+        {
+            'fecha': dia['fecha'].strftime('%d/%m'),
+            'ingresos': round(dia['ingresos'], 2),
+            'gastos': round(dia['gastos'], 2),
+            'saldo': round(dia['saldo'], 2)
+        }
+        for dia in serie_del_periodo(fecha_inicio, today)
+    ]
+
+    return render_template(
+        'dashboard.html',
+        productos_bajo_stock=bajo_stock,
+        recetas_mes=recetas_mes,
+        comisiones=comisiones,
+        comisiones_detalle=comisiones_detalle,
+        cierre_hoy=cierre_hoy,
+        saldo_mes=saldo_mes,
+        pagos_mes_neto=pagos_mes_neto,
+        gastos_mes=gastos_mes,
+        datos_grafico=datos_grafico,
+        first_of_month=first_of_month,
+        next_month=next_month,
+    )
+
+
+@bp.route('/reporte-diario')
+def reporte_diario():
+    # Obtener fecha del parámetro o usar hoy
+    fecha_str = request.args.get('fecha')
+    if fecha_str:
+        try:
+            fecha_consulta = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        except ValueError:
+            fecha_consulta = date.today()
+    else:
+        fecha_consulta = date.today()
+    
+    # Totales del día
+    totales_dia = totales_del_periodo(fecha_consulta, fecha_consulta)
+    total_pagos_dia = totales_dia['ingresos_brutos']
+    total_gastos_dia = totales_dia['gastos']
+
+    # Pagos y gastos del día
+    pagos_dia = Pago.query.filter_by(fecha=fecha_consulta).all()
+    gastos_dia = Gasto.query.filter_by(fecha=fecha_consulta).all()
+    
+    # Cierre de caja del día
+    cierre_dia = CierreCaja.query.filter_by(fecha=fecha_consulta).first()
+    
+    # Resumen por método de pago (montos brutos), leído del resumen diario
+    resumen_metodos = {fila['metodo']: fila['ingresos_brutos'] for fila in totales_por_metodo(fecha_consulta, fecha_consulta)}
+    
+    # Recetas del día (agrupadas), usando los pagos del día ya cargados y los saldos materializados
+    from sqlalchemy.orm import joinedload
+    pagos_por_receta = {}
+    for p in pagos_dia:
+        pagos_por_receta.setdefault(p.receta_id, []).append(p)
+    recetas_por_id = {
+        r.id: r
+        for r in Receta.query.options(joinedload(Receta.paciente), joinedload(Receta.medico))
+        .filter(Receta.id.in_(list(pagos_por_receta))).all()
+    }
+
+    recetas_dia = []
+    for receta_id, pagos_receta in pagos_por_receta.items():
+        r = recetas_por_id[receta_id]
+        total_pagado_dia = sum((p.monto or 0) for p in pagos_receta)
+
+        # Métodos de pago del día
+        metodos_dia = list(set(p.metodo_pago or 'Sin especificar' for p in pagos_receta))
+
+        recetas_dia.append({
+            'receta': r,
+            'total_original': total_original(r),
+            'descuento_pct': r.descuento_aplicado or 0,
+            'total_final': r.total,
+            'pagado_dia': total_pagado_dia,
+            'pagado_total': r.total_pagado or 0,
+            'saldo_pendiente': r.saldo or 0,
+            'metodo': ', '.join(metodos_dia)
+        })
+
+    # Ordenar por fecha
+    recetas_dia.sort(key=lambda x: x['receta'].fecha, reverse=True)
+    
+    return render_template(
+        'reporte_diario.html',
+        fecha_consulta=fecha_consulta,
+        pagos_dia=pagos_dia,
+        total_pagos_dia=total_pagos_dia,
+        gastos_dia=gastos_dia,
+        total_gastos_dia=total_gastos_dia,
+        cierre_dia=cierre_dia,
+        resumen_metodos=resumen_metodos,
+        recetas_dia=recetas_dia
+    )
+
+
+@bp.route('/reporte-mensual')
+def reporte_mensual():
+    # Obtener mes y año del parámetro o usar actual
+    mes = request.args.get('mes', date.today().month, type=int)
+    año = request.args.get('año', date.today().year, type=int)
+    if not 1 <= mes <= 12:
+        abort(400, description=f'Mes inválido: {mes}. Use un número de 1 a 12')
+    if not MINYEAR <= año < MAXYEAR:
+        abort(400, description=f'Año inválido: {año}')
+
+    hoy = date(año, mes, 1)
+    first_of_month = date(hoy.year, hoy.month, 1)
+    if hoy.month == 12:
+        next_month = date(hoy.year + 1, 1, 1)
+    else:
+        next_month = date(hoy.year, hoy.month + 1, 1)
+    
+    # Totales del mes, comisiones y saldo
+    resumen = resumen_mes(first_of_month, next_month - timedelta(days=1))
+
+    # Recaudación bruta del mes (montos cobrados) - agrupado por receta (y método) en SQL, con los saldos materializados
+    from sqlalchemy.orm import joinedload
+    en_mes = (Pago.fecha >= first_of_month) & (Pago.fecha < next_month)
+    pagos_mes_por_receta = {}
+    for receta_id, metodo, monto in (
+        db.session.query(Pago.receta_id, Pago.metodo_pago, func.sum(Pago.monto))
+        .filter(en_mes)
+        .group_by(Pago.receta_id, Pago.metodo_pago)
+        .all()
+    ):
+        item = pagos_mes_por_receta.setdefault(receta_id, {'pagado': CERO, 'metodos': set()})
+        item['pagado'] += monto or 0
+        item['metodos'].add(metodo or 'Sin especificar')
+
+    recetas_con_pagos = (
+        Receta.query
+        .options(joinedload(Receta.paciente), joinedload(Receta.medico))
+        .filter(Receta.id.in_(db.session.query(Pago.receta_id).filter(en_mes)))
+        .all()
+    )
+
+    recetas_detalle = []
+    for r in recetas_con_pagos:
+        total_pagado_mes = pagos_mes_por_receta[r.id]['pagado']
+        metodos_mes = pagos_mes_por_receta[r.id]['metodos']
+        recetas_detalle.append({
+            'fecha': r.fecha,
+            'paciente': f"{r.paciente.apellido}, {r.paciente.nombre}",
+            'medico': f"{r.medico.apellido}, {r.medico.nombre}" if r.medico else "Sin médico",
+            'metodo': ', '.join(metodos_mes),
+            'total_original': total_original(r),
+            'descuento': r.descuento_aplicado or 0,
+            'total_final': r.total,
+            'pagado_mes': total_pagado_mes,
+            'pagado_total': r.total_pagado or 0,
+            'saldo_pendiente': r.saldo or 0
+        })
+
+    # Ordenar por fecha
+    recetas_detalle.sort(key=lambda x: x['fecha'], reverse=True)
+    
+    # Gastos del mes
+    gastos_detalle = Gasto.query.filter(Gasto.fecha >= first_of_month, Gasto.fecha < next_month).order_by(Gasto.fecha.desc()).all()
+
+
+    return render_template(
+        'reporte_mensual.html',
+        first_of_month=first_of_month,
+        next_month=next_month,
+        recetas_detalle=recetas_detalle,
+        gastos_detalle=gastos_detalle,
+        timedelta=timedelta,
+        **resumen,
+    )
+
+
+# Rango de meses (desde/hasta en formato AAAA-MM) para el reporte por rango.
+# Por defecto, los últimos 12 meses incluyendo el actual. Lanza ValueError si es inválido.
+def _rango_de_meses():
+    hoy = date.today()
+    año_desde, mes_desde = (hoy.year, hoy.month + 1) if hoy.month < 12 else (hoy.year + 1, 1)
+    desde_defecto = f'{año_desde - 1}-{mes_desde:02d}'
+    desde = datetime.strptime(request.args.get('desde') or desde_defecto, '%Y-%m').date()
+    hasta = datetime.strptime(request.args.get('hasta') or hoy.strftime('%Y-%m'), '%Y-%m').date()
+    if desde > hasta:
+        raise ValueError('El mes desde debe ser anterior o igual a hasta')
+    if (hasta.year - desde.year) * 12 + hasta.month - desde.month + 1 > MAX_MESES:
+        raise ValueError(f'El rango no puede superar {MAX_MESES} meses')
+    return desde, hasta
+
+
+@bp.route('/reporte-rango')
+def reporte_rango_view():
+    try:
+        desde, hasta = _rango_de_meses()
+    except ValueError as exc:
+        flash(f'Rango inválido: {exc}. Use AAAA-MM')
+        return redirect(url_for('reportes.reporte_rango_view'))
+    reporte = reporte_rango(desde, hasta)
+
+    # Tablas cruzadas mes x método y mes x categoría para la vista
+    for item in reporte['meses']:
+        item['por_metodo'] = {}
+        item['por_categoria'] = {}
+    meses = {(item['año'], item['mes']): item for item in reporte['meses']}
+    for fila in reporte['por_metodo']:
+        meses[(fila['año'], fila['mes'])]['por_metodo'][fila['metodo']] = fila['recaudacion']
+    for fila in reporte['por_categoria']:
+        meses[(fila['año'], fila['mes'])]['por_categoria'][fila['categoria']] = fila['gastos']
+
+    return render_template('reporte_rango.html', reporte=reporte)
+
+
+@bp.route('/api/reporte-rango')
+def api_reporte_rango():
+    try:
+        desde, hasta = _rango_de_meses()
+    except ValueError as exc:
+        return jsonify({'error': f'Rango inválido: {exc}. Use AAAA-MM'}), 400
+    reporte = reporte_rango(desde, hasta)
+    reporte['desde'] = reporte['desde'].isoformat()
+    reporte['hasta'] = reporte['hasta'].isoformat()
+    return jsonify(_redondear(reporte))
+
+
+# Valuación del inventario (cantidad x precio unitario) por categoría, con los últimos movimientos de stock
+@bp.route('/reporte-inventario')
+def reporte_inventario():
+    from sqlalchemy.orm import joinedload
+    ultimos = (
+        MovimientoStock.query
+        .options(joinedload(MovimientoStock.producto), joinedload(MovimientoStock.receta))
+        .order_by(MovimientoStock.fecha.desc(), MovimientoStock.id.desc())
+        .limit(20)
+        .all()
+    )
+    return render_template(
+        'reporte_inventario.html',
+        valuacion=valuacion_inventario(),
+        productos_bajo_stock=productos_bajo_stock(50),
+        movimientos=ultimos,
+    )
+
+
+@bp.route('/api/reporte-inventario')
+def api_reporte_inventario():
+    return jsonify(_redondear(valuacion_inventario()))
+
+
+# Redondea a 2 decimales los valores float de una estructura (los montos ya son Decimal exactos) para devolverla en JSON
+def _redondear(valor):
+    if isinstance(valor, float):
+        return round(valor, 2)
+    if isinstance(valor, dict):
+        return {clave: _redondear(v) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_redondear(v) for v in valor]
+    return valor
+
+
+# Comisiones mensuales por médico en JSON (liquidaciones)
+@bp.route('/api/comisiones')
+def api_comisiones():
+    hoy = date.today()
+    try:
+        desde = datetime.strptime(request.args.get('desde') or f'{hoy.year}-01-01', '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.args.get('hasta') or f'{hoy.year}-12-31', '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas. Use AAAA-MM-DD'}), 400
+    if desde > hasta:
+        return jsonify({'error': 'La fecha desde debe ser anterior a hasta'}), 400
+
+    # Montos exactos al centavo (ver dinero.py): no hace falta redondear
+    return jsonify({
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'comisiones': comisiones_mensuales(desde, hasta),
+    })
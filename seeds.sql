@@ -1,6 +1,7 @@
+-- Los montos van en centavos (precio_unitario 150000 = $1500,00, ver dinero.py)
 INSERT INTO producto (codigo, nombre, descripcion, categoria, precio_unitario, cantidad, stock_minimo) VALUES
-('A001', 'Armazón Clásico', 'Armazón metálico', 'Armazones', 1500, 10, 3),
-('A002', 'Lente Antirreflejo', 'Lente con tratamiento', 'Lentes', 2000, 5, 2),
+('A001', 'Armazón Clásico', 'Armazón metálico', 'Armazones', 150000, 10, 3),
+('A002', 'Lente Antirreflejo', 'Lente con tratamiento', 'Lentes', 200000, 5, 2),
 -- (8 más...)
 
 INSERT INTO medico (nombre, apellido, matricula, especialidad, contacto, porcentaje_comision) VALUES
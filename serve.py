@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+
+# Servidor de producción: gunicorn (Linux/macOS, varios procesos con hilos) o waitress
+# (Windows, un proceso con hilos). Workers, hilos, host y puerto salen de config.Config
+# (WEB_WORKERS, WEB_THREADS, WEB_HOST, WEB_PORT) y se pueden pisar por línea de comandos:
+#   python serve.py
+#   python serve.py --workers 4 --hilos 8 --host 0.0.0.0 --puerto 8000
+# Con gunicorn la aplicación se carga una vez en el proceso principal (preload) y los workers
+# arrancan con fork, sin volver a importar. El esquema no se toca al iniciar: antes de servir
+# una base nueva o una versión nueva correr `flask --app app migrar`.
+# Con TAREAS_AUTOMATICAS=1 las tareas diarias (tareas.py) corren en un solo proceso: el principal
+# de gunicorn (cuando está listo, antes de los workers) o el único de waitress.
+
+
+def _gunicorn_disponible() -> bool:
+    if os.name == 'nt':
+        return False
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Tareas diarias en un hilo del proceso actual, si están activadas
+def _iniciar_tareas(application) -> None:
+    if not application.config.get('TAREAS_AUTOMATICAS'):
+        return
+    from tareas import crear_programador
+    crear_programador(application).iniciar()
+
+
+# Los workers no heredan las conexiones que abrió el proceso principal (las tareas diarias)
+def _descartar_conexiones(server, worker) -> None:
+    from wsgi import application
+    from models.models import db
+    with application.app_context():
+        db.engine.dispose(close=False)
+
+
+def servir_gunicorn(host: str, puerto: int, workers: int, hilos: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Servidor(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{puerto}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', hilos)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('preload_app', True)
+            self.cfg.set('timeout', 60)
+            self.cfg.set('when_ready', lambda server: _iniciar_tareas(self.load()))
+            self.cfg.set('post_fork', _descartar_conexiones)
+
+        def load(self):
+            from wsgi import application
+            return application
+
+    Servidor().run()
+
+
+def servir_waitress(host: str, puerto: int, workers: int, hilos: int) -> None:
+    from waitress import serve
+    from wsgi import application
+    if workers > 1:
+        print(f'waitress usa un solo proceso: se ignoran {workers} workers y se sirve con {hilos} hilos')
+    _iniciar_tareas(application)
+    serve(application, host=host, port=puerto, threads=hilos)
+
+
+def main():
+    from config import Config
+    parser = argparse.ArgumentParser(description='Servidor de producción de ÓpticaApp.')
+    parser.add_argument('--servidor', choices=['auto', 'gunicorn', 'waitress'], default='auto')
+    parser.add_argument('--host', default=Config.SERVIDOR_HOST)
+    parser.add_argument('--puerto', type=int, default=Config.SERVIDOR_PUERTO)
+    parser.add_argument('--workers', type=int, default=Config.SERVIDOR_WORKERS, help='Procesos (solo gunicorn)')
+    parser.add_argument('--hilos', type=int, default=Config.SERVIDOR_HILOS, help='Hilos por proceso')
+    args = parser.parse_args()
+
+    servidor = args.servidor
+    if servidor == 'auto':
+        servidor = 'gunicorn' if _gunicorn_disponible() else 'waitress'
+    print(f'Sirviendo en http://{args.host}:{args.puerto} con {servidor} '
+          f'({args.workers if servidor == "gunicorn" else 1} procesos x {args.hilos} hilos)', flush=True)
+    try:
+        if servidor == 'gunicorn':
+            servir_gunicorn(args.host, args.puerto, args.workers, args.hilos)
+        else:
+            servir_waitress(args.host, args.puerto, args.workers, args.hilos)
+    except ImportError as exc:
+        sys.exit(f'No se pudo iniciar {servidor} ({exc}). Instalar con: pip install -r requirements.txt')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+import re
+from sqlalchemy import event, inspect, or_, text
+from models.models import db, Producto, Paciente, Medico, Receta
+
+# Búsqueda de pacientes, médicos, productos y recetas. En SQLite con FTS5 usa una tabla virtual
+# por entidad (busqueda_<entidad>, rowid = id de la entidad) con tokenizador unicode61 sin
+# acentos ("gomez" encuentra "Gómez") e índice de prefijos, y ordena por relevancia (bm25).
+# Las tablas se crean en la migración 5 (ver migraciones.py) y se mantienen con eventos de
+# los modelos en la misma transacción. En otros motores, o sin FTS5, se busca con ILIKE.
+
+# Por entidad: modelo, columnas indexadas, pesos de bm25 y la consulta que arma el texto
+# a indexar (el alias `e` es la entidad; las recetas incluyen paciente y médico).
+INDICES = {
+    'paciente': {
+        'modelo': Paciente,
+        'columnas': ('apellido', 'nombre', 'dni'),
+        'pesos': (10.0, 5.0, 10.0),
+        'origen': "SELECT e.id, e.apellido, e.nombre, e.dni FROM paciente e",
+    },
+    'medico': {
+        'modelo': Medico,
+        'columnas': ('apellido', 'nombre', 'matricula', 'especialidad'),
+        'pesos': (10.0, 5.0, 10.0, 1.0),
+        'origen': "SELECT e.id, e.apellido, e.nombre, e.matricula, e.especialidad FROM medico e",
+    },
+    'producto': {
+        'modelo': Producto,
+        'columnas': ('nombre', 'codigo', 'categoria'),
+        'pesos': (10.0, 10.0, 1.0),
+        'origen': "SELECT e.id, e.nombre, e.codigo, e.categoria FROM producto e",
+    },
+    'receta': {
+        'modelo': Receta,
+        'columnas': ('paciente', 'medico', 'tipo_lente'),
+        'pesos': (10.0, 5.0, 1.0),
+        'origen': (
+            "SELECT e.id,"
+            " TRIM(COALESCE(p.apellido, '') || ' ' || COALESCE(p.nombre, '') || ' ' || COALESCE(p.dni, '')),"
+            " TRIM(COALESCE(m.apellido, '') || ' ' || COALESCE(m.nombre, '')),"
+            " e.tipo_lente"
+            " FROM receta e LEFT JOIN paciente p ON p.id = e.paciente_id LEFT JOIN medico m ON m.id = e.medico_id"
+        ),
+    },
+}
+
+# Estado de FTS por motor (True si las tablas existen), para no consultarlo en cada búsqueda
+_fts_activo = {}
+
+
+def _tabla(entidad: str) -> str:
+    return f'busqueda_{entidad}'
+
+
+def fts_activo(conn) -> bool:
+    motor = conn.engine
+    if motor.name != 'sqlite':
+        return False
+    if motor not in _fts_activo:
+        _fts_activo[motor] = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+            {'nombre': _tabla('paciente')},
+        ).first() is not None
+    return _fts_activo[motor]
+
+
+def fts_disponible(conn) -> bool:
+    if conn.engine.name != 'sqlite':
+        return False
+    opciones = {fila[0] for fila in conn.execute(text("PRAGMA compile_options"))}
+    return 'ENABLE_FTS5' in opciones
+
+
+# (Re)crea las tablas FTS y las llena desde las tablas de la aplicación.
+# Devuelve False si el motor no soporta FTS5 (se sigue usando ILIKE).
+def reconstruir_busqueda(conn) -> bool:
+    if not fts_disponible(conn):
+        return False
+    for entidad, indice in INDICES.items():
+        tabla = _tabla(entidad)
+        conn.execute(text(f"DROP TABLE IF EXISTS {tabla}"))
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE {tabla} USING fts5({', '.join(indice['columnas'])}, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        pesos = ', '.join(str(p) for p in indice['pesos'])
+        conn.execute(text(f"INSERT INTO {tabla} ({tabla}, rank) VALUES ('rank', 'bm25({pesos})')"))
+        conn.execute(text(f"INSERT INTO {tabla} (rowid, {', '.join(indice['columnas'])}) {indice['origen']}"))
+    _fts_activo[conn.engine] = True
+    return True
+
+
+# Reindexa las filas de `entidad` que cumplen `condicion` (SQL sobre el alias `e` o sus joins)
+def _reindexar(conn, entidad: str, condicion: str, parametros: dict) -> None:
+    if not fts_activo(conn):
+        return
+    indice = INDICES[entidad]
+    tabla = _tabla(entidad)
+    desde = indice['origen'].split(' FROM ', 1)[1]
+    conn.execute(text(f"DELETE FROM {tabla} WHERE rowid IN (SELECT e.id FROM {desde} WHERE {condicion})"), parametros)
+    conn.execute(text(f"INSERT INTO {tabla} (rowid, {', '.join(indice['columnas'])}) {indice['origen']} WHERE {condicion}"), parametros)
+
+
+# Reindexa un lote de filas escritas sin el ORM (carga masiva). Con `dependientes` ('paciente_id' o
+# 'medico_id') reindexa también las recetas de esos pacientes o médicos.
+def reindexar_lote(conn, entidad: str, ids: list, dependientes: str = None) -> None:
+    if not fts_activo(conn):
+        return
+    ids = sorted({int(i) for i in ids})
+    for i in range(0, len(ids), 500):
+        lista = ', '.join(map(str, ids[i:i + 500]))
+        _reindexar(conn, entidad, f'e.id IN ({lista})', {})
+        if dependientes:
+            _reindexar(conn, 'receta', f'e.{dependientes} IN ({lista})', {})
+
+
+def _quitar(conn, entidad: str, id_: int) -> None:
+    if fts_activo(conn):
+        conn.execute(text(f"DELETE FROM {_tabla(entidad)} WHERE rowid = :id"), {'id': id_})
+
+
+def _cambio(target, atributos) -> bool:
+    estado = inspect(target)
+    return any(estado.attrs[a].history.has_changes() for a in atributos)
+
+
+# Altas, ediciones y bajas se reflejan en el índice dentro del mismo flush
+def _registrar_eventos(entidad: str, atributos: tuple, dependientes=None):
+    modelo = INDICES[entidad]['modelo']
+
+    @event.listens_for(modelo, 'after_insert')
+    def _insertado(mapper, connection, target):
+        _reindexar(connection, entidad, 'e.id = :id', {'id': target.id})
+
+    @event.listens_for(modelo, 'after_update')
+    def _actualizado(mapper, connection, target):
+        if _cambio(target, atributos):
+            _reindexar(connection, entidad, 'e.id = :id', {'id': target.id})
+            if dependientes:
+                # Las recetas indexan el nombre del paciente y del médico
+                _reindexar(connection, 'receta', f'e.{dependientes} = :id', {'id': target.id})
+
+    @event.listens_for(modelo, 'after_delete')
+    def _eliminado(mapper, connection, target):
+        _quitar(connection, entidad, target.id)
+
+
+_registrar_eventos('paciente', ('apellido', 'nombre', 'dni'), dependientes='paciente_id')
+_registrar_eventos('medico', ('apellido', 'nombre', 'matricula', 'especialidad'), dependientes='medico_id')
+_registrar_eventos('producto', ('nombre', 'codigo', 'categoria'))
+_registrar_eventos('receta', ('paciente_id', 'medico_id', 'tipo_lente'))
+
+
+# Palabras del término de búsqueda (letras, números) sin comillas ni operadores de FTS.
+# Los separadores entre dígitos se quitan para que "30.123.456" busque el DNI 30123456.
+def _palabras(term: str) -> list:
+    return re.findall(r'\w+', re.sub(r'(?<=\d)[.\-](?=\d)', '', term or ''))
+
+
+# Expresión MATCH: todas las palabras, cada una como prefijo ("gom 301" -> "gom"* "301"*)
+def _expresion_fts(palabras: list) -> str:
+    return ' '.join(f'"{p}"*' for p in palabras)
+
+
+def _columnas_like(entidad: str) -> list:
+    if entidad == 'receta':
+        return [Paciente.nombre, Paciente.apellido, Paciente.dni, Medico.nombre, Medico.apellido, Receta.tipo_lente]
+    modelo = INDICES[entidad]['modelo']
+    return [getattr(modelo, c) for c in INDICES[entidad]['columnas']]
+
+
+# Filtra `query` (sobre el modelo de la entidad) por el término. Devuelve la consulta y la lista
+# de expresiones de relevancia para ordenar (el rank de FTS, o vacía con LIKE). Para recetas,
+# `con_joins` indica que la consulta ya une paciente y médico (lo necesita la búsqueda con LIKE).
+def buscar(query, entidad: str, term: str, con_joins: bool = False) -> tuple:
+    palabras = _palabras(term)
+    if not palabras:
+        return query, []
+    modelo = INDICES[entidad]['modelo']
+    if fts_activo(db.session.connection()):
+        tabla = _tabla(entidad)
+        coincidencias = (
+            text(f"SELECT rowid AS id, rank FROM {tabla} WHERE {tabla} MATCH :expresion")
+            .bindparams(expresion=_expresion_fts(palabras))
+            .columns(id=db.Integer, rank=db.Float)
+            .subquery()
+        )
+        return query.join(coincidencias, coincidencias.c.id == modelo.id), [coincidencias.c.rank]
+    if entidad == 'receta' and not con_joins:
+        query = query.join(Paciente, Receta.paciente_id == Paciente.id).outerjoin(Medico, Receta.medico_id == Medico.id)
+    columnas = _columnas_like(entidad)
+    for palabra in palabras:
+        query = query.filter(or_(*(columna.ilike(f'%{palabra}%') for columna in columnas)))
+    return query, []
+
+
+# Como `buscar`, pero ya ordenada por relevancia; el orden que se agregue después queda como desempate
+def filtrar(query, entidad: str, term: str, con_joins: bool = False):
+    query, relevancia = buscar(query, entidad, term, con_joins)
+    return query.order_by(*relevancia)
+
+
+def etiqueta(entidad: str, item) -> str:
+    if entidad == 'paciente':
+        return f"{item.apellido or ''}, {item.nombre or ''}" + (f" (DNI {item.dni})" if item.dni else '')
+    if entidad == 'medico':
+        return f"{item.apellido or ''}, {item.nombre or ''}" + (f" (Mat. {item.matricula})" if item.matricula else '')
+    if entidad == 'producto':
+        return f"{item.codigo} - {item.nombre} (stock: {item.cantidad})"
+    paciente = item.paciente
+    nombre = f"{paciente.apellido or ''}, {paciente.nombre or ''}" if paciente else 'Sin paciente'
+    return f"Receta #{item.id} - {nombre} - {item.fecha or ''}"
+
+
+# Autocompletado: hasta `limite` resultados por prefijo, los más relevantes primero
+def autocompletar(entidad: str, term: str, limite: int = 10) -> list:
+    if not _palabras(term):
+        return []
+    query = filtrar(INDICES[entidad]['modelo'].query, entidad, term)
+    if entidad == 'receta':
+        from sqlalchemy.orm import joinedload
+        query = query.options(joinedload(Receta.paciente)).order_by(Receta.fecha.desc())
+    items = query.limit(limite).all()
+    return [{'id': item.id, 'etiqueta': etiqueta(entidad, item)} for item in items]
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date
+from flask import current_app
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import Session
+from models.models import db, Pago, Gasto, Receta, Medico, CierreCaja, VersionCache
+
+# Cache de los datos calculados de los reportes (KPIs, serie del gráfico, comisiones, resumen
+# del mes), por nombre y período. Cada escritura de Pago, Gasto, Receta, Medico o CierreCaja
+# suma 1 a la versión de los días que toca (tabla version_cache, en la misma transacción),
+# y una entrada solo se usa si la versión de sus grupos en el período no cambió desde que se
+# calculó. Así un pago cargado con fecha de hace dos meses invalida ese mes y ningún otro,
+# y la invalidación llega a todos los procesos que comparten la base.
+# Los meses pasados quedan cacheados hasta que los toque una escritura; los períodos que
+# incluyen hoy vencen además a los CACHE_TTL segundos, por si se escribe sin pasar por el ORM.
+
+MAX_ENTRADAS = 256
+TTL = 300
+AL_USAR = -1.0  # vencimiento de las entradas precalculadas: el TTL empieza a correr con el primer uso
+
+
+class CacheReportes:
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, ttl: float = TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.activo = True
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._local = threading.local()
+
+    def configurar(self, max_entradas: int = None, ttl: float = None, activo: bool = None) -> None:
+        with self._lock:
+            if max_entradas is not None:
+                self.max_entradas = max_entradas
+            if ttl is not None:
+                self.ttl = ttl
+            if activo is not None:
+                self.activo = activo
+            self._entradas.clear()
+
+    # Valor cacheado de `nombre` para [desde, hasta], o `calcular()` si cambió alguno de `grupos`
+    # en el período (o no está). `calcular` tiene que devolver datos planos, sin objetos del ORM.
+    def obtener(self, nombre: str, desde: date, hasta: date, grupos: tuple, calcular):
+        if not self.activo:
+            return calcular()
+        clave = (nombre, desde, hasta)
+        version = version_periodo(grupos, desde, hasta)
+        ahora = time.monotonic()
+        precalculo = getattr(self._local, 'precalculo', False)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if (not precalculo and entrada and entrada[0] == version
+                    and (entrada[1] is None or entrada[1] == AL_USAR or ahora < entrada[1])):
+                if entrada[1] == AL_USAR:
+                    self._entradas[clave] = (version, ahora + self.ttl, entrada[2])
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[2]
+            self.fallos += 1
+        valor = calcular()
+        vence = None
+        if hasta >= date.today():
+            vence = AL_USAR if precalculo else ahora + self.ttl
+        with self._lock:
+            self._entradas[clave] = (version, vence, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return valor
+
+    # Dentro del bloque `obtener` recalcula siempre y guarda las entradas sin empezar a contar
+    # el TTL: la tarea diaria (tareas.py) deja calculados de noche los reportes del día siguiente.
+    @contextmanager
+    def precalculando(self):
+        self._local.precalculo = True
+        try:
+            yield self
+        finally:
+            self._local.precalculo = False
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+# Cache propio de cada aplicación (en app.extensions): dos aplicaciones del mismo proceso, por
+# ejemplo pruebas contra bases en memoria distintas, no comparten entradas.
+def instalar(app) -> CacheReportes:
+    cache = CacheReportes(app.config.get('CACHE_MAX_ENTRADAS', MAX_ENTRADAS), app.config.get('CACHE_TTL', TTL))
+    cache.activo = app.config.get('CACHE_REPORTES', True)
+    app.extensions['cache_reportes'] = cache
+    return cache
+
+
+# Cache de la aplicación del request (o contexto) actual
+def cache_actual() -> CacheReportes:
+    return current_app.extensions['cache_reportes']
+
+
+# Suma de las versiones de `grupos` en el período (más las filas sin fecha). Como las versiones
+# solo crecen, cualquier escritura en el período cambia la suma.
+def version_periodo(grupos: tuple, desde: date, hasta: date) -> int:
+    return db.session.execute(
+        select(func.coalesce(func.sum(VersionCache.version), 0))
+        .where(VersionCache.grupo.in_(grupos))
+        .where(or_(VersionCache.fecha.between(desde, hasta), VersionCache.fecha.is_(None)))
+    ).scalar()
+
+
+# ---------- Invalidación ----------
+# Los eventos de los modelos anotan (grupo, fecha) en la sesión y al final del flush se
+# incrementan las versiones una sola vez por día, sobre la conexión del flush.
+
+def _marcar(target, grupo: str, *fechas) -> None:
+    sesion = inspect(target).session
+    if sesion is None:
+        return
+    pendientes = sesion.info.setdefault('cache_pendientes', set())
+    for fecha in fechas:
+        pendientes.add((grupo, fecha))
+
+
+def _valor_previo(target, atributo):
+    historial = inspect(target).attrs[atributo].history
+    if historial.deleted:
+        return historial.deleted[0]
+    return getattr(target, atributo)
+
+
+def _cambio(target, atributos) -> bool:
+    estado = inspect(target)
+    return any(estado.attrs[a].history.has_changes() for a in atributos)
+
+
+def _fecha_receta(connection, receta_id):
+    if receta_id is None:
+        return None
+    tabla = Receta.__table__
+    return connection.execute(select(tabla.c.fecha).where(tabla.c.id == receta_id)).scalar()
+
+
+# Un pago cambia la recaudación de su fecha y las comisiones del día de su receta
+def _pago(mapper, connection, target):
+    _marcar(target, 'pago', target.fecha, _valor_previo(target, 'fecha'))
+    recetas = {target.receta_id, _valor_previo(target, 'receta_id')}
+    _marcar(target, 'comision', *(_fecha_receta(connection, receta_id) for receta_id in recetas))
+
+
+def _gasto(mapper, connection, target):
+    _marcar(target, 'gasto', target.fecha, _valor_previo(target, 'fecha'))
+
+
+def _receta(mapper, connection, target):
+    _marcar(target, 'receta', target.fecha, _valor_previo(target, 'fecha'))
+
+
+def _cierre(mapper, connection, target):
+    _marcar(target, 'cierre', target.fecha, _valor_previo(target, 'fecha'))
+
+
+def _medico(mapper, connection, target):
+    _marcar(target, 'medico', None)
+
+
+# Con active_history el valor anterior de la fecha se carga al modificarla aunque el objeto
+# esté expirado (después de un commit), para invalidar también el día de origen
+for _atributo in (Pago.fecha, Pago.receta_id, Gasto.fecha, Receta.fecha, CierreCaja.fecha):
+    event.listen(_atributo, 'set', lambda target, valor, anterior, iniciador: valor, active_history=True, retval=True)
+
+for _modelo, _funcion in ((Pago, _pago), (Gasto, _gasto), (CierreCaja, _cierre), (Medico, _medico)):
+    for _evento in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_modelo, _evento, _funcion)
+event.listen(Receta, 'after_insert', _receta)
+event.listen(Receta, 'after_delete', _receta)
+
+
+# Los saldos materializados se actualizan en cada pago: solo fecha y médico cambian los reportes
+@event.listens_for(Receta, 'after_update')
+def _receta_actualizada(mapper, connection, target):
+    if _cambio(target, ('fecha', 'medico_id')):
+        _receta(mapper, connection, target)
+
+
+@event.listens_for(Session, 'after_flush')
+def _incrementar_versiones(session, flush_context):
+    pendientes = session.info.pop('cache_pendientes', None)
+    if pendientes:
+        _incrementar(session.connection(), pendientes)
+
+
+# Invalida los períodos de las escrituras hechas sin el ORM (cargas masivas con executemany):
+# `pares` son (grupo, fecha), con fecha None para los grupos sin fecha
+def invalidar(pares) -> None:
+    _incrementar(db.session.connection(), set(pares))
+
+
+def _incrementar(connection, pendientes: set) -> None:
+    tabla = VersionCache.__table__
+    for grupo, fecha in sorted(pendientes, key=lambda p: (p[0], p[1] or date.min)):
+        condicion = tabla.c.fecha.is_(None) if fecha is None else tabla.c.fecha == fecha
+        resultado = connection.execute(
+            tabla.update().where(tabla.c.grupo == grupo, condicion).values(version=tabla.c.version + 1)
+        )
+        if resultado.rowcount == 0:
+            connection.execute(tabla.insert().values(grupo=grupo, fecha=fecha, version=1))
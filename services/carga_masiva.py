@@ -0,0 +1,546 @@
+from datetime import date, datetime
+from sqlalchemy import bindparam, insert, select
+from dinero import CERO, neto, redondear
+from models.models import db, Producto, Paciente, Medico, Receta, Pago, Gasto, CierreCaja, MovimientoStock
+from services.busqueda import reindexar_lote
+from services.cache import invalidar
+from services.inventario import acumular_cambios, mover_stock_lote
+from services.resumenes import acumular_lote
+from services.saldos import actualizar_saldos
+
+# Carga masiva de productos, pacientes, médicos, recetas, pagos y gastos (API /api/v1).
+# Cada fila se valida por separado: las inválidas se informan con sus errores por campo y el
+# resto se escribe en la transacción en curso con INSERT/UPDATE por lotes (executemany), sin
+# cargar objetos del ORM. Como así no corren los eventos de los modelos, cada carga mantiene
+# por lote lo que ellos mantienen fila a fila: índices de búsqueda, resumen diario, saldos de
+# recetas, valuación y libro de stock, y las versiones del cache de reportes.
+# Productos, pacientes y médicos admiten upsert por su clave natural (código, DNI, matrícula):
+# se actualizan solo los campos enviados. El commit queda a cargo de quien llama.
+
+MAX_FILAS = 10000
+LOTE = 500
+MODOS = ('insertar', 'upsert')
+
+
+# ---------- Conversión de campos ----------
+
+def _texto(maximo: int):
+    def convertir(valor):
+        if not isinstance(valor, (str, int, float)) or isinstance(valor, bool):
+            raise ValueError('Se esperaba un texto')
+        valor = str(valor).strip()
+        if len(valor) > maximo:
+            raise ValueError(f'Máximo {maximo} caracteres')
+        return valor or None
+    return convertir
+
+
+def _numero(minimo: float = None, maximo: float = None, entero: bool = False):
+    def convertir(valor):
+        if isinstance(valor, bool):
+            raise ValueError('Se esperaba un número')
+        if isinstance(valor, str) and ',' in valor and '.' not in valor:
+            valor = valor.replace(',', '.')  # coma decimal (planillas en castellano)
+        try:
+            numero = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError('Se esperaba un número') from None
+        if entero:
+            if numero != int(numero):
+                raise ValueError('Se esperaba un número entero')
+            numero = int(numero)
+        if minimo is not None and numero < minimo:
+            raise ValueError(f'Debe ser mayor o igual a {minimo:g}')
+        if maximo is not None and numero > maximo:
+            raise ValueError(f'Debe ser menor o igual a {maximo:g}')
+        return numero
+    return convertir
+
+
+# Montos de dinero: número no negativo, exacto al centavo (Decimal, ver dinero.py)
+def _dinero():
+    numero = _numero(minimo=0)
+
+    def convertir(valor):
+        return redondear(numero(valor))
+    return convertir
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(str(valor).strip(), formato).date()
+        except ValueError:
+            pass
+    raise ValueError('Fecha inválida. Use AAAA-MM-DD o DD/MM/AAAA')
+
+
+_id = _numero(minimo=1, entero=True)
+
+# Por entidad: modelo, conversión de cada campo aceptado, obligatorios y valores por defecto del alta
+ENTIDADES = {
+    'productos': {
+        'modelo': Producto,
+        'campos': {
+            'codigo': _texto(20), 'nombre': _texto(100), 'descripcion': _texto(200), 'categoria': _texto(50),
+            'precio_unitario': _dinero(), 'cantidad': _numero(minimo=0, entero=True),
+            'stock_minimo': _numero(minimo=0, entero=True),
+        },
+        'obligatorios': ('codigo', 'nombre', 'precio_unitario'),
+        'defectos': {'cantidad': 0, 'stock_minimo': 0},
+        'clave': 'codigo',
+    },
+    'pacientes': {
+        'modelo': Paciente,
+        'campos': {
+            'nombre': _texto(100), 'apellido': _texto(100), 'dni': _texto(20), 'fecha_nacimiento': _fecha,
+            'obra_social': _texto(100), 'contacto': _texto(100),
+        },
+        'obligatorios': ('nombre', 'apellido'),
+        'defectos': {},
+        'clave': 'dni',
+    },
+    'medicos': {
+        'modelo': Medico,
+        'campos': {
+            'nombre': _texto(100), 'apellido': _texto(100), 'matricula': _texto(50), 'especialidad': _texto(100),
+            'contacto': _texto(100), 'porcentaje_comision': _numero(minimo=0, maximo=100),
+        },
+        'obligatorios': ('nombre', 'apellido'),
+        'defectos': {'porcentaje_comision': 0},
+        'clave': 'matricula',
+    },
+    'recetas': {
+        'modelo': Receta,
+        'campos': {
+            'paciente_id': _id, 'medico_id': _id, 'armazon_id': _id, 'fecha': _fecha, 'tipo_lente': _texto(100),
+            'medida_od': _texto(50), 'medida_os': _texto(50), 'observaciones': _texto(200),
+            'total': _dinero(),
+        },
+        'obligatorios': ('paciente_id',),
+        'defectos': {'fecha': date.today, 'total': 0},
+        'clave': None,
+    },
+    'pagos': {
+        'modelo': Pago,
+        'campos': {
+            'receta_id': _id, 'metodo_pago': _texto(50), 'monto': _dinero(), 'fecha': _fecha,
+            'descuento': _numero(minimo=0, maximo=100),
+        },
+        'obligatorios': ('receta_id', 'metodo_pago', 'monto'),
+        'defectos': {'fecha': date.today, 'descuento': 0},
+        'clave': None,
+    },
+    'gastos': {
+        'modelo': Gasto,
+        'campos': {'fecha': _fecha, 'categoria': _texto(100), 'descripcion': _texto(200), 'monto': _dinero()},
+        'obligatorios': ('monto',),
+        'defectos': {'fecha': date.today},
+        'clave': None,
+    },
+}
+
+
+# Filas del lote: valores convertidos de las válidas, errores por campo de las demás e ids escritos
+class _Lote:
+    def __init__(self, entidad: str, filas: list, todo_o_nada: bool):
+        self.definicion = ENTIDADES[entidad]
+        self.todo_o_nada = todo_o_nada
+        self.valores = {}
+        self.errores = {}
+        self.ids = [None] * len(filas)
+        self.creados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        campos = self.definicion['campos']
+        for indice, fila in enumerate(filas):
+            if not isinstance(fila, dict):
+                self.errores[indice] = {'fila': 'Se esperaba un objeto'}
+                continue
+            valores, errores = {}, {}
+            for campo, valor in fila.items():
+                if campo not in campos:
+                    errores[campo] = 'Campo desconocido'
+                elif valor is None or (isinstance(valor, str) and not valor.strip()):
+                    valores[campo] = None
+                else:
+                    try:
+                        valores[campo] = campos[campo](valor)
+                    except ValueError as exc:
+                        errores[campo] = str(exc)
+            if errores:
+                self.errores[indice] = errores
+            else:
+                self.valores[indice] = valores
+
+    def validas(self) -> list:
+        return sorted(self.valores.items())
+
+    def error(self, indice: int, campo: str, mensaje: str) -> None:
+        self.errores.setdefault(indice, {})[campo] = mensaje
+        self.valores.pop(indice, None)
+
+    # Obligatorios y valores por defecto: completos en el alta; en la actualización solo se
+    # controla que no se borre un obligatorio ni un campo con valor por defecto (stock, comisión)
+    def completar(self, indice: int, alta: bool) -> bool:
+        valores = self.valores[indice]
+        for campo in self.definicion['obligatorios']:
+            if (alta or campo in valores) and valores.get(campo) is None:
+                self.error(indice, campo, 'Obligatorio')
+        if not alta:
+            for campo in self.definicion['defectos']:
+                if campo in valores and valores[campo] is None:
+                    self.error(indice, campo, 'No puede quedar vacío')
+        if indice not in self.valores:
+            return False
+        if alta:
+            for campo, defecto in self.definicion['defectos'].items():
+                if valores.get(campo) is None:
+                    valores[campo] = defecto() if callable(defecto) else defecto
+        return True
+
+    def puede_escribir(self) -> bool:
+        return bool(self.valores) and not (self.todo_o_nada and self.errores)
+
+    def resultado(self) -> dict:
+        if self.todo_o_nada and self.errores:
+            self.ids = [None] * len(self.ids)
+        return {
+            'creados': self.creados,
+            'actualizados': self.actualizados,
+            'sin_cambios': self.sin_cambios,
+            'ids': self.ids,
+            'errores': [{'fila': indice, 'errores': errores} for indice, errores in sorted(self.errores.items())],
+        }
+
+
+# ---------- Lecturas y escrituras por lotes ----------
+
+def _partes(valores) -> list:
+    valores = sorted(valores)
+    return [valores[i:i + LOTE] for i in range(0, len(valores), LOTE)]
+
+
+# Filas existentes por valor de `columna` (varias por valor si la columna no es única)
+def _existentes(modelo, columna, valores) -> dict:
+    tabla = modelo.__table__
+    encontradas = {}
+    for parte in _partes(valores):
+        for fila in db.session.execute(select(tabla).where(tabla.c[columna].in_(parte))):
+            encontradas.setdefault(getattr(fila, columna), []).append(fila)
+    return encontradas
+
+
+def _ids_existentes(modelo, ids) -> set:
+    tabla = modelo.__table__
+    encontrados = set()
+    for parte in _partes(ids):
+        encontrados.update(db.session.execute(select(tabla.c.id).where(tabla.c.id.in_(parte))).scalars())
+    return encontrados
+
+
+# INSERT por lotes; devuelve los ids en el orden de `filas` (todas con las mismas columnas).
+# SQLite no garantiza el orden de RETURNING, y pedírselo a SQLAlchemy lo lleva a un INSERT por
+# fila; pero asigna los rowid en orden creciente (el mayor existente + 1) a medida que inserta,
+# así que basta con ordenar los ids devueltos. Los demás motores ordenan con SQLAlchemy.
+def _insertar(modelo, filas: list) -> list:
+    tabla = modelo.__table__
+    sqlite = db.session.get_bind().dialect.name == 'sqlite'
+    sentencia = insert(tabla).returning(tabla.c.id, sort_by_parameter_order=not sqlite)
+    ids = []
+    for i in range(0, len(filas), LOTE):
+        devueltos = db.session.execute(sentencia, filas[i:i + LOTE]).scalars().all()
+        ids += sorted(devueltos) if sqlite else devueltos
+    return ids
+
+
+# UPDATE por clave primaria, agrupando las filas que cambian las mismas columnas
+def _actualizar(modelo, filas: list) -> None:
+    tabla = modelo.__table__
+    grupos = {}
+    for fila in filas:
+        datos = {campo: valor for campo, valor in fila.items() if campo != 'id'}
+        grupos.setdefault(tuple(sorted(datos)), []).append(dict(datos, _id=fila['id']))
+    for campos, grupo in grupos.items():
+        sentencia = tabla.update().where(tabla.c.id == bindparam('_id')).values({c: bindparam(c) for c in campos})
+        for i in range(0, len(grupo), LOTE):
+            db.session.execute(sentencia, grupo[i:i + LOTE])
+
+
+def _columnas(lote: _Lote, valores: dict) -> dict:
+    return {campo: valores.get(campo) for campo in lote.definicion['campos']}
+
+
+# Separa altas, actualizaciones (solo con los campos que cambian) y filas iguales a las guardadas
+# por clave natural. Las filas sin clave siempre son altas; una clave repetida en el lote o que ya
+# existe (sin upsert) es un error de la fila.
+def _por_clave(lote: _Lote, modo: str, nombre: str) -> tuple:
+    definicion = lote.definicion
+    clave = definicion['clave']
+    primeras = {}
+    for indice, valores in lote.validas():
+        valor = valores.get(clave)
+        if valor is None:
+            continue
+        if valor in primeras:
+            lote.error(indice, clave, f'Repetido en el lote (fila {primeras[valor]})')
+        else:
+            primeras[valor] = indice
+    existentes = _existentes(definicion['modelo'], clave, primeras)
+
+    altas, cambios, iguales = [], [], []
+    for indice, valores in lote.validas():
+        previas = existentes.get(valores.get(clave), [])
+        if len(previas) > 1:
+            lote.error(indice, clave, f'Hay {len(previas)} {nombre}s con ese valor')
+        elif previas and modo != 'upsert':
+            lote.error(indice, clave, f'Ya existe un {nombre} con ese valor')
+        elif not lote.completar(indice, alta=not previas):
+            continue
+        elif not previas:
+            altas.append((indice, None, valores))
+        else:
+            distintos = {campo: valor for campo, valor in valores.items() if getattr(previas[0], campo) != valor}
+            if distintos:
+                cambios.append((indice, previas[0], distintos))
+            else:
+                iguales.append((indice, previas[0]))
+    for indice, previo in iguales:
+        lote.ids[indice] = previo.id
+    lote.sin_cambios = len(iguales)
+    return altas, cambios
+
+
+def _cierres_cerrados(fechas) -> set:
+    tabla = CierreCaja.__table__
+    cerradas = set()
+    for parte in _partes(fechas):
+        cerradas.update(db.session.execute(
+            select(tabla.c.fecha).where(tabla.c.fecha.in_(parte), tabla.c.estado_abierta.is_(False))
+        ).scalars())
+    return cerradas
+
+
+def _controlar_referencias(lote: _Lote, campos: dict) -> None:
+    for campo, modelo in campos.items():
+        existentes = _ids_existentes(modelo, {v[campo] for _, v in lote.validas() if v.get(campo) is not None})
+        for indice, valores in lote.validas():
+            if valores.get(campo) is not None and valores[campo] not in existentes:
+                lote.error(indice, campo, f'No existe el registro {valores[campo]}')
+
+
+# ---------- Cargas por entidad ----------
+
+def _productos(lote: _Lote, modo: str) -> None:
+    altas, cambios = _por_clave(lote, modo, 'producto')
+    if not lote.puede_escribir():
+        return
+    conexion = db.session.connection()
+    atributos = ('categoria', 'cantidad', 'precio_unitario', 'stock_minimo')
+
+    filas = [dict(_columnas(lote, v), bajo_stock=v['cantidad'] <= v['stock_minimo']) for _, _, v in altas]
+    ids = _insertar(Producto, filas)
+    for (indice, _, _), producto_id in zip(altas, ids):
+        lote.ids[indice] = producto_id
+    # El stock inicial queda en el libro como alta, igual que en el formulario
+    iniciales = [
+        {'producto_id': producto_id, 'receta_id': None, 'fecha': datetime.now(), 'cantidad': fila['cantidad'],
+         'motivo': 'alta', 'stock_resultante': fila['cantidad']}
+        for producto_id, fila in zip(ids, filas) if fila['cantidad']
+    ]
+    if iniciales:
+        conexion.execute(MovimientoStock.__table__.insert(), iniciales)
+    valuacion = [(None, {a: fila[a] for a in atributos}) for fila in filas]
+
+    # Actualizaciones: los campos enviados salvo la cantidad, que pasa por el libro de movimientos
+    cambios_filas, movimientos = [], []
+    for indice, previo, valores in cambios:
+        lote.ids[indice] = previo.id
+        datos = {campo: valor for campo, valor in valores.items() if campo != 'cantidad'}
+        anterior = {a: getattr(previo, a) for a in atributos}
+        nuevo = dict(anterior, **{a: datos[a] for a in atributos if a in datos})
+        datos.update(id=previo.id, bajo_stock=nuevo['cantidad'] <= nuevo['stock_minimo'])
+        cambios_filas.append(datos)
+        valuacion.append((anterior, nuevo))
+        diferencia = valores.get('cantidad', previo.cantidad) - previo.cantidad
+        if diferencia:
+            movimientos.append({'producto_id': previo.id, 'cantidad': diferencia,
+                                'motivo': 'reposicion' if diferencia > 0 else 'ajuste'})
+    _actualizar(Producto, cambios_filas)
+    acumular_cambios(conexion, valuacion)
+    mover_stock_lote(movimientos)
+
+    reindexar_lote(conexion, 'producto', [lote.ids[indice] for indice, _, _ in altas + cambios])
+    lote.creados, lote.actualizados = len(altas), len(cambios)
+
+
+def _personas(lote: _Lote, modo: str, modelo, entidad: str, nombre: str, dependientes: str) -> None:
+    altas, cambios = _por_clave(lote, modo, nombre)
+    if not lote.puede_escribir():
+        return
+    ids = _insertar(modelo, [_columnas(lote, v) for _, _, v in altas])
+    for (indice, _, _), id_ in zip(altas, ids):
+        lote.ids[indice] = id_
+    for indice, previo, _ in cambios:
+        lote.ids[indice] = previo.id
+    _actualizar(modelo, [dict(valores, id=previo.id) for _, previo, valores in cambios])
+
+    conexion = db.session.connection()
+    reindexar_lote(conexion, entidad, ids)
+    reindexar_lote(conexion, entidad, [previo.id for _, previo, _ in cambios], dependientes=dependientes)
+    lote.creados, lote.actualizados = len(altas), len(cambios)
+
+
+def _pacientes(lote: _Lote, modo: str) -> None:
+    _personas(lote, modo, Paciente, 'paciente', 'paciente', 'paciente_id')
+
+
+def _medicos(lote: _Lote, modo: str) -> None:
+    _personas(lote, modo, Medico, 'medico', 'médico', 'medico_id')
+    if lote.creados or lote.actualizados:
+        invalidar({('medico', None)})
+
+
+def _recetas(lote: _Lote, modo: str) -> None:
+    for indice, _ in lote.validas():
+        lote.completar(indice, alta=True)
+    _controlar_referencias(lote, {'paciente_id': Paciente, 'medico_id': Medico, 'armazon_id': Producto})
+
+    # Cada receta con armazón vende una unidad: las que superan el stock actual se rechazan
+    armazones = {v['armazon_id'] for _, v in lote.validas() if v.get('armazon_id')}
+    stock = {}
+    for parte in _partes(armazones):
+        stock.update(db.session.execute(
+            select(Producto.id, Producto.cantidad).where(Producto.id.in_(parte))
+        ).all())
+    for indice, valores in lote.validas():
+        armazon_id = valores.get('armazon_id')
+        if armazon_id:
+            if stock[armazon_id] < 1:
+                lote.error(indice, 'armazon_id', 'Sin stock disponible')
+            else:
+                stock[armazon_id] -= 1
+    if not lote.puede_escribir():
+        return
+
+    validas = lote.validas()
+    filas = [
+        dict(_columnas(lote, v), total_pagado=0, saldo=v['total'], descuento_aplicado=0,
+             fecha_ultimo_pago=None, fecha_orden=v['fecha'])
+        for _, v in validas
+    ]
+    ids = _insertar(Receta, filas)
+    for (indice, _), receta_id in zip(validas, ids):
+        lote.ids[indice] = receta_id
+    mover_stock_lote([
+        {'producto_id': fila['armazon_id'], 'cantidad': -1, 'motivo': 'venta', 'receta_id': receta_id}
+        for fila, receta_id in zip(filas, ids) if fila['armazon_id']
+    ])
+
+    reindexar_lote(db.session.connection(), 'receta', ids)
+    invalidar({('receta', fila['fecha']) for fila in filas})
+    lote.creados = len(ids)
+
+
+def _pagos(lote: _Lote, modo: str) -> None:
+    for indice, valores in lote.validas():
+        if lote.completar(indice, alta=True) and valores['monto'] <= 0:
+            lote.error(indice, 'monto', 'Debe ser mayor a 0')
+    _controlar_referencias(lote, {'receta_id': Receta})
+    cerradas = _cierres_cerrados({v['fecha'] for _, v in lote.validas()})
+
+    # Mismas reglas que la caja: el primer pago con descuento lo aplica al total de la receta
+    # y ningún pago puede superar el saldo restante
+    receta_ids = {v['receta_id'] for _, v in lote.validas()}
+    recetas, con_pagos = {}, set()
+    for parte in _partes(receta_ids):
+        for fila in db.session.execute(
+            select(Receta.id, Receta.fecha, Receta.total, Receta.total_pagado).where(Receta.id.in_(parte))
+        ):
+            recetas[fila.id] = {'fecha': fila.fecha, 'total': fila.total or CERO, 'pagado': fila.total_pagado or CERO}
+        con_pagos.update(db.session.execute(
+            select(Pago.receta_id).where(Pago.receta_id.in_(parte)).distinct()
+        ).scalars())
+    totales = {}
+    for indice, valores in lote.validas():
+        if valores['fecha'] in cerradas:
+            lote.error(indice, 'fecha', f"La caja del {valores['fecha'].isoformat()} está cerrada")
+            continue
+        receta = recetas[valores['receta_id']]
+        total = receta['total']
+        if valores['receta_id'] not in con_pagos and valores['descuento'] > 0:
+            total = neto(total, valores['descuento'])
+        if valores['monto'] > total - receta['pagado']:
+            lote.error(indice, 'monto', f"Supera el saldo restante de la receta ({total - receta['pagado']:.2f})")
+            continue
+        if total != receta['total']:
+            totales[valores['receta_id']] = total
+        receta.update(total=total, pagado=receta['pagado'] + valores['monto'])
+        con_pagos.add(valores['receta_id'])
+    if not lote.puede_escribir():
+        return
+
+    validas = lote.validas()
+    filas = [_columnas(lote, v) for _, v in validas]
+    ids = _insertar(Pago, filas)
+    for (indice, _), pago_id in zip(validas, ids):
+        lote.ids[indice] = pago_id
+    actualizar_saldos({fila['receta_id'] for fila in filas}, totales)
+    acumular_lote(db.session.connection(), pagos=filas)
+    invalidar({('pago', fila['fecha']) for fila in filas}
+              | {('comision', recetas[fila['receta_id']]['fecha']) for fila in filas})
+    lote.creados = len(ids)
+
+
+def _gastos(lote: _Lote, modo: str) -> None:
+    for indice, _ in lote.validas():
+        lote.completar(indice, alta=True)
+    cerradas = _cierres_cerrados({v['fecha'] for _, v in lote.validas()})
+    for indice, valores in lote.validas():
+        if valores['fecha'] in cerradas:
+            lote.error(indice, 'fecha', f"La caja del {valores['fecha'].isoformat()} está cerrada")
+    if not lote.puede_escribir():
+        return
+
+    validas = lote.validas()
+    filas = [_columnas(lote, v) for _, v in validas]
+    ids = _insertar(Gasto, filas)
+    for (indice, _), gasto_id in zip(validas, ids):
+        lote.ids[indice] = gasto_id
+    acumular_lote(db.session.connection(), gastos=filas)
+    invalidar({('gasto', fila['fecha']) for fila in filas})
+    lote.creados = len(ids)
+
+
+CARGAS = {
+    'productos': _productos,
+    'pacientes': _pacientes,
+    'medicos': _medicos,
+    'recetas': _recetas,
+    'pagos': _pagos,
+    'gastos': _gastos,
+}
+
+
+# Valida y escribe `filas` (dicts) de la entidad en la transacción en curso. Con `todo_o_nada`
+# no escribe nada si alguna fila tiene errores. Devuelve {'creados', 'actualizados', 'sin_cambios'
+# (upsert de filas iguales a las guardadas, que no se reescriben), 'ids' (por fila, None si no se
+# guardó), 'errores' ([{'fila', 'errores': {campo: mensaje}}])}.
+# Lanza ValueError si la entidad, el modo o la cantidad de filas no son válidos, o si el stock
+# cambió durante la carga (en ese caso hay que descartar la transacción).
+def cargar(entidad: str, filas: list, modo: str = 'insertar', todo_o_nada: bool = False) -> dict:
+    if entidad not in CARGAS:
+        raise ValueError(f"Entidad inválida. Use una de: {', '.join(CARGAS)}")
+    if modo not in MODOS:
+        raise ValueError(f"Modo inválido. Use uno de: {', '.join(MODOS)}")
+    if modo == 'upsert' and not ENTIDADES[entidad]['clave']:
+        raise ValueError(f'{entidad} no admite upsert: solo altas')
+    if len(filas) > MAX_FILAS:
+        raise ValueError(f'Máximo {MAX_FILAS} filas por carga')
+    lote = _Lote(entidad, filas, todo_o_nada)
+    CARGAS[entidad](lote, modo)
+    return lote.resultado()
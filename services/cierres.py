@@ -0,0 +1,209 @@
+from datetime import date
+from sqlalchemy import func, or_, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from dinero import CERO, neto_sql, suma
+from models.models import db, CierreCaja, CierreCajaDetalle, Pago, ResumenDiario
+
+# Cierres de caja diarios. Los totales netos por método salen del resumen diario (sumas exactas
+# en centavos, ver services/resumenes.py), así el cierre coincide con los reportes. Cada cierre
+# guarda un detalle por método de pago (CierreCajaDetalle), además de las columnas de efectivo,
+# tarjeta, transferencia y total general. Un cierre se puede hacer desde la caja, con
+# `flask cerrar-caja` o con la tarea diaria (tareas.py), que además cierra los días anteriores que
+# quedaron sin cerrar. Cerrar es idempotente: un día ya cerrado solo se concilia (se corrigen sus
+# totales si cambiaron los pagos).
+
+# Método de pago -> columna del cierre; todos los métodos quedan además en el detalle del cierre
+COLUMNAS = {'Efectivo': 'total_efectivo', 'Tarjeta': 'total_tarjeta', 'Transferencia': 'total_transferencia'}
+CAMPOS = ('total_efectivo', 'total_tarjeta', 'total_transferencia', 'total_general')
+LOTE = 500
+
+
+# Recaudación neta por día y método de pago entre `desde` y `hasta` (inclusive), con una sola
+# consulta: {fecha: {metodo: (cantidad_pagos, total)}}, cualquiera sea el método. Se lee del
+# resumen diario (una fila por día y método); con `desde_pagos=True` se recalcula desde los pagos
+# con GROUP BY fecha, metodo_pago, para controlar los cierres contra los datos originales.
+# Los días sin pagos no aparecen.
+def recaudacion_por_metodo(desde: date, hasta: date, desde_pagos: bool = False) -> dict:
+    if desde_pagos:
+        consulta = (
+            db.session.query(Pago.fecha, Pago.metodo_pago, func.count(Pago.id), suma(neto_sql(Pago.monto, Pago.descuento)))
+            .filter(Pago.fecha >= desde, Pago.fecha <= hasta)
+            .group_by(Pago.fecha, Pago.metodo_pago)
+        )
+    else:
+        consulta = (
+            db.session.query(ResumenDiario.fecha, ResumenDiario.metodo_pago,
+                             ResumenDiario.cantidad_pagos, ResumenDiario.ingresos_netos)
+            .filter(ResumenDiario.fecha >= desde, ResumenDiario.fecha <= hasta, ResumenDiario.cantidad_pagos > 0)
+        )
+    recaudacion = {}
+    for fecha, metodo, cantidad, total in consulta:
+        recaudacion.setdefault(fecha, {})[metodo or ''] = (cantidad, total)
+    return recaudacion
+
+
+# Columnas del cierre a partir de la recaudación por método de un día
+def totales(metodos: dict) -> dict:
+    valores = dict.fromkeys(CAMPOS, CERO)
+    for metodo, (_, total) in metodos.items():
+        if metodo in COLUMNAS:
+            valores[COLUMNAS[metodo]] += total
+        valores['total_general'] += total
+    return valores
+
+
+# Deja el detalle de `cierre` igual a `metodos`; devuelve True si cambió algo
+def _conciliar_detalle(cierre: CierreCaja, metodos: dict) -> bool:
+    actuales = {detalle.metodo_pago: detalle for detalle in cierre.detalles}
+    cambio = False
+    for metodo, (cantidad, total) in metodos.items():
+        detalle = actuales.pop(metodo, None)
+        if detalle is None:
+            cierre.detalles.append(CierreCajaDetalle(metodo_pago=metodo, cantidad_pagos=cantidad, total=total))
+            cambio = True
+        elif (detalle.cantidad_pagos, detalle.total) != (cantidad, total):
+            detalle.cantidad_pagos, detalle.total = cantidad, total
+            cambio = True
+    for detalle in actuales.values():
+        cierre.detalles.remove(detalle)
+        cambio = True
+    return cambio
+
+
+# Cierra los días de `dias` (o los concilia si ya estaban cerrados) dentro de la transacción en
+# curso. Devuelve {día: 'cerrado' | 'conciliado' | 'sin_cambios'}.
+def _cerrar(dias: list, desde_pagos: bool = False) -> dict:
+    recaudacion = recaudacion_por_metodo(min(dias), max(dias), desde_pagos)
+    existentes = {
+        c.fecha: c
+        for c in CierreCaja.query.options(selectinload(CierreCaja.detalles)).filter(CierreCaja.fecha.in_(dias))
+    }
+    estados = {}
+    for dia in dias:
+        metodos = recaudacion.get(dia, {})
+        valores = totales(metodos)
+        cierre = existentes.get(dia)
+        if cierre is None:
+            cierre = CierreCaja(fecha=dia, estado_abierta=False, **valores)
+            _conciliar_detalle(cierre, metodos)
+            db.session.add(cierre)
+            estados[dia] = 'cerrado'
+            continue
+        cambios = {campo: valor for campo, valor in valores.items() if getattr(cierre, campo) != valor}
+        for campo, valor in cambios.items():
+            setattr(cierre, campo, valor)
+        cambio_detalle = _conciliar_detalle(cierre, metodos)
+        if cierre.estado_abierta:
+            cierre.estado_abierta = False
+            estados[dia] = 'cerrado'
+        else:
+            estados[dia] = 'conciliado' if cambios or cambio_detalle else 'sin_cambios'
+    return estados
+
+
+# Cierra (o concilia) los días indicados, por lotes y con un commit por lote. Si otro proceso
+# crea el cierre de un día al mismo tiempo (fecha única), el lote se reintenta una vez. Con
+# `desde_pagos=True` los totales se recalculan desde los pagos en lugar del resumen diario.
+def cerrar_dias(dias, desde_pagos: bool = False) -> dict:
+    dias = sorted(set(dias))
+    estados = {}
+    for i in range(0, len(dias), LOTE):
+        parte = dias[i:i + LOTE]
+        for intento in range(2):
+            try:
+                resultado = _cerrar(parte, desde_pagos)
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                if intento:
+                    raise
+        estados.update(resultado)
+    return estados
+
+
+def cerrar_dia(dia: date) -> str:
+    return cerrar_dias([dia])[dia]
+
+
+# Días hasta `hasta` (inclusive) con pagos y sin cierre, o con el cierre todavía abierto
+def dias_pendientes(hasta: date, desde: date = None) -> list:
+    con_pagos = (
+        db.session.query(ResumenDiario.fecha)
+        .outerjoin(CierreCaja, CierreCaja.fecha == ResumenDiario.fecha)
+        .filter(ResumenDiario.fecha <= hasta, ResumenDiario.cantidad_pagos > 0,
+                or_(CierreCaja.id.is_(None), CierreCaja.estado_abierta == True))  # noqa: E712
+    )
+    abiertos = db.session.query(CierreCaja.fecha).filter(CierreCaja.fecha <= hasta, CierreCaja.estado_abierta == True)  # noqa: E712
+    if desde is not None:
+        con_pagos = con_pagos.filter(ResumenDiario.fecha >= desde)
+        abiertos = abiertos.filter(CierreCaja.fecha >= desde)
+    return sorted({fecha for fecha, in con_pagos.distinct()} | {fecha for fecha, in abiertos})
+
+
+# Cierra los días pendientes hasta `hasta` (por ejemplo, los que nadie cerró desde la caja).
+# Devuelve la cantidad de días cerrados.
+def cerrar_pendientes(hasta: date, desde: date = None) -> int:
+    dias = dias_pendientes(hasta, desde)
+    if not dias:
+        return 0
+    return sum(1 for estado in cerrar_dias(dias).values() if estado == 'cerrado')
+
+
+# Completa el detalle por método de los cierres que no lo tienen con la recaudación de su día en
+# el resumen diario, con un solo INSERT ... SELECT (migración 9 y tools/generar_datos.py)
+def completar_detalles(conn) -> int:
+    return conn.execute(text(
+        "INSERT INTO cierre_caja_detalle (cierre_id, metodo_pago, cantidad_pagos, total) "
+        "SELECT c.id, r.metodo_pago, r.cantidad_pagos, r.ingresos_netos "
+        "FROM cierre_caja c JOIN resumen_diario r ON r.fecha = c.fecha "
+        "WHERE r.cantidad_pagos > 0 "
+        "AND NOT EXISTS (SELECT 1 FROM cierre_caja_detalle d WHERE d.cierre_id = c.id)"
+    )).rowcount
+
+
+# ---------- Control de cierres ----------
+
+# Compara un cierre (con su detalle cargado) con la recaudación por método recalculada desde los
+# pagos de su día (`metodos`, como en recaudacion_por_metodo). Solo un cierre cerrado puede estar
+# descuadrado: uno reabierto se actualiza al volver a cerrarlo.
+def controlar(cierre: CierreCaja, metodos: dict) -> dict:
+    guardado = {detalle.metodo_pago: detalle.total for detalle in cierre.detalles}
+    calculado = {metodo: total for metodo, (_, total) in metodos.items()}
+    diferencias = {
+        metodo: {'guardado': guardado.get(metodo, CERO), 'calculado': calculado.get(metodo, CERO)}
+        for metodo in sorted(guardado.keys() | calculado.keys())
+        if guardado.get(metodo, CERO) != calculado.get(metodo, CERO)
+    }
+    total_guardado = cierre.total_general or CERO
+    total_calculado = sum(calculado.values(), CERO)
+    return {
+        'fecha': cierre.fecha,
+        'estado_abierta': bool(cierre.estado_abierta),
+        'total_guardado': total_guardado,
+        'total_calculado': total_calculado,
+        'diferencias': diferencias,
+        'descuadrado': not cierre.estado_abierta and (bool(diferencias) or total_guardado != total_calculado),
+    }
+
+
+# Controla los cierres dados contra los pagos, con una sola consulta agrupada para todo su rango
+def controlar_cierres(cierres: list) -> list:
+    if not cierres:
+        return []
+    fechas = [cierre.fecha for cierre in cierres]
+    recaudacion = recaudacion_por_metodo(min(fechas), max(fechas), desde_pagos=True)
+    return [controlar(cierre, recaudacion.get(cierre.fecha, {})) for cierre in cierres]
+
+
+# Auditoría de los cierres entre `desde` y `hasta` (todos, si no se indican) en una pasada: los
+# cierres con su detalle (selectinload) y una consulta agrupada sobre los pagos de todo el rango,
+# sin consultas por día. Devuelve el control de cada cierre, por fecha.
+def auditar_cierres(desde: date = None, hasta: date = None) -> list:
+    query = CierreCaja.query.options(selectinload(CierreCaja.detalles))
+    if desde is not None:
+        query = query.filter(CierreCaja.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(CierreCaja.fecha <= hasta)
+    return controlar_cierres(query.order_by(CierreCaja.fecha).all())
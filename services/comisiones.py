@@ -0,0 +1,64 @@
+from datetime import date
+from sqlalchemy import extract
+from dinero import porcentaje as aplicar_porcentaje, suma
+from models.models import db, Medico, Receta, Pago
+from services.series import monto_neto
+
+
+# Comisiones por médico para las recetas emitidas entre `desde` y `hasta` (inclusive),
+# sobre los pagos NETOS de esas recetas. Un único JOIN agrupado Medico/Receta/Pago;
+# los médicos sin recetas en el período aparecen con 0. El médico va como dict (id, apellido,
+# nombre) para que el resultado se pueda cachear fuera de la sesión. La comisión se redondea
+# una vez sobre los pagos netos del médico (ver dinero.py).
+def comisiones_por_medico(desde: date, hasta: date) -> list:
+    filas = (
+        db.session.query(Medico, suma(monto_neto()))
+        .outerjoin(Receta, (Receta.medico_id == Medico.id) & (Receta.fecha >= desde) & (Receta.fecha <= hasta))
+        .outerjoin(Pago, Pago.receta_id == Receta.id)
+        .group_by(Medico.id)
+        .order_by(Medico.id)
+        .all()
+    )
+    comisiones = []
+    for medico, pagos_netos in filas:
+        porcentaje = medico.porcentaje_comision or 0
+        comisiones.append({
+            'medico': {'id': medico.id, 'apellido': medico.apellido, 'nombre': medico.nombre},
+            'porcentaje': porcentaje,
+            'pagos_netos': pagos_netos,
+            'comision': aplicar_porcentaje(pagos_netos, porcentaje),
+        })
+    return comisiones
+
+
+# Comisiones por médico y por mes (según la fecha de la receta) para todo el rango,
+# en una sola consulta. Pensado para exportar un año completo de liquidaciones.
+def comisiones_mensuales(desde: date, hasta: date) -> list:
+    año = extract('year', Receta.fecha)
+    mes = extract('month', Receta.fecha)
+    filas = (
+        db.session.query(
+            año, mes,
+            Medico.id, Medico.apellido, Medico.nombre, Medico.matricula, Medico.porcentaje_comision,
+            suma(monto_neto()),
+        )
+        .join(Receta, Receta.medico_id == Medico.id)
+        .outerjoin(Pago, Pago.receta_id == Receta.id)
+        .filter(Receta.fecha >= desde, Receta.fecha <= hasta)
+        .group_by(año, mes, Medico.id, Medico.apellido, Medico.nombre, Medico.matricula, Medico.porcentaje_comision)
+        .order_by(año, mes, Medico.apellido, Medico.nombre)
+        .all()
+    )
+    return [
+        {
+            'año': int(a),
+            'mes': int(m),
+            'medico_id': medico_id,
+            'medico': f"{apellido}, {nombre}",
+            'matricula': matricula,
+            'porcentaje': porcentaje or 0,
+            'pagos_netos': pagos_netos,
+            'comision': aplicar_porcentaje(pagos_netos, porcentaje),
+        }
+        for a, m, medico_id, apellido, nombre, matricula, porcentaje, pagos_netos in filas
+    ]
@@ -0,0 +1,56 @@
+import csv
+from datetime import date
+from io import StringIO
+from sqlalchemy.orm import joinedload
+from models.models import Receta, Pago, Gasto
+
+ENCABEZADO_CAJA = ['Tipo', 'Fecha', 'Paciente', 'Medico', 'Metodo', 'Monto', 'Detalle']
+
+
+# Genera el CSV de caja (pagos y gastos) entre `desde` y `hasta` (inclusive) en bloques de texto.
+# Los pagos se leen en lotes con `yield_per`, con receta, paciente y médico cargados en la misma
+# consulta, así la memoria no crece con el rango y no hay consultas por fila.
+def csv_caja(desde: date, hasta: date, tamaño_lote: int = 1000):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def vaciar():
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return texto
+
+    writer.writerow(ENCABEZADO_CAJA)
+    yield vaciar()
+
+    pagos = (
+        Pago.query
+        .options(
+            joinedload(Pago.receta).joinedload(Receta.paciente),
+            joinedload(Pago.receta).joinedload(Receta.medico),
+        )
+        .filter(Pago.fecha >= desde, Pago.fecha <= hasta)
+        .order_by(Pago.fecha, Pago.id)
+        .yield_per(tamaño_lote)
+    )
+    for i, p in enumerate(pagos, start=1):
+        paciente = p.receta.paciente if p.receta else None
+        medico = p.receta.medico if p.receta else None
+        paciente_txt = f"{paciente.apellido or ''}, {paciente.nombre or ''}" if paciente else ''
+        medico_txt = f"{medico.apellido or ''}, {medico.nombre or ''}" if medico else ''
+        writer.writerow(['Pago', p.fecha, paciente_txt, medico_txt, p.metodo_pago, p.monto, f"Receta #{p.receta_id}"])
+        if i % tamaño_lote == 0:
+            yield vaciar()
+
+    gastos = (
+        Gasto.query
+        .filter(Gasto.fecha >= desde, Gasto.fecha <= hasta)
+        .order_by(Gasto.fecha, Gasto.id)
+        .yield_per(tamaño_lote)
+    )
+    for i, g in enumerate(gastos, start=1):
+        writer.writerow(['Gasto', g.fecha, '', '', '', -g.monto, f"{g.categoria or ''} - {g.descripcion or ''}"])
+        if i % tamaño_lote == 0:
+            yield vaciar()
+
+    yield vaciar()
@@ -0,0 +1,71 @@
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload, selectinload
+from dinero import suma
+from models.models import db, Receta
+from services.paginacion import paginar
+
+# Historia de un paciente: sus recetas con médico, armazón y pagos, el saldo pendiente y la
+# evolución de la graduación. Las recetas se paginan por clave (fecha, id), así un paciente con
+# décadas de recetas cuesta lo mismo que uno nuevo, y cada página se arma con una cantidad fija de
+# consultas: la página (médico y armazón en el mismo JOIN), los pagos de todas sus recetas
+# (selectinload), los totales del paciente y la graduación.
+
+RECETAS_POR_PAGINA = 20
+
+
+# Recetas del paciente, de la más reciente a la más antigua, con sus pagos en orden de fecha.
+# Lanza ValueError si el cursor no es válido.
+def recetas_del_paciente(paciente_id: int, despues: str = None, antes: str = None,
+                         por_pagina: int = RECETAS_POR_PAGINA) -> dict:
+    query = (
+        Receta.query
+        .options(joinedload(Receta.medico), joinedload(Receta.armazon), selectinload(Receta.pagos))
+        .filter(Receta.paciente_id == paciente_id)
+    )
+    return paginar(query, [Receta.fecha.desc(), Receta.id.desc()], despues=despues, antes=antes, por_pagina=por_pagina)
+
+
+# Totales de todas las recetas del paciente con una consulta agrupada (saldos materializados)
+def totales_del_paciente(paciente_id: int) -> dict:
+    recetas, total, pagado, saldo, ultima = (
+        db.session.query(func.count(Receta.id), suma(Receta.total), suma(Receta.total_pagado), suma(Receta.saldo),
+                         func.max(Receta.fecha))
+        .filter(Receta.paciente_id == paciente_id)
+        .one()
+    )
+    return {'recetas': recetas, 'total': total, 'pagado': pagado, 'saldo': saldo, 'ultima_receta': ultima}
+
+
+# Graduación a lo largo del tiempo (recetas con medidas), de la más antigua a la más reciente.
+# `cambio_od` / `cambio_os` marcan las medidas distintas de la receta anterior.
+def graduacion_del_paciente(paciente_id: int) -> list:
+    filas = (
+        db.session.query(Receta.id, Receta.fecha, Receta.tipo_lente, Receta.medida_od, Receta.medida_os)
+        .filter(Receta.paciente_id == paciente_id,
+                or_(func.coalesce(Receta.medida_od, '') != '', func.coalesce(Receta.medida_os, '') != ''))
+        .order_by(Receta.fecha, Receta.id)
+        .all()
+    )
+    graduacion = []
+    anterior = None
+    for receta_id, fecha, tipo_lente, od, os_ in filas:
+        graduacion.append({
+            'receta_id': receta_id,
+            'fecha': fecha,
+            'tipo_lente': tipo_lente,
+            'medida_od': od,
+            'medida_os': os_,
+            'cambio_od': anterior is not None and od != anterior['medida_od'],
+            'cambio_os': anterior is not None and os_ != anterior['medida_os'],
+        })
+        anterior = graduacion[-1]
+    return graduacion
+
+
+def historia_paciente(paciente_id: int, despues: str = None, antes: str = None,
+                      por_pagina: int = RECETAS_POR_PAGINA) -> dict:
+    return {
+        'recetas': recetas_del_paciente(paciente_id, despues, antes, por_pagina),
+        'totales': totales_del_paciente(paciente_id),
+        'graduacion': graduacion_del_paciente(paciente_id),
+    }
@@ -0,0 +1,168 @@
+import csv
+import io
+import itertools
+import time
+import unicodedata
+from models.models import db
+from services.carga_masiva import ENTIDADES, cargar
+
+# Importación de productos y pacientes desde archivos CSV o XLSX (alta de una sucursal nueva).
+# El archivo se lee fila a fila y se escribe por lotes de `tamaño_lote` con la carga masiva
+# (services/carga_masiva.py), con un commit por lote: la memoria depende del tamaño del lote y
+# no del archivo. La primera fila son los encabezados (nombres de campo, sin importar mayúsculas
+# ni acentos, o sus alias); las columnas desconocidas se ignoran y las celdas vacías no se
+# importan (en el upsert no borran el valor guardado). Las claves repetidas en el archivo
+# (código, DNI) se rechazan aunque estén en lotes distintos.
+# XLSX requiere openpyxl (opcional, `pip install openpyxl`).
+
+IMPORTABLES = ('productos', 'pacientes')
+TAMAÑO_LOTE = 1000
+MAX_ERRORES = 200  # detalle guardado; el resto solo se cuenta
+
+ALIAS = {
+    'productos': {'precio': 'precio_unitario', 'stock': 'cantidad', 'minimo': 'stock_minimo'},
+    'pacientes': {'documento': 'dni', 'nacimiento': 'fecha_nacimiento', 'telefono': 'contacto'},
+}
+
+
+def _normalizar(encabezado) -> str:
+    texto = unicodedata.normalize('NFKD', str(encabezado or '').strip().lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return '_'.join(texto.replace('-', ' ').split())
+
+
+# Filas de un CSV (UTF-8, con o sin BOM; separador coma, punto y coma o tabulador)
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    encabezado = texto.readline()
+    try:
+        dialecto = csv.Sniffer().sniff(encabezado, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    return csv.reader(itertools.chain([encabezado], texto), dialecto)
+
+
+# Filas de la primera hoja de un XLSX, en modo de solo lectura (no carga la hoja entera)
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Para importar archivos XLSX instale openpyxl (pip install openpyxl)') from None
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for fila in libro.worksheets[0].iter_rows(values_only=True):
+            # Excel guarda los números como float: un código 1001 llega como 1001.0
+            yield [int(v) if isinstance(v, float) and v.is_integer() else v for v in fila]
+    finally:
+        libro.close()
+
+
+def _leer(archivo, nombre: str):
+    extension = nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else ''
+    if extension == 'xlsx':
+        return _filas_xlsx(archivo)
+    if extension in ('csv', 'txt'):
+        return _filas_csv(archivo)
+    raise ValueError('Formato no soportado. Use un archivo .csv o .xlsx')
+
+
+def _columnas(entidad: str, encabezados: list) -> tuple:
+    campos = ENTIDADES[entidad]['campos']
+    columnas, ignoradas = [], []
+    for encabezado in encabezados:
+        campo = _normalizar(encabezado)
+        campo = ALIAS[entidad].get(campo, campo)
+        if campo in campos and campo not in columnas:
+            columnas.append(campo)
+        else:
+            columnas.append(None)
+            if encabezado not in (None, ''):
+                ignoradas.append(str(encabezado))
+    return columnas, ignoradas
+
+
+# Importa `archivo` (binario, abierto) de la entidad y devuelve el estado de la importación
+# después de cada lote, para informar el progreso: {'filas', 'creados', 'actualizados',
+# 'sin_cambios', 'errores' (cantidad), 'detalle_errores' ([{'fila', 'errores'}], los primeros MAX_ERRORES),
+# 'columnas_ignoradas', 'segundos', 'terminado'}. El primero sale al leer los encabezados (así
+# un archivo inválido falla antes de escribir) y el último con 'terminado' en True. Con `simular`
+# valida y escribe cada lote pero lo descarta.
+def importar_por_lotes(entidad: str, archivo, nombre: str, modo: str = 'upsert',
+                       tamaño_lote: int = TAMAÑO_LOTE, simular: bool = False):
+    if entidad not in IMPORTABLES:
+        raise ValueError(f"Entidad inválida. Use una de: {', '.join(IMPORTABLES)}")
+    if tamaño_lote < 1:
+        raise ValueError('El tamaño de lote debe ser mayor a 0')
+    inicio = time.perf_counter()
+    filas = _leer(archivo, nombre)
+    columnas, ignoradas = _columnas(entidad, next(filas, []))
+    if not any(columnas):
+        raise ValueError('El archivo no tiene columnas reconocibles en la primera fila')
+    clave = ENTIDADES[entidad]['clave']
+
+    estado = {'filas': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0, 'errores': 0, 'detalle_errores': [],
+              'columnas_ignoradas': ignoradas, 'segundos': 0.0, 'terminado': False}
+    vistas = {}  # clave -> fila de su primera aparición en el archivo
+    yield estado
+
+    def error(linea: int, errores: dict) -> None:
+        estado['errores'] += 1
+        if len(estado['detalle_errores']) < MAX_ERRORES:
+            estado['detalle_errores'].append({'fila': linea, 'errores': errores})
+
+    def escribir(lote: list, lineas: list) -> None:
+        try:
+            resultado = cargar(entidad, lote, modo=modo)
+        except ValueError as exc:
+            # El stock cambió durante la carga: se descarta solo este lote
+            db.session.rollback()
+            for linea in lineas:
+                error(linea, {'lote': str(exc)})
+            return
+        if simular:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        estado['creados'] += resultado['creados']
+        estado['actualizados'] += resultado['actualizados']
+        estado['sin_cambios'] += resultado['sin_cambios']
+        for fallida in resultado['errores']:
+            error(lineas[fallida['fila']], fallida['errores'])
+
+    lote, lineas = [], []
+    for linea, fila in enumerate(filas, start=2):
+        valores = {}
+        for campo, valor in zip(columnas, fila):
+            if isinstance(valor, str):
+                valor = valor.strip()
+            if campo and valor not in (None, ''):
+                valores[campo] = valor
+        if not valores:
+            continue
+        estado['filas'] += 1
+        valor_clave = str(valores[clave]) if clave in valores else None
+        if valor_clave is not None:
+            if valor_clave in vistas:
+                error(linea, {clave: f'Repetido en el archivo (fila {vistas[valor_clave]})'})
+                continue
+            vistas[valor_clave] = linea
+        lote.append(valores)
+        lineas.append(linea)
+        if len(lote) >= tamaño_lote:
+            escribir(lote, lineas)
+            lote, lineas = [], []
+            estado['segundos'] = round(time.perf_counter() - inicio, 2)
+            yield estado
+    if lote:
+        escribir(lote, lineas)
+    estado['segundos'] = round(time.perf_counter() - inicio, 2)
+    estado['terminado'] = True
+    yield estado
+
+
+# Importación completa; `progreso`, si se pasa, recibe el estado parcial después de cada lote
+def importar(entidad: str, archivo, nombre: str, progreso=None, **opciones) -> dict:
+    for estado in importar_por_lotes(entidad, archivo, nombre, **opciones):
+        if progreso and estado['filas'] and not estado['terminado']:
+            progreso(estado)
+    return estado
@@ -0,0 +1,269 @@
+from datetime import datetime
+from sqlalchemy import bindparam, case, event, func, inspect, select, text
+from sqlalchemy.orm.attributes import set_committed_value
+from dinero import CERO
+from models.models import db, Producto, MovimientoStock, InventarioCategoria
+
+# Inventario: libro de movimientos de stock, marca de bajo stock y valuación por categoría.
+# - Todo cambio de stock pasa por `mover_stock`, que ajusta la cantidad de forma atómica y
+#   registra el movimiento.
+# - `Producto.bajo_stock` (cantidad <= stock_minimo) se recalcula antes de cada insert/update,
+#   así el widget del dashboard lee el índice (bajo_stock, cantidad) en lugar de comparar columnas.
+# - La tabla inventario_categoria acumula productos, unidades, valor y bajo stock por categoría,
+#   y se mantiene en el mismo flush con los deltas de cada producto (como el resumen diario).
+
+MOTIVOS = ('alta', 'venta', 'devolucion', 'reposicion', 'ajuste')
+
+
+# Suma `cantidad` (negativa para descontar) al stock del producto y registra el movimiento.
+# El cambio es un UPDATE condicional (cantidad = cantidad + n WHERE cantidad + n >= 0): dos ventas
+# simultáneas de la última unidad no pueden pasar las dos, la segunda no actualiza ninguna fila.
+# En PostgreSQL/MySQL el UPDATE bloquea la fila hasta el commit y la relectura usa FOR UPDATE;
+# en SQLite la transacción de escritura bloquea la base. Lanza ValueError si no hay stock.
+def mover_stock(producto: Producto, cantidad: int, motivo: str, receta=None) -> MovimientoStock:
+    if motivo not in MOTIVOS:
+        raise ValueError(f'Motivo de movimiento de stock inválido: {motivo}')
+    # Los cambios pendientes del producto (o el alta) se escriben antes, con sus eventos
+    db.session.flush()
+    tabla = Producto.__table__
+    resultado = db.session.execute(
+        tabla.update()
+        .where(tabla.c.id == producto.id, tabla.c.cantidad + cantidad >= 0)
+        .values(cantidad=tabla.c.cantidad + cantidad, bajo_stock=tabla.c.cantidad + cantidad <= tabla.c.stock_minimo)
+    )
+    if resultado.rowcount != 1:
+        raise ValueError(f'Sin stock disponible para {producto.nombre}')
+    fila = db.session.execute(
+        select(tabla.c.categoria, tabla.c.cantidad, tabla.c.precio_unitario, tabla.c.stock_minimo, tabla.c.bajo_stock)
+        .where(tabla.c.id == producto.id)
+        .with_for_update()
+    ).one()
+
+    # El UPDATE no pasa por los eventos del ORM: se ajusta la valuación y el objeto en memoria
+    conexion = db.session.connection()
+    aplicar_aporte(conexion, _aporte(fila.categoria, fila.cantidad - cantidad, fila.precio_unitario, fila.stock_minimo), -1)
+    aplicar_aporte(conexion, _aporte(fila.categoria, fila.cantidad, fila.precio_unitario, fila.stock_minimo))
+    set_committed_value(producto, 'cantidad', fila.cantidad)
+    set_committed_value(producto, 'bajo_stock', fila.bajo_stock)
+
+    movimiento = MovimientoStock(producto=producto, cantidad=cantidad, motivo=motivo, receta=receta,
+                                 stock_resultante=fila.cantidad)
+    db.session.add(movimiento)
+    return movimiento
+
+
+# Varios movimientos de stock de una vez (carga masiva): `movimientos` son dicts con producto_id,
+# cantidad, motivo y receta_id (opcional). Es el mismo UPDATE condicional que `mover_stock`, con la
+# suma de cada producto y ejecutado por lotes; si algún producto quedaría negativo (por ejemplo,
+# por una venta simultánea) lanza ValueError y la transacción se descarta entera.
+def mover_stock_lote(movimientos: list) -> None:
+    if not movimientos:
+        return
+    for movimiento in movimientos:
+        if movimiento['motivo'] not in MOTIVOS:
+            raise ValueError(f"Motivo de movimiento de stock inválido: {movimiento['motivo']}")
+    db.session.flush()
+    totales = {}
+    for movimiento in movimientos:
+        totales[movimiento['producto_id']] = totales.get(movimiento['producto_id'], 0) + movimiento['cantidad']
+
+    tabla = Producto.__table__
+    conexion = db.session.connection()
+    nueva = tabla.c.cantidad + bindparam('delta')
+    resultado = conexion.execute(
+        tabla.update()
+        .where(tabla.c.id == bindparam('producto'), nueva >= 0)
+        .values(cantidad=nueva, bajo_stock=nueva <= tabla.c.stock_minimo),
+        [{'producto': producto_id, 'delta': cantidad} for producto_id, cantidad in totales.items()],
+    )
+    if resultado.rowcount != len(totales):
+        raise ValueError('Sin stock disponible para uno o más productos del lote')
+
+    # Valuación y stock resultante de cada movimiento, a partir del stock final de cada producto
+    cambios, stock = [], {}
+    ids = sorted(totales)
+    for i in range(0, len(ids), 500):
+        for fila in conexion.execute(
+            select(tabla.c.id, tabla.c.categoria, tabla.c.cantidad, tabla.c.precio_unitario, tabla.c.stock_minimo)
+            .where(tabla.c.id.in_(ids[i:i + 500]))
+        ):
+            actual = {c: getattr(fila, c) for c in ('categoria', 'cantidad', 'precio_unitario', 'stock_minimo')}
+            cambios.append((dict(actual, cantidad=fila.cantidad - totales[fila.id]), actual))
+            stock[fila.id] = fila.cantidad - totales[fila.id]
+    acumular_cambios(conexion, cambios)
+
+    ahora = datetime.now()
+    filas = []
+    for movimiento in movimientos:
+        stock[movimiento['producto_id']] += movimiento['cantidad']
+        filas.append({
+            'producto_id': movimiento['producto_id'], 'receta_id': movimiento.get('receta_id'), 'fecha': ahora,
+            'cantidad': movimiento['cantidad'], 'motivo': movimiento['motivo'],
+            'stock_resultante': stock[movimiento['producto_id']],
+        })
+    conexion.execute(MovimientoStock.__table__.insert(), filas)
+
+
+# Pone el stock del producto en `cantidad` (edición manual): reposición si sube, ajuste si baja
+def fijar_stock(producto: Producto, cantidad: int):
+    diferencia = cantidad - (producto.cantidad or 0)
+    if diferencia:
+        return mover_stock(producto, diferencia, 'reposicion' if diferencia > 0 else 'ajuste')
+    return None
+
+
+# ---------- Marca de bajo stock ----------
+
+@event.listens_for(Producto, 'before_insert')
+@event.listens_for(Producto, 'before_update')
+def _marcar_bajo_stock(mapper, connection, target):
+    target.bajo_stock = (target.cantidad or 0) <= (target.stock_minimo or 0)
+
+
+# ---------- Valuación por categoría ----------
+
+# Valor anterior de los atributos aunque el objeto esté expirado (después de un commit)
+for _atributo in (Producto.categoria, Producto.cantidad, Producto.precio_unitario, Producto.stock_minimo):
+    event.listen(_atributo, 'set', lambda target, valor, anterior, iniciador: valor, active_history=True, retval=True)
+
+
+def _aporte(categoria, cantidad, precio_unitario, stock_minimo) -> tuple:
+    cantidad = cantidad or 0
+    return categoria or '', {
+        'productos': 1,
+        'unidades': cantidad,
+        'valor': cantidad * (precio_unitario or CERO),
+        'bajo_stock': 1 if cantidad <= (stock_minimo or 0) else 0,
+    }
+
+
+def _valor_previo(target, atributo):
+    historial = inspect(target).attrs[atributo].history
+    if historial.deleted:
+        return historial.deleted[0]
+    return getattr(target, atributo)
+
+
+def _aporte_producto(target, previo: bool = False) -> tuple:
+    atributos = ('categoria', 'cantidad', 'precio_unitario', 'stock_minimo')
+    if previo:
+        return _aporte(*(_valor_previo(target, a) for a in atributos))
+    return _aporte(*(getattr(target, a) for a in atributos))
+
+
+# Suma (o resta, con signo=-1) los deltas en la fila de la categoría, creándola si no existe
+def aplicar_aporte(connection, aporte: tuple, signo: int = 1) -> None:
+    categoria, deltas = aporte
+    tabla = InventarioCategoria.__table__
+    resultado = connection.execute(
+        tabla.update()
+        .where(tabla.c.categoria == categoria)
+        .values({tabla.c[campo]: tabla.c[campo] + signo * valor for campo, valor in deltas.items()})
+    )
+    if resultado.rowcount == 0:
+        connection.execute(tabla.insert().values(categoria=categoria, **{c: signo * v for c, v in deltas.items()}))
+
+
+# Cambios de un lote de productos escritos sin el ORM (carga masiva): `cambios` son pares
+# (previo, actual) con categoria, cantidad, precio_unitario y stock_minimo, o None en el alta
+# o la baja. Los deltas se suman por categoría y se aplican con un UPDATE por categoría.
+def acumular_cambios(connection, cambios: list) -> None:
+    atributos = ('categoria', 'cantidad', 'precio_unitario', 'stock_minimo')
+    por_categoria = {}
+    for previo, actual in cambios:
+        for valores, signo in ((previo, -1), (actual, 1)):
+            if valores is None:
+                continue
+            categoria, deltas = _aporte(*(valores.get(a) for a in atributos))
+            acumulado = por_categoria.setdefault(categoria, dict.fromkeys(deltas, 0))
+            for campo, valor in deltas.items():
+                acumulado[campo] += signo * valor
+    for categoria, deltas in sorted(por_categoria.items()):
+        if any(deltas.values()):
+            aplicar_aporte(connection, (categoria, deltas))
+
+
+@event.listens_for(Producto, 'after_insert')
+def _producto_insertado(mapper, connection, target):
+    aplicar_aporte(connection, _aporte_producto(target))
+
+
+@event.listens_for(Producto, 'after_delete')
+def _producto_eliminado(mapper, connection, target):
+    aplicar_aporte(connection, _aporte_producto(target, previo=True), -1)
+
+
+@event.listens_for(Producto, 'after_update')
+def _producto_actualizado(mapper, connection, target):
+    previo = _aporte_producto(target, previo=True)
+    actual = _aporte_producto(target)
+    if previo != actual:
+        aplicar_aporte(connection, previo, -1)
+        aplicar_aporte(connection, actual)
+
+
+# Recalcula la marca de bajo stock y la valuación por categoría desde la tabla de productos.
+# Recibe una conexión (se usa desde la migración y el generador de datos).
+def reconstruir_inventario(conn) -> int:
+    producto = Producto.__table__
+    tabla = InventarioCategoria.__table__
+    conn.execute(producto.update().values(bajo_stock=producto.c.cantidad <= producto.c.stock_minimo))
+    conn.execute(tabla.delete())
+    consulta = (
+        select(
+            func.coalesce(producto.c.categoria, ''),
+            func.count(producto.c.id),
+            func.coalesce(func.sum(producto.c.cantidad), 0),
+            func.coalesce(func.sum(producto.c.cantidad * producto.c.precio_unitario), 0),
+            func.sum(case((producto.c.cantidad <= producto.c.stock_minimo, 1), else_=0)),
+        )
+        .group_by(func.coalesce(producto.c.categoria, ''))
+    )
+    columnas = ['categoria', 'productos', 'unidades', 'valor', 'bajo_stock']
+    return conn.execute(tabla.insert().from_select(columnas, consulta)).rowcount
+
+
+# Movimiento de alta con el stock actual para los productos que todavía no tienen movimientos,
+# así la suma del libro coincide con la cantidad de cada producto
+def registrar_stock_inicial(conn) -> int:
+    return conn.execute(text(
+        "INSERT INTO movimiento_stock (producto_id, fecha, cantidad, motivo, stock_resultante) "
+        "SELECT p.id, CURRENT_TIMESTAMP, p.cantidad, 'alta', p.cantidad FROM producto p "
+        "WHERE p.cantidad <> 0 AND NOT EXISTS (SELECT 1 FROM movimiento_stock m WHERE m.producto_id = p.id)"
+    )).rowcount
+
+
+# Productos bajo stock, los de menor cantidad primero
+def productos_bajo_stock(limite: int = 10) -> list:
+    return (
+        Producto.query
+        .filter(Producto.bajo_stock == True)  # noqa: E712 (con IS no usa el índice)
+        .order_by(Producto.cantidad.asc())
+        .limit(limite)
+        .all()
+    )
+
+
+# Valuación del inventario por categoría y totales, leída de la tabla acumulada
+def valuacion_inventario() -> dict:
+    categorias = [
+        {
+            'categoria': fila.categoria or 'Sin categoría',
+            'productos': fila.productos,
+            'unidades': fila.unidades,
+            'valor': fila.valor or CERO,
+            'bajo_stock': fila.bajo_stock,
+        }
+        for fila in InventarioCategoria.query.filter(InventarioCategoria.productos > 0)
+        .order_by(InventarioCategoria.valor.desc()).all()
+    ]
+    totales = {clave: sum(c[clave] for c in categorias) for clave in ('productos', 'unidades', 'valor', 'bajo_stock')}
+    return {'categorias': categorias, 'totales': totales}
+
+
+# Últimos movimientos de un producto (o de todos)
+def movimientos(producto_id: int = None, limite: int = 50) -> list:
+    query = MovimientoStock.query
+    if producto_id is not None:
+        query = query.filter(MovimientoStock.producto_id == producto_id)
+    return query.order_by(MovimientoStock.fecha.desc(), MovimientoStock.id.desc()).limit(limite).all()
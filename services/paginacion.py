@@ -0,0 +1,133 @@
+import base64
+import binascii
+import json
+import time
+from datetime import date, datetime
+from sqlalchemy import and_, false, or_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+# Paginación por clave (keyset): en lugar de OFFSET, cada página pide las filas posteriores a la
+# última clave vista, así la página 500 cuesta lo mismo que la primera y no se saltean ni repiten
+# filas cuando se agregan registros. El orden tiene que terminar en una columna única (el id).
+# Los cursores (`despues` / `antes`) son opacos: los valores de la clave en JSON y base64.
+# Los NULL se ordenan como el valor más chico, como en SQLite y MySQL.
+
+POR_PAGINA = 50
+MAX_POR_PAGINA = 200
+
+# Conteos recientes: {clave de la consulta: (momento, total)}
+_conteos = {}
+TTL_CONTEOS = 60
+MAX_CONTEOS = 256
+
+
+def por_pagina_valido(valor, defecto: int = POR_PAGINA) -> int:
+    return min(max(valor or defecto, 1), MAX_POR_PAGINA)
+
+
+# (expresión, descendente) para cada elemento del orden: `Receta.fecha.desc()` o `Paciente.apellido`
+def _criterios(orden: list) -> list:
+    criterios = []
+    for expresion in orden:
+        if isinstance(expresion, UnaryExpression) and expresion.modifier in (operators.desc_op, operators.asc_op):
+            criterios.append((expresion.element, expresion.modifier is operators.desc_op))
+        else:
+            criterios.append((expresion, False))
+    return criterios
+
+
+def _ordenar(criterios: list) -> list:
+    return [expresion.desc() if descendente else expresion.asc() for expresion, descendente in criterios]
+
+
+# Condición "la fila va después de `valores`" para el orden dado
+def _despues_de(criterios: list, valores: list):
+    condicion = None
+    for (expresion, descendente), valor in reversed(list(zip(criterios, valores))):
+        if valor is None:
+            igual = expresion.is_(None)
+            mayor = None if descendente else expresion.isnot(None)
+        else:
+            igual = expresion == valor
+            mayor = or_(expresion < valor, expresion.is_(None)) if descendente else expresion > valor
+        partes = [p for p in (mayor, and_(igual, condicion) if condicion is not None else None) if p is not None]
+        condicion = or_(*partes) if partes else false()
+    return condicion
+
+
+def _codificar(valores) -> str:
+    texto = json.dumps(list(valores), default=lambda v: v.isoformat())
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar(cursor: str, criterios: list) -> list:
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError('Cursor de paginación inválido')
+    if not isinstance(valores, list) or len(valores) != len(criterios):
+        raise ValueError('Cursor de paginación inválido')
+    decodificados = []
+    for (expresion, _), valor in zip(criterios, valores):
+        tipo = getattr(expresion.type, 'python_type', None) if hasattr(expresion, 'type') else None
+        try:
+            if valor is not None and tipo is date:
+                valor = date.fromisoformat(valor)
+            elif valor is not None and tipo is datetime:
+                valor = datetime.fromisoformat(valor)
+        except (TypeError, ValueError):
+            raise ValueError('Cursor de paginación inválido')
+        decodificados.append(valor)
+    return decodificados
+
+
+# Total de filas de la consulta, reutilizado durante TTL_CONTEOS segundos para la misma consulta
+def contar(query) -> int:
+    sentencia = query.order_by(None).statement.compile()
+    clave = (str(sentencia), tuple(sorted((k, repr(v)) for k, v in sentencia.params.items())))
+    ahora = time.monotonic()
+    guardado = _conteos.get(clave)
+    if guardado and ahora - guardado[0] < TTL_CONTEOS:
+        return guardado[1]
+    total = query.order_by(None).count()
+    if len(_conteos) >= MAX_CONTEOS:
+        _conteos.clear()
+    _conteos[clave] = (ahora, total)
+    return total
+
+
+# Una página de `query` en el orden `orden`, después (o antes) del cursor recibido.
+# Devuelve {'items', 'siguiente', 'anterior', 'por_pagina', 'total'}; `total` solo si `con_total`.
+# Lanza ValueError si el cursor no es válido.
+def paginar(query, orden: list, despues: str = None, antes: str = None,
+            por_pagina: int = POR_PAGINA, con_total: bool = False) -> dict:
+    criterios = _criterios(orden)
+    por_pagina = por_pagina_valido(por_pagina)
+    total = contar(query) if con_total else None
+
+    hacia_atras = bool(antes) and not despues
+    if hacia_atras:
+        criterios_consulta = [(expresion, not descendente) for expresion, descendente in criterios]
+    else:
+        criterios_consulta = criterios
+    consulta = query.add_columns(*(expresion for expresion, _ in criterios))
+    cursor = antes if hacia_atras else despues
+    if cursor:
+        consulta = consulta.filter(_despues_de(criterios_consulta, _decodificar(cursor, criterios)))
+    filas = consulta.order_by(None).order_by(*_ordenar(criterios_consulta)).limit(por_pagina + 1).all()
+
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+    claves = [tuple(fila)[1:] for fila in filas]
+    hay_siguiente = bool(filas) and (hacia_atras or hay_mas)
+    hay_anterior = bool(filas) and ((hacia_atras and hay_mas) or (not hacia_atras and bool(despues)))
+    return {
+        'items': [fila[0] for fila in filas],
+        'siguiente': _codificar(claves[-1]) if hay_siguiente else None,
+        'anterior': _codificar(claves[0]) if hay_anterior else None,
+        'por_pagina': por_pagina,
+        'total': total,
+    }
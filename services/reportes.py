@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+from sqlalchemy import extract, func
+from dinero import CERO
+from models.models import db, Gasto
+from services.comisiones import comisiones_mensuales
+from services.resumenes import totales_mensuales, totales_por_metodo
+
+# Máximo de meses que se pueden pedir en un reporte por rango
+MAX_MESES = 120
+
+
+# Lista de (año, mes) desde el mes de `desde` hasta el mes de `hasta`, ambos incluidos
+def meses_entre(desde: date, hasta: date) -> list:
+    meses = []
+    año, mes = desde.year, desde.month
+    while (año, mes) <= (hasta.year, hasta.month):
+        meses.append((año, mes))
+        año, mes = (año + 1, 1) if mes == 12 else (año, mes + 1)
+    return meses
+
+
+# Último día del mes indicado
+def fin_de_mes(año: int, mes: int) -> date:
+    if mes == 12:
+        return date(año, 12, 31)
+    return date(año, mes + 1, 1) - timedelta(days=1)
+
+
+# Gastos por (año, mes, categoría) en una consulta agrupada
+def gastos_por_categoria(desde: date, hasta: date) -> list:
+    año = extract('year', Gasto.fecha)
+    mes = extract('month', Gasto.fecha)
+    filas = (
+        db.session.query(año, mes, Gasto.categoria, func.count(Gasto.id), func.sum(Gasto.monto))
+        .filter(Gasto.fecha >= desde, Gasto.fecha <= hasta)
+        .group_by(año, mes, Gasto.categoria)
+        .order_by(año, mes, Gasto.categoria)
+        .all()
+    )
+    return [
+        {
+            'año': int(a),
+            'mes': int(m),
+            'categoria': categoria or 'Sin categoría',
+            'cantidad': cantidad,
+            'gastos': total or CERO,
+        }
+        for a, m, categoria, cantidad, total in filas
+    ]
+
+
+# Reporte de un rango de meses: recaudación, gastos, comisiones y saldo por mes,
+# más el desglose por método de pago y por categoría de gasto. Todo sale de consultas
+# agrupadas (resumen diario, comisiones y gastos), sin recorrer pagos en Python.
+# La recaudación y el saldo siguen el criterio del reporte mensual:
+# saldo = recaudación - gastos - comisiones.
+def reporte_rango(desde: date, hasta: date) -> dict:
+    desde = date(desde.year, desde.month, 1)
+    hasta = fin_de_mes(hasta.year, hasta.month)
+
+    meses = {
+        (a, m): {
+            'año': a, 'mes': m,
+            'cantidad_pagos': 0, 'recaudacion': CERO, 'ingresos_netos': CERO, 'descuentos': CERO,
+            'gastos': CERO, 'comisiones': CERO, 'saldo': CERO,
+        }
+        for a, m in meses_entre(desde, hasta)
+    }
+    for fila in totales_mensuales(desde, hasta):
+        item = meses[(fila['año'], fila['mes'])]
+        item['cantidad_pagos'] = fila['cantidad_pagos']
+        item['recaudacion'] = fila['ingresos_brutos']
+        item['ingresos_netos'] = fila['ingresos']
+        item['descuentos'] = fila['descuentos']
+        item['gastos'] = fila['gastos']
+    for fila in comisiones_mensuales(desde, hasta):
+        meses[(fila['año'], fila['mes'])]['comisiones'] += fila['comision']
+
+    totales = {clave: 0 for clave in ('cantidad_pagos', 'recaudacion', 'ingresos_netos', 'descuentos', 'gastos', 'comisiones', 'saldo')}
+    for item in meses.values():
+        item['saldo'] = item['recaudacion'] - item['gastos'] - item['comisiones']
+        for clave in totales:
+            totales[clave] += item[clave]
+
+    por_metodo = [
+        {'año': f['año'], 'mes': f['mes'], 'metodo': f['metodo'], 'cantidad_pagos': f['cantidad_pagos'],
+         'recaudacion': f['ingresos_brutos'], 'ingresos_netos': f['ingresos']}
+        for f in totales_por_metodo(desde, hasta, por_mes=True)
+    ]
+    por_categoria = gastos_por_categoria(desde, hasta)
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'meses': list(meses.values()),
+        'totales': totales,
+        'por_metodo': por_metodo,
+        'por_categoria': por_categoria,
+        'metodos': sorted({f['metodo'] for f in por_metodo}),
+        'categorias': sorted({f['categoria'] for f in por_categoria}),
+    }
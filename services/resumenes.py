@@ -0,0 +1,199 @@
+from datetime import date
+from sqlalchemy import event, extract, func, inspect
+from dinero import CERO, neto
+from models.models import db, Pago, Gasto, ResumenDiario
+from services.series import monto_neto
+
+_CAMPOS = ('cantidad_pagos', 'ingresos_netos', 'ingresos_brutos', 'descuentos', 'gastos')
+
+
+# Aportes de un pago a su fila del resumen: (fecha, método, deltas)
+def _aporte_pago(fecha, metodo_pago, monto, descuento) -> tuple:
+    bruto = monto or CERO
+    neto_pago = neto(bruto, descuento)
+    return fecha, metodo_pago or '', {
+        'cantidad_pagos': 1,
+        'ingresos_netos': neto_pago,
+        'ingresos_brutos': bruto,
+        'descuentos': bruto - neto_pago,
+    }
+
+
+def _aporte_gasto(fecha, monto) -> tuple:
+    return fecha, '', {'gastos': monto or CERO}
+
+
+# Suma (o resta, con signo=-1) los deltas en la fila (fecha, método), creándola si no existe.
+# Se ejecuta sobre la conexión del flush, así queda dentro de la misma transacción.
+def _aplicar(connection, aporte: tuple, signo: int = 1) -> None:
+    fecha, metodo, deltas = aporte
+    if fecha is None:
+        return
+    tabla = ResumenDiario.__table__
+    resultado = connection.execute(
+        tabla.update()
+        .where(tabla.c.fecha == fecha, tabla.c.metodo_pago == metodo)
+        .values({tabla.c[campo]: tabla.c[campo] + signo * valor for campo, valor in deltas.items()})
+    )
+    if resultado.rowcount == 0:
+        valores = {campo: 0 for campo in _CAMPOS}
+        valores.update({campo: signo * valor for campo, valor in deltas.items()})
+        connection.execute(tabla.insert().values(fecha=fecha, metodo_pago=metodo, **valores))
+
+
+# Valor anterior de un atributo durante un flush de actualización
+def _valor_previo(target, atributo):
+    historial = inspect(target).attrs[atributo].history
+    if historial.deleted:
+        return historial.deleted[0]
+    return getattr(target, atributo)
+
+
+@event.listens_for(Pago, 'after_insert')
+def _pago_insertado(mapper, connection, target):
+    _aplicar(connection, _aporte_pago(target.fecha, target.metodo_pago, target.monto, target.descuento))
+
+
+@event.listens_for(Pago, 'after_delete')
+def _pago_eliminado(mapper, connection, target):
+    _aplicar(connection, _aporte_pago(target.fecha, target.metodo_pago, target.monto, target.descuento), -1)
+
+
+@event.listens_for(Pago, 'after_update')
+def _pago_actualizado(mapper, connection, target):
+    previo = _aporte_pago(*(_valor_previo(target, a) for a in ('fecha', 'metodo_pago', 'monto', 'descuento')))
+    actual = _aporte_pago(target.fecha, target.metodo_pago, target.monto, target.descuento)
+    if previo != actual:
+        _aplicar(connection, previo, -1)
+        _aplicar(connection, actual)
+
+
+@event.listens_for(Gasto, 'after_insert')
+def _gasto_insertado(mapper, connection, target):
+    _aplicar(connection, _aporte_gasto(target.fecha, target.monto))
+
+
+@event.listens_for(Gasto, 'after_delete')
+def _gasto_eliminado(mapper, connection, target):
+    _aplicar(connection, _aporte_gasto(target.fecha, target.monto), -1)
+
+
+@event.listens_for(Gasto, 'after_update')
+def _gasto_actualizado(mapper, connection, target):
+    previo = _aporte_gasto(_valor_previo(target, 'fecha'), _valor_previo(target, 'monto'))
+    actual = _aporte_gasto(target.fecha, target.monto)
+    if previo != actual:
+        _aplicar(connection, previo, -1)
+        _aplicar(connection, actual)
+
+
+# Aportes de un lote de pagos y gastos insertados sin el ORM (carga masiva, ver services/carga_masiva.py):
+# se suman por (fecha, método) y se aplican con una actualización por fila del resumen
+def acumular_lote(connection, pagos: list = (), gastos: list = ()) -> None:
+    filas = {}
+    aportes = [_aporte_pago(p['fecha'], p['metodo_pago'], p['monto'], p.get('descuento')) for p in pagos]
+    aportes += [_aporte_gasto(g['fecha'], g['monto']) for g in gastos]
+    for fecha, metodo, deltas in aportes:
+        acumulado = filas.setdefault((fecha, metodo), {})
+        for campo, valor in deltas.items():
+            acumulado[campo] = acumulado.get(campo, 0) + valor
+    for (fecha, metodo), deltas in filas.items():
+        _aplicar(connection, (fecha, metodo, deltas))
+
+
+# Reconstruye todo el resumen diario desde Pago y Gasto con una consulta agrupada por tabla.
+# Devuelve la cantidad de filas generadas.
+def reconstruir_resumenes() -> int:
+    filas = {}
+
+    def fila(fecha, metodo):
+        return filas.setdefault((fecha, metodo), {'fecha': fecha, 'metodo_pago': metodo, **{c: 0 for c in _CAMPOS}})
+
+    for fecha, metodo, cantidad, netos, brutos in (
+        db.session.query(Pago.fecha, Pago.metodo_pago, func.count(Pago.id), func.sum(monto_neto()), func.sum(Pago.monto))
+        .group_by(Pago.fecha, Pago.metodo_pago)
+        .all()
+    ):
+        item = fila(fecha, metodo or '')
+        item['cantidad_pagos'] += cantidad
+        item['ingresos_netos'] += netos or 0
+        item['ingresos_brutos'] += brutos or 0
+        item['descuentos'] += (brutos or 0) - (netos or 0)
+    for fecha, gastos in db.session.query(Gasto.fecha, func.sum(Gasto.monto)).group_by(Gasto.fecha).all():
+        fila(fecha, '')['gastos'] += gastos or 0
+
+    db.session.query(ResumenDiario).delete()
+    if filas:
+        db.session.execute(ResumenDiario.__table__.insert(), list(filas.values()))
+    db.session.commit()
+    return len(filas)
+
+
+# Totales por mes (año, mes) entre `desde` y `hasta` (inclusive), leídos del resumen diario
+def totales_mensuales(desde: date, hasta: date) -> list:
+    año = extract('year', ResumenDiario.fecha)
+    mes = extract('month', ResumenDiario.fecha)
+    filas = (
+        db.session.query(
+            año, mes,
+            func.sum(ResumenDiario.cantidad_pagos),
+            func.sum(ResumenDiario.ingresos_netos),
+            func.sum(ResumenDiario.ingresos_brutos),
+            func.sum(ResumenDiario.descuentos),
+            func.sum(ResumenDiario.gastos),
+        )
+        .filter(ResumenDiario.fecha >= desde, ResumenDiario.fecha <= hasta)
+        .group_by(año, mes)
+        .order_by(año, mes)
+        .all()
+    )
+    return [
+        {
+            'año': int(a),
+            'mes': int(m),
+            'cantidad_pagos': cantidad or 0,
+            'ingresos': netos or CERO,
+            'ingresos_brutos': brutos or CERO,
+            'descuentos': descuentos or CERO,
+            'gastos': gastos or CERO,
+            'saldo': (netos or CERO) - (gastos or CERO),
+        }
+        for a, m, cantidad, netos, brutos, descuentos, gastos in filas
+    ]
+
+
+# Recaudación por método de pago entre `desde` y `hasta` (inclusive), leída del resumen diario.
+# Con `por_mes=True` se agrupa además por (año, mes).
+def totales_por_metodo(desde: date, hasta: date, por_mes: bool = False) -> list:
+    columnas = [ResumenDiario.metodo_pago]
+    if por_mes:
+        columnas = [extract('year', ResumenDiario.fecha), extract('month', ResumenDiario.fecha)] + columnas
+    filas = (
+        db.session.query(
+            *columnas,
+            func.sum(ResumenDiario.cantidad_pagos),
+            func.sum(ResumenDiario.ingresos_netos),
+            func.sum(ResumenDiario.ingresos_brutos),
+        )
+        .filter(ResumenDiario.fecha >= desde, ResumenDiario.fecha <= hasta)
+        .group_by(*columnas)
+        .having(func.sum(ResumenDiario.cantidad_pagos) > 0)
+        .order_by(*columnas)
+        .all()
+    )
+    resultado = []
+    for fila in filas:
+        if por_mes:
+            a, m, metodo, cantidad, netos, brutos = fila
+            item = {'año': int(a), 'mes': int(m)}
+        else:
+            metodo, cantidad, netos, brutos = fila
+            item = {}
+        item.update({
+            'metodo': metodo or 'Sin especificar',
+            'cantidad_pagos': cantidad or 0,
+            'ingresos': netos or CERO,
+            'ingresos_brutos': brutos or CERO,
+        })
+        resultado.append(item)
+    return resultado
@@ -0,0 +1,167 @@
+from sqlalchemy import event, func, literal_column, update
+from sqlalchemy.orm import contains_eager
+from dinero import CERO, redondear, sin_descuento
+from models.models import db, Receta, Pago
+from services.series import monto_neto
+from services.busqueda import buscar
+from services.paginacion import paginar
+
+
+# Valores esperados de los saldos materializados a partir de los pagos de cada receta.
+# `receta_ids=None` calcula todas las recetas con una sola consulta agrupada.
+def _saldos_desde_pagos(receta_ids=None) -> dict:
+    query = db.session.query(
+        Pago.receta_id,
+        func.sum(Pago.monto),
+        func.max(Pago.fecha),
+        func.min(Pago.id),
+    ).group_by(Pago.receta_id)
+    if receta_ids is not None:
+        query = query.filter(Pago.receta_id.in_(receta_ids))
+    agregados = {receta_id: (pagado, ultimo, primer_id) for receta_id, pagado, ultimo, primer_id in query.all()}
+
+    # Descuento (%) del primer pago de cada receta, que es el que se aplicó sobre el total
+    primeros = [primer_id for _, _, primer_id in agregados.values()]
+    descuentos = {}
+    for i in range(0, len(primeros), 500):
+        descuentos.update(
+            db.session.query(Pago.receta_id, Pago.descuento).filter(Pago.id.in_(primeros[i:i + 500])).all()
+        )
+    return {
+        receta_id: (pagado or CERO, ultimo, descuentos.get(receta_id) or 0)
+        for receta_id, (pagado, ultimo, _) in agregados.items()
+    }
+
+
+def _valores_saldo(fecha, total, pagado, ultimo, descuento) -> dict:
+    return {
+        'total_pagado': redondear(pagado),
+        'saldo': max(CERO, redondear(total or 0) - redondear(pagado)),
+        'descuento_aplicado': descuento if descuento > 0 else 0,
+        'fecha_ultimo_pago': ultimo,
+        'fecha_orden': ultimo or fecha,
+    }
+
+
+# La fecha de orden sigue a la fecha de la receta cuando se crea o edita por el ORM; las
+# actualizaciones por lotes la calculan en _valores_saldo
+@event.listens_for(Receta, 'before_insert')
+@event.listens_for(Receta, 'before_update')
+def _fecha_orden(mapper, connection, target):
+    target.fecha_orden = target.fecha_ultimo_pago or target.fecha
+
+
+# Recalcula los saldos materializados de una receta dentro de la transacción en curso
+def actualizar_saldo(receta: Receta) -> None:
+    db.session.flush()
+    pagado, ultimo, descuento = _saldos_desde_pagos([receta.id]).get(receta.id, (0, None, 0))
+    for campo, valor in _valores_saldo(receta.fecha, receta.total, pagado, ultimo, descuento).items():
+        setattr(receta, campo, valor)
+
+
+# Recalcula los saldos de varias recetas con consultas agrupadas y un UPDATE por lotes (carga masiva
+# de pagos). `totales` trae el total nuevo de las recetas a las que el primer pago aplicó descuento.
+def actualizar_saldos(receta_ids, totales: dict = None, tamaño_lote: int = 500) -> None:
+    ids = sorted(set(receta_ids))
+    totales = totales or {}
+    cambios = []
+    for i in range(0, len(ids), tamaño_lote):
+        parte = ids[i:i + tamaño_lote]
+        esperados = _saldos_desde_pagos(parte)
+        for receta_id, fecha, total in db.session.query(Receta.id, Receta.fecha, Receta.total).filter(Receta.id.in_(parte)):
+            total = totales.get(receta_id, total)
+            valores = _valores_saldo(fecha, total, *esperados.get(receta_id, (0, None, 0)))
+            cambios.append({'id': receta_id, 'total': total, **valores})
+    for i in range(0, len(cambios), tamaño_lote):
+        db.session.execute(update(Receta), cambios[i:i + tamaño_lote])
+
+
+# Reconstruye (o solo verifica, con `corregir=False`) los saldos materializados de todas las recetas.
+# Devuelve la lista de ids de recetas cuyos valores guardados no coincidían con los pagos.
+def recalcular_saldos(corregir: bool = True, tamaño_lote: int = 1000) -> list:
+    esperados = _saldos_desde_pagos()
+    inconsistentes = []
+    cambios = []
+    filas = db.session.query(
+        Receta.id, Receta.fecha, Receta.total, Receta.total_pagado, Receta.saldo,
+        Receta.descuento_aplicado, Receta.fecha_ultimo_pago, Receta.fecha_orden,
+    )
+    for receta_id, fecha, total, total_pagado, saldo, descuento_aplicado, fecha_ultimo_pago, fecha_orden in filas.yield_per(tamaño_lote):
+        valores = _valores_saldo(fecha, total, *esperados.get(receta_id, (0, None, 0)))
+        guardados = {
+            'total_pagado': total_pagado,
+            'saldo': saldo,
+            'descuento_aplicado': descuento_aplicado,
+            'fecha_ultimo_pago': fecha_ultimo_pago,
+            'fecha_orden': fecha_orden,
+        }
+        if guardados != valores:
+            inconsistentes.append(receta_id)
+            cambios.append({'id': receta_id, **valores})
+
+    if corregir:
+        for i in range(0, len(cambios), tamaño_lote):
+            db.session.execute(update(Receta), cambios[i:i + tamaño_lote])
+        db.session.commit()
+    return inconsistentes
+
+
+# Total de la receta antes del descuento aplicado en el primer pago
+def total_original(receta: Receta):
+    return sin_descuento(receta.total, receta.descuento_aplicado)
+
+
+# Una página de recetas pendientes (`pendientes=True`) o finalizadas según el saldo materializado.
+# Se ordenan por fecha_orden (último pago o, sin pagos, fecha de la receta), más recientes primero,
+# con paginación por clave: cada lista tiene su índice parcial en ese orden, así la página cuesta
+# lo mismo con años de historial. `term` filtra por paciente (apellido, nombre, DNI) o médico y
+# ordena primero por relevancia. Devuelve la página como `paginar` (items, siguiente, anterior);
+# lanza ValueError si el cursor no es válido.
+def recetas_por_saldo(pendientes: bool = True, despues: str = None, antes: str = None,
+                      por_pagina: int = 10, term: str = None) -> dict:
+    query = (
+        Receta.query
+        .outerjoin(Receta.paciente)
+        .outerjoin(Receta.medico)
+        .options(contains_eager(Receta.paciente), contains_eager(Receta.medico))
+    )
+    # Comparación con un literal (no un parámetro) para que SQLite pueda usar el índice parcial
+    if pendientes:
+        query = query.filter(Receta.saldo > literal_column('0'))
+    else:
+        query = query.filter(Receta.saldo <= literal_column('0'))
+    relevancia = []
+    if term:
+        query, relevancia = buscar(query, 'receta', term, con_joins=True)
+
+    pagina = paginar(query, relevancia + [Receta.fecha_orden.desc(), Receta.id.desc()],
+                     despues=despues, antes=antes, por_pagina=por_pagina)
+    recetas = pagina['items']
+
+    # Pagado neto y cantidad de pagos solo para las recetas de la página
+    detalle_pagos = {}
+    if recetas:
+        detalle_pagos = {
+            receta_id: (pagado_neto, cantidad)
+            for receta_id, pagado_neto, cantidad in (
+                db.session.query(Pago.receta_id, func.sum(monto_neto()), func.count(Pago.id))
+                .filter(Pago.receta_id.in_([r.id for r in recetas]))
+                .group_by(Pago.receta_id)
+                .all()
+            )
+        }
+
+    items = []
+    for r in recetas:
+        pagado_neto, cantidad_pagos = detalle_pagos.get(r.id, (CERO, 0))
+        items.append({
+            'receta': r,
+            'total_original': total_original(r),
+            'descuento_pct': r.descuento_aplicado or 0,
+            'total_final': r.total,
+            'pagado': r.total_pagado or CERO,
+            'pagado_neto': pagado_neto,
+            'cantidad_pagos': cantidad_pagos,
+            'saldo': r.saldo or CERO,
+        })
+    return dict(pagina, items=items)
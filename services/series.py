@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+from sqlalchemy import func
+from dinero import CERO, neto_sql
+from models.models import db, Pago, ResumenDiario
+
+
+# Monto de un pago con su descuento (%) aplicado, calculado del lado de SQL en centavos
+def monto_neto(modelo=Pago):
+    return neto_sql(modelo.monto, modelo.descuento)
+
+
+# Serie diaria de ingresos (netos y brutos), gastos y saldo entre `desde` y `hasta` (inclusive).
+# Se lee del resumen diario (una fila por día y método) con una única consulta agrupada;
+# los días sin movimientos se completan en Python.
+def serie_diaria(desde: date, hasta: date) -> list:
+    por_dia = {
+        fecha: (netos or CERO, brutos or CERO, gastos or CERO)
+        for fecha, netos, brutos, gastos in (
+            db.session.query(
+                ResumenDiario.fecha,
+                func.sum(ResumenDiario.ingresos_netos),
+                func.sum(ResumenDiario.ingresos_brutos),
+                func.sum(ResumenDiario.gastos),
+            )
+            .filter(ResumenDiario.fecha >= desde, ResumenDiario.fecha <= hasta)
+            .group_by(ResumenDiario.fecha)
+            .all()
+        )
+    }
+
+    serie = []
+    dia = desde
+    while dia <= hasta:
+        ingresos, ingresos_brutos, gastos = por_dia.get(dia, (CERO, CERO, CERO))
+        serie.append({
+            'fecha': dia,
+            'ingresos': ingresos,
+            'ingresos_brutos': ingresos_brutos,
+            'gastos': gastos,
+            'saldo': ingresos - gastos,
+        })
+        dia += timedelta(days=1)
+    return serie
+
+
+# Totales del período sumando la serie diaria (mismas claves que cada día de la serie)
+def totales_periodo(desde: date, hasta: date) -> dict:
+    totales = dict.fromkeys(('ingresos', 'ingresos_brutos', 'gastos', 'saldo'), CERO)
+    for dia in serie_diaria(desde, hasta):
+        for clave in totales:
+            totales[clave] += dia[clave]
+    return totales
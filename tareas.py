@@ -0,0 +1,102 @@
+import logging
+import threading
+from datetime import date, datetime, time, timedelta
+
+logger = logging.getLogger('optica.tareas')
+
+# Tareas diarias (TAREAS_AUTOMATICAS=1): a la hora CIERRE_AUTOMATICO_HORA cierra la caja del día
+# (o la concilia si ya estaba cerrada), cierra los días anteriores que quedaron sin cerrar y deja
+# calculados en el cache los reportes del día siguiente (ver services/cierres.py y rutas/comunes.py).
+# Al arrancar se cierran los días anteriores pendientes, por si el servidor estuvo apagado a la hora
+# del cierre, y se precalculan los reportes de hoy. La recuperación mira solo los últimos
+# CIERRE_PENDIENTES_DIAS días; los más viejos se cierran a mano con `flask cerrar-caja --desde`.
+# Corre en un solo proceso designado, no en cada worker: `flask tareas` en primer plano, o
+# `python serve.py` con TAREAS_AUTOMATICAS=1 (en el proceso principal de gunicorn, o en el único
+# proceso de waitress). Con cron alcanza con `flask cerrar-caja`.
+
+
+def _hora(texto: str) -> time:
+    try:
+        return datetime.strptime(texto, '%H:%M').time()
+    except ValueError:
+        raise ValueError(f'CIERRE_AUTOMATICO_HORA inválida: {texto} (use HH:MM)') from None
+
+
+class Programador:
+    def __init__(self, app, hora: time, dias_pendientes: int):
+        self.app = app
+        self.hora = hora
+        self.dias_pendientes = max(dias_pendientes, 0)
+        self._detener = threading.Event()
+        self._hilo = None
+
+    # Segundos hasta la próxima ejecución y el día que cierra
+    def _proxima(self, ahora: datetime) -> tuple:
+        proxima = datetime.combine(ahora.date(), self.hora)
+        if proxima <= ahora:
+            proxima += timedelta(days=1)
+        return (proxima - ahora).total_seconds(), proxima.date()
+
+    # Días anteriores a `dia` sin cerrar, dentro de los últimos `dias_pendientes`
+    def _cerrar_anteriores(self, dia: date) -> int:
+        from services.cierres import cerrar_pendientes
+        if not self.dias_pendientes:
+            return 0
+        return cerrar_pendientes(dia - timedelta(days=1), dia - timedelta(days=self.dias_pendientes))
+
+    # Al arrancar: días anteriores sin cerrar y reportes de hoy
+    def ponerse_al_dia(self, hoy: date = None) -> None:
+        from rutas.comunes import precalcular_reportes
+        hoy = hoy or date.today()
+        with self.app.app_context():
+            cerrados = self._cerrar_anteriores(hoy)
+            if cerrados:
+                logger.info('Cierres de caja pendientes cerrados: %s', cerrados)
+            precalcular_reportes(hoy)
+
+    # Cierre del día, días anteriores pendientes y reportes del día siguiente
+    def ejecutar(self, dia: date) -> None:
+        from services.cierres import cerrar_dia
+        from rutas.comunes import precalcular_reportes
+        with self.app.app_context():
+            estado = cerrar_dia(dia)
+            cerrados = self._cerrar_anteriores(dia)
+            logger.info('Cierre de caja del %s: %s (%s días anteriores cerrados)', dia, estado, cerrados)
+            precalcular_reportes(dia + timedelta(days=1))
+
+    def _ciclo(self) -> None:
+        self._intentar(self.ponerse_al_dia)
+        while True:
+            espera, dia = self._proxima(datetime.now())
+            if self._detener.wait(espera):
+                return
+            self._intentar(self.ejecutar, dia)
+
+    def _intentar(self, tarea, *args) -> None:
+        try:
+            tarea(*args)
+        except Exception:
+            logger.exception('Falló la tarea diaria %s', tarea.__name__)
+
+    # En segundo plano, en un hilo del proceso actual
+    def iniciar(self) -> None:
+        self._hilo = threading.Thread(target=self._ciclo, name='tareas-diarias', daemon=True)
+        self._hilo.start()
+
+    # En primer plano, hasta detener() o Ctrl+C (`flask tareas`)
+    def correr(self) -> None:
+        try:
+            self._ciclo()
+        except KeyboardInterrupt:
+            pass
+
+    def detener(self) -> None:
+        self._detener.set()
+
+
+def crear_programador(app) -> Programador:
+    return Programador(
+        app,
+        _hora(app.config.get('CIERRE_AUTOMATICO_HORA', '23:30')),
+        app.config.get('CIERRE_PENDIENTES_DIAS', 7),
+    )
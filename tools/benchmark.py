@@ -0,0 +1,231 @@
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Benchmark de todas las rutas de la aplicación con el cliente de pruebas de Flask: latencia p50/p95
+# y cantidad de consultas SQL por ruta, guardado en JSON para comparar entre versiones.
+# Trabaja sobre una copia de la base (las rutas de alta escriben datos). Uso:
+#   python tools/generar_datos.py --db grande.db
+#   python tools/benchmark.py --db grande.db --salida antes.json
+#   python tools/benchmark.py --db grande.db --salida despues.json --comparar antes.json
+# Sin --db genera una base chica temporal con tools/generar_datos.py.
+# También mide el arranque en procesos nuevos: importar app.py y crear la aplicación con
+# create_app (lo que paga cada worker, prueba o comando de la CLI).
+
+RAIZ = Path(__file__).resolve().parents[1]
+ARRANQUE = (
+    'import json, time\n'
+    't0 = time.perf_counter()\n'
+    'from app import create_app\n'
+    't1 = time.perf_counter()\n'
+    'create_app()\n'
+    't2 = time.perf_counter()\n'
+    'print(json.dumps({"importacion_ms": (t1 - t0) * 1000, "create_app_ms": (t2 - t1) * 1000}))\n'
+)
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def _commit_actual() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+# Arma la lista de escenarios (nombre, método, url, datos) a partir del url_map: cada regla GET
+# con ids reales de la base y parámetros de fecha con datos, más las altas por POST.
+# Las rutas de borrado por POST se omiten para no alterar los datos entre repeticiones.
+def escenarios(app, db, modelos) -> list:
+    Producto, Paciente, Medico, Receta, Pago, Gasto = modelos
+    hoy = date.today()
+    ultimo_pago = db.session.query(db.func.max(Pago.fecha)).scalar() or hoy
+    mes_pasado = (hoy.replace(day=1) - timedelta(days=1)).replace(day=1)
+    receta_pendiente = Receta.query.filter(Receta.saldo > 0).order_by(Receta.id.desc()).first()
+
+    def id_medio(modelo):
+        return max(1, (db.session.query(db.func.max(modelo.id)).scalar() or 0) // 2)
+
+    ids = {
+        'producto_id': id_medio(Producto), 'paciente_id': id_medio(Paciente), 'medico_id': id_medio(Medico),
+        'receta_id': id_medio(Receta), 'pago_id': id_medio(Pago), 'gasto_id': id_medio(Gasto),
+    }
+    parametros = {
+        'reportes.reporte_diario': {'fecha': ultimo_pago.isoformat()},
+        'reportes.reporte_mensual': {'mes': mes_pasado.month, 'año': mes_pasado.year},
+        'caja.caja_cierre_csv': {'fecha': ultimo_pago.isoformat()},
+        'caja.caja_export_csv': {'desde': mes_pasado.isoformat(), 'hasta': hoy.isoformat()},
+        'reportes.api_comisiones': {'desde': f'{hoy.year - 1}-01-01', 'hasta': f'{hoy.year - 1}-12-31'},
+        'caja.caja_recetas_pendientes': {'q': 'Gómez'},
+        'api.api_buscar': {'entidad': 'pacientes', 'q': 'gom'},
+        'api.api_listado': {'listado': 'recetas'},
+        'api_v1.listar': {'entidad': 'recetas'},
+        'api_v1.detalle': {'entidad': 'recetas', 'id': ids['receta_id']},
+    }
+    altas = {
+        'caja.caja_pago_create': {'receta_id': receta_pendiente.id if receta_pendiente else 0,
+                                  'metodo_pago': 'Efectivo', 'monto': 1, 'descuento': 0},
+        'caja.gastos_create': {'fecha': hoy.isoformat(), 'categoria': 'Benchmark', 'descripcion': 'Benchmark', 'monto': 1},
+    }
+
+    lista = []
+    with app.test_request_context():
+        for regla in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            if regla.endpoint == 'static':
+                lista.append(('static', 'GET', '/static/styles.css', None))
+                continue
+            if 'GET' in regla.methods:
+                valores = dict(parametros.get(regla.endpoint, {}))
+                valores.update({arg: ids[arg] for arg in regla.arguments if arg not in valores})
+                lista.append((regla.endpoint, 'GET', app.url_for(regla.endpoint, **valores), None))
+            if 'POST' in regla.methods and regla.endpoint in altas:
+                lista.append((f'{regla.endpoint} (POST)', 'POST', app.url_for(regla.endpoint), altas[regla.endpoint]))
+    return lista
+
+
+# Mediana de importar app.py y de create_app(), cada vez en un intérprete nuevo
+def medir_arranque(repeticiones: int = 5) -> dict:
+    medidas = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', ARRANQUE], cwd=RAIZ, capture_output=True, text=True, check=True)
+        medidas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return {clave: round(statistics.median(m[clave] for m in medidas), 2) for clave in ('importacion_ms', 'create_app_ms')}
+
+
+def medir(cliente, consultas: list, metodo: str, url: str, datos, repeticiones: int) -> dict:
+    def una_vez():
+        consultas[0] = 0
+        inicio = time.perf_counter()
+        respuesta = cliente.open(url, method=metodo, data=datos)
+        respuesta.get_data()  # consume también las respuestas en streaming
+        return (time.perf_counter() - inicio) * 1000, consultas[0], respuesta.status_code
+
+    una_vez()  # calentamiento
+    tiempos, cantidades, estado = [], [], None
+    for _ in range(repeticiones):
+        ms, cantidad, estado = una_vez()
+        tiempos.append(ms)
+        cantidades.append(cantidad)
+    return {
+        'metodo': metodo,
+        'url': url,
+        'status': estado,
+        'p50_ms': round(statistics.median(tiempos), 2),
+        'p95_ms': round(percentil(tiempos, 95), 2),
+        'max_ms': round(max(tiempos), 2),
+        'consultas': max(cantidades),
+    }
+
+
+def comparar(actual: dict, anterior: dict, umbral: float) -> int:
+    regresiones = 0
+    print(f"\nComparación con {anterior.get('commit') or 'resultado anterior'} (umbral {umbral:.0f}%)")
+    for clave in ('importacion_ms', 'create_app_ms'):
+        previo, ms = anterior.get('arranque', {}).get(clave), actual['arranque'][clave]
+        if not previo:
+            continue
+        cambio = (ms - previo) / previo * 100
+        marca = ''
+        if cambio > umbral:
+            marca = '  <- regresión'
+            regresiones += 1
+        print(f"{'arranque ' + clave:<35} {previo:>13.1f} -> {ms:>9.1f}ms ({cambio:+6.1f}%){marca}")
+    for nombre, r in actual['rutas'].items():
+        previo = anterior.get('rutas', {}).get(nombre)
+        if not previo:
+            continue
+        cambio = (r['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100 if previo['p50_ms'] else 0
+        marca = ''
+        if cambio > umbral or r['consultas'] > previo['consultas']:
+            marca = '  <- regresión'
+            regresiones += 1
+        print(f"{nombre:<35} p50 {previo['p50_ms']:>9.1f} -> {r['p50_ms']:>9.1f}ms ({cambio:+6.1f}%)  "
+              f"consultas {previo['consultas']:>4} -> {r['consultas']:<4}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia p50/p95 y consultas SQL de cada ruta.')
+    parser.add_argument('--db', help='Base SQLite a medir (se trabaja sobre una copia)')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--rutas', help='Medir solo los endpoints que contengan este texto')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--umbral', type=float, default=20.0, help='Aumento de p50 (%%) que se marca como regresión')
+    args = parser.parse_args()
+
+    directorio = Path(tempfile.mkdtemp())
+    ruta_db = directorio / 'benchmark.db'
+    if args.db:
+        shutil.copyfile(args.db, ruta_db)
+    sys.path.insert(0, str(RAIZ))
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    arranque = medir_arranque()
+    print(f"arranque: importar app.py {arranque['importacion_ms']:.1f}ms, create_app {arranque['create_app_ms']:.1f}ms")
+
+    from sqlalchemy import event
+    from app import create_app
+    from migraciones import migrar
+    from models.models import db, Producto, Paciente, Medico, Receta, Pago, Gasto
+    from generar_datos import generar
+    app = create_app()
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'db': args.db or 'generada',
+        'repeticiones': args.repeticiones,
+        'arranque': arranque,
+        'datos': {},
+        'rutas': {},
+    }
+    modelos = (Producto, Paciente, Medico, Receta, Pago, Gasto)
+    with app.app_context():
+        migrar()
+        if not args.db:
+            generar(pacientes=2000, medicos=20, productos=200, recetas=8000, pagos=20000, años=2, log=lambda _: None)
+        resultado['datos'] = {m.__tablename__: m.query.count() for m in modelos}
+
+        consultas = [0]
+
+        def contar(*_):
+            consultas[0] += 1
+        event.listen(db.engine, 'before_cursor_execute', contar)
+
+        cliente = app.test_client()
+        for nombre, metodo, url, datos in escenarios(app, db, modelos):
+            if args.rutas and args.rutas not in nombre:
+                continue
+            r = medir(cliente, consultas, metodo, url, datos, args.repeticiones)
+            resultado['rutas'][nombre] = r
+            print(f"{nombre:<35} {r['status']}  p50 {r['p50_ms']:>9.1f}ms  p95 {r['p95_ms']:>9.1f}ms  consultas {r['consultas']:>4}")
+
+    shutil.rmtree(directorio, ignore_errors=True)
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f'Resultados guardados en {args.salida}')
+    if args.comparar:
+        anterior = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+        if comparar(resultado, anterior, args.umbral):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
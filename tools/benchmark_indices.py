@@ -0,0 +1,127 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Latencia de los reportes sin y con los índices de migraciones.py, sobre una base SQLite
+# temporal cargada con datos sintéticos (tools/generar_datos.py). Uso:
+#   python tools/benchmark_indices.py --recetas 50000 --pagos 120000
+
+
+def medir(cliente, rutas, repeticiones):
+    resultados = {}
+    for ruta in rutas:
+        cliente.get(ruta).get_data()  # calentamiento
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta = cliente.get(ruta)
+            respuesta.get_data()  # consume también las respuestas en streaming
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code != 200:
+                raise SystemExit(f'{ruta} respondió {respuesta.status_code}')
+        resultados[ruta] = statistics.median(tiempos)
+    return resultados
+
+
+# Plan de SQLite (EXPLAIN QUERY PLAN) de las consultas que arman una página de recetas pendientes y
+# finalizadas de la caja, primera y segunda página. Con los índices parciales no debe aparecer
+# "USE TEMP B-TREE FOR ORDER BY": las filas salen del índice ya ordenadas.
+def planes_caja(db):
+    from sqlalchemy import event
+    from services.saldos import recetas_por_saldo
+
+    sentencias = []
+
+    def capturar(conn, cursor, sentencia, parametros, contexto, varias):
+        if 'ORDER BY receta.fecha_orden' in sentencia:
+            sentencias.append((sentencia, parametros))
+
+    event.listen(db.engine, 'before_cursor_execute', capturar)
+    try:
+        for pendientes in (True, False):
+            primera = recetas_por_saldo(pendientes=pendientes)
+            recetas_por_saldo(pendientes=pendientes, despues=primera['siguiente'])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capturar)
+
+    planes = []
+    with db.engine.connect() as conn:
+        for sentencia, parametros in sentencias:
+            filas = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sentencia}', parametros).all()
+            planes.append([fila[-1] for fila in filas])
+    return planes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara la latencia de los reportes sin y con índices.')
+    parser.add_argument('--pacientes', type=int, default=10000)
+    parser.add_argument('--recetas', type=int, default=40000)
+    parser.add_argument('--pagos', type=int, default=100000)
+    parser.add_argument('--años', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    raiz = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(raiz))
+    ruta_db = Path(tempfile.mkdtemp()) / 'benchmark.db'
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from sqlalchemy import text
+    from app import create_app
+    from models.models import db
+    from migraciones import crear_indices, migrar
+    from generar_datos import generar
+
+    hoy = date.today()
+    mes_pasado = (hoy.replace(day=1) - timedelta(days=1)).replace(day=1)
+    rutas = [
+        '/',
+        '/caja',
+        f'/reporte-diario?fecha={(hoy - timedelta(days=3)).isoformat()}',
+        f'/reporte-mensual?mes={mes_pasado.month}&año={mes_pasado.year}',
+        '/reporte-rango',
+        f'/api/comisiones?desde={hoy.year - 1}-01-01&hasta={hoy.year - 1}-12-31',
+        f'/caja/export.csv?desde={mes_pasado.isoformat()}&hasta={hoy.isoformat()}',
+    ]
+
+    app = create_app()
+    with app.app_context():
+        migrar()
+        print(f'Cargando datos en {ruta_db} ...')
+        generar(pacientes=args.pacientes, recetas=args.recetas, pagos=args.pagos, años=args.años, seed=args.seed)
+
+        indices = [i.name for t in db.metadata.sorted_tables for i in t.indexes]
+        with db.engine.begin() as conn:
+            for nombre in indices:
+                conn.execute(text(f'DROP INDEX IF EXISTS {nombre}'))
+            conn.execute(text('ANALYZE'))
+        cliente = app.test_client()
+        antes = medir(cliente, rutas, args.repeticiones)
+
+        with db.engine.begin() as conn:
+            crear_indices(conn)
+            conn.execute(text('ANALYZE'))
+        despues = medir(cliente, rutas, args.repeticiones)
+
+        planes = planes_caja(db)
+
+    ancho = max(len(r) for r in rutas)
+    print(f"\n{'Ruta':<{ancho}}  {'Sin índices':>12}  {'Con índices':>12}  {'Mejora':>7}")
+    for ruta in rutas:
+        print(f"{ruta:<{ancho}}  {antes[ruta]:>10.1f}ms  {despues[ruta]:>10.1f}ms  {antes[ruta] / despues[ruta]:>6.1f}x")
+
+    print('\nPlan de las páginas de recetas de la caja (pendientes y finalizadas, primera y segunda):')
+    for plan in planes:
+        print('  ' + '; '.join(plan))
+    if any('TEMP B-TREE' in paso for plan in planes for paso in plan):
+        raise SystemExit('Las recetas de la caja se ordenan en memoria: falta un índice de orden')
+
+
+if __name__ == '__main__':
+    main()
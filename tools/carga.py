@@ -0,0 +1,205 @@
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+# Prueba de carga del servidor de producción (serve.py) con cajeros simultáneos. Cada cajero
+# repite el circuito de mostrador: ver la caja, buscar una receta con saldo, registrar un pago
+# y buscar en el listado de recetas. Se sube la cantidad de cajeros por etapas y se informa
+# throughput, latencias y errores; "soportados" es la mayor cantidad de cajeros con p95 por
+# debajo de --slo-ms y sin errores. Uso:
+#   python tools/generar_datos.py --db grande.db
+#   python tools/carga.py --db grande.db --workers 4 --hilos 8 --cajeros 1,4,8,16,32
+# Sin --db genera una base chica temporal. Trabaja siempre sobre una copia.
+
+RAIZ = Path(__file__).resolve().parents[1]
+TERMINOS = ['gom', 'per', 'rod', 'lop', 'fer', 'gar', 'mar', 'san']
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servidor(url: str, proceso, segundos: float = 60) -> None:
+    limite = time.time() + segundos
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise SystemExit('El servidor terminó antes de responder')
+        try:
+            urllib.request.urlopen(url + '/caja', timeout=2).read()
+            return
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    raise SystemExit('El servidor no respondió a tiempo')
+
+
+class Cajero:
+    def __init__(self, base: str, rnd: random.Random):
+        self.base = base
+        self.rnd = rnd
+        # Cookie propia (mensajes flash de la sesión), sin seguir redirecciones
+        self.cliente = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedirecciones()
+        )
+
+    def pedir(self, ruta: str, datos: dict = None) -> tuple:
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        inicio = time.perf_counter()
+        try:
+            with self.cliente.open(self.base + ruta, data=cuerpo, timeout=30) as respuesta:
+                estado, contenido = respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as exc:
+            estado, contenido = exc.code, exc.read()
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            estado, contenido = 0, b''
+        return (time.perf_counter() - inicio) * 1000, estado, contenido
+
+    # Un circuito de mostrador: lista de (nombre, ms, ok)
+    def circuito(self) -> list:
+        pasos = []
+        ms, estado, _ = self.pedir('/caja')
+        pasos.append(('caja', ms, estado == 200))
+
+        termino = self.rnd.choice(TERMINOS)
+        ms, estado, contenido = self.pedir(f'/caja/recetas-pendientes?q={termino}')
+        pasos.append(('recetas_pendientes', ms, estado == 200))
+        recetas = json.loads(contenido).get('recetas', []) if estado == 200 else []
+        recetas = [r for r in recetas if r['restante'] >= 1]
+        if recetas:
+            receta = self.rnd.choice(recetas)
+            ms, estado, _ = self.pedir('/caja/pago/new', {
+                'receta_id': receta['id'], 'metodo_pago': self.rnd.choice(['Efectivo', 'Tarjeta', 'Transferencia']),
+                'monto': 1, 'descuento': 0,
+            })
+            # Un alta correcta redirige a la caja; si vuelve el formulario es un error
+            pasos.append(('pago', ms, estado == 302))
+
+        ms, estado, _ = self.pedir(f'/recetas?q={termino}')
+        pasos.append(('recetas', ms, estado == 200))
+        return pasos
+
+
+def _percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def etapa(base: str, cajeros: int, duracion: float, semilla: int) -> dict:
+    fin = time.time() + duracion
+    resultados = []
+    lock = threading.Lock()
+
+    def trabajar(indice):
+        cajero = Cajero(base, random.Random(semilla * 1000 + indice))
+        propios = []
+        while time.time() < fin:
+            propios.append(cajero.circuito())
+        with lock:
+            resultados.extend(propios)
+
+    hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(cajeros)]
+    inicio = time.time()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    transcurrido = time.time() - inicio
+
+    pasos = [paso for circuito in resultados for paso in circuito]
+    tiempos = [ms for _, ms, _ in pasos]
+    pagos = [ms for nombre, ms, ok in pasos if nombre == 'pago' and ok]
+    return {
+        'cajeros': cajeros,
+        'requests': len(pasos),
+        'req_s': round(len(pasos) / transcurrido, 1),
+        'circuitos_s': round(len(resultados) / transcurrido, 2),
+        'pagos': len(pagos),
+        'p50_ms': round(_percentil(tiempos, 50), 1),
+        'p95_ms': round(_percentil(tiempos, 95), 1),
+        'pago_p95_ms': round(_percentil(pagos, 95), 1),
+        'errores': sum(1 for _, _, ok in pasos if not ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cajeros simultáneos contra el servidor de producción.')
+    parser.add_argument('--db', help='Base SQLite de partida (se trabaja sobre una copia)')
+    parser.add_argument('--servidor', choices=['auto', 'gunicorn', 'waitress'], default='auto')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--cajeros', default='1,2,4,8,16', help='Etapas de cajeros simultáneos')
+    parser.add_argument('--duracion', type=float, default=10, help='Segundos por etapa')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p95 máximo aceptable')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directorio = Path(tempfile.mkdtemp())
+    ruta_db = directorio / 'carga.db'
+    entorno = dict(os.environ, DATABASE_URL=f'sqlite:///{ruta_db}', PYTHONUTF8='1')
+    if args.db:
+        shutil.copyfile(args.db, ruta_db)
+        # El servidor no migra al iniciar: la copia se lleva a la versión actual del esquema
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'migrar'], cwd=RAIZ, env=entorno,
+                       check=True, stdout=subprocess.DEVNULL)
+    else:
+        print('Generando base de prueba...')
+        subprocess.run([sys.executable, str(RAIZ / 'tools' / 'generar_datos.py'), '--db', str(ruta_db),
+                        '--pacientes', '2000', '--medicos', '20', '--productos', '200', '--recetas', '8000',
+                        '--pagos', '10000', '--años', '2'], check=True, env=entorno, stdout=subprocess.DEVNULL)
+
+    puerto = _puerto_libre()
+    base = f'http://127.0.0.1:{puerto}'
+    servidor = subprocess.Popen(
+        [sys.executable, str(RAIZ / 'serve.py'), '--servidor', args.servidor, '--host', '127.0.0.1',
+         '--puerto', str(puerto), '--workers', str(args.workers), '--hilos', str(args.hilos)],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    etapas = []
+    try:
+        _esperar_servidor(base, servidor)
+        print(f'Servidor {args.servidor}: {args.workers} workers x {args.hilos} hilos, {args.duracion:.0f}s por etapa')
+        print(f"{'cajeros':>8} {'req/s':>8} {'circ/s':>8} {'pagos':>7} {'p50':>8} {'p95':>8} {'pago p95':>9} {'errores':>8}")
+        for cajeros in (int(c) for c in args.cajeros.split(',')):
+            r = etapa(base, cajeros, args.duracion, args.seed)
+            etapas.append(r)
+            print(f"{r['cajeros']:>8} {r['req_s']:>8} {r['circuitos_s']:>8} {r['pagos']:>7} {r['p50_ms']:>6}ms "
+                  f"{r['p95_ms']:>6}ms {r['pago_p95_ms']:>7}ms {r['errores']:>8}")
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    soportados = max((r['cajeros'] for r in etapas if r['p95_ms'] <= args.slo_ms and not r['errores']), default=0)
+    print(f'Cajeros simultáneos soportados con p95 <= {args.slo_ms:.0f}ms y sin errores: {soportados}')
+    if args.salida:
+        Path(args.salida).write_text(json.dumps({
+            'servidor': args.servidor, 'workers': args.workers, 'hilos': args.hilos, 'duracion_s': args.duracion,
+            'slo_ms': args.slo_ms, 'etapas': etapas, 'cajeros_soportados': soportados,
+        }, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f'Resultados guardados en {args.salida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Generador de datos sintéticos con volúmenes de varios años de uso (pacientes, médicos,
+# productos, recetas, pagos, gastos y cierres diarios). Inserta con executemany de Core en
+# lotes y al final reconstruye los datos derivados (saldos de recetas, resumen diario, búsqueda
+# e inventario).
+# Con la misma semilla genera siempre los mismos datos. Uso:
+#   python tools/generar_datos.py --db grande.db
+#   python tools/generar_datos.py --db chica.db --pacientes 2000 --recetas 8000 --pagos 20000 --años 2
+
+NOMBRES = ['Ana', 'Luis', 'María', 'Carlos', 'Lucía', 'Jorge', 'Sofía', 'Martín', 'Valeria', 'Diego',
+           'Paula', 'Andrés', 'Camila', 'Javier', 'Florencia', 'Pablo', 'Julieta', 'Ramiro', 'Elena', 'Tomás']
+APELLIDOS = ['Gómez', 'Pérez', 'Rodríguez', 'López', 'Fernández', 'García', 'Martínez', 'Sánchez', 'Romero', 'Díaz',
+             'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores', 'Acosta', 'Benítez', 'Medina', 'Herrera', 'Suárez',
+             'Aguirre', 'Giménez', 'Molina', 'Castro', 'Ortiz', 'Núñez', 'Ibáñez', 'Peña', 'Muñoz', 'Rojas']
+OBRAS_SOCIALES = ['OSDE', 'Swiss Medical', 'Galeno', 'PAMI', 'IOMA', 'Medifé', None]
+TIPOS_LENTE = ['Monofocal', 'Bifocal', 'Multifocal', 'Contacto']
+METODOS = ['Efectivo', 'Tarjeta', 'Transferencia']
+CATEGORIAS_PRODUCTO = ['Armazones', 'Lentes', 'Estuches', 'Accesorios']
+CATEGORIAS_GASTO = ['Alquiler', 'Servicios', 'Sueldos', 'Insumos', 'Laboratorio', 'Impuestos']
+
+# Tamaños por defecto: una óptica mediana tras unos años de uso
+POR_DEFECTO = {'pacientes': 50000, 'medicos': 40, 'productos': 500, 'recetas': 200000, 'pagos': 500000, 'años': 5}
+
+
+def _medida(rnd) -> str:
+    esfera = rnd.choice([-1, 1]) * rnd.randint(0, 24) * 0.25
+    cilindro = -rnd.randint(0, 12) * 0.25
+    return f'{esfera:+.2f} {cilindro:+.2f} x {rnd.randint(0, 180)}'
+
+
+def _insertar(db, modelo, filas, lote: int) -> int:
+    bloque = []
+    total = 0
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= lote:
+            db.session.execute(modelo.__table__.insert(), bloque)
+            total += len(bloque)
+            bloque = []
+    if bloque:
+        db.session.execute(modelo.__table__.insert(), bloque)
+        total += len(bloque)
+    return total
+
+
+# Carga los datos en la base de la aplicación (requiere contexto de aplicación y tablas vacías).
+# Devuelve la cantidad de filas insertadas por tabla.
+def generar(pacientes: int = POR_DEFECTO['pacientes'], medicos: int = POR_DEFECTO['medicos'],
+            productos: int = POR_DEFECTO['productos'], recetas: int = POR_DEFECTO['recetas'],
+            pagos: int = POR_DEFECTO['pagos'], años: int = POR_DEFECTO['años'],
+            seed: int = 1, lote: int = 5000, hoy: date = None, log=print) -> dict:
+    from sqlalchemy import case, func, select
+    from models.models import db, Producto, Paciente, Medico, Receta, Pago, Gasto, CierreCaja, ResumenDiario
+    from services.saldos import recalcular_saldos
+    from services.resumenes import reconstruir_resumenes
+    from services.busqueda import reconstruir_busqueda
+    from services.inventario import reconstruir_inventario, registrar_stock_inicial
+    from services.cierres import completar_detalles
+
+    rnd = random.Random(seed)
+    hoy = hoy or date.today()
+    inicio = hoy - timedelta(days=años * 365)
+    dias = (hoy - inicio).days
+    cantidades = {}
+
+    def paso(nombre, modelo, filas):
+        t0 = time.perf_counter()
+        cantidades[nombre] = _insertar(db, modelo, filas, lote)
+        db.session.commit()
+        log(f'{nombre}: {cantidades[nombre]} filas en {time.perf_counter() - t0:.1f}s')
+
+    paso('medicos', Medico, (
+        {'nombre': rnd.choice(NOMBRES), 'apellido': rnd.choice(APELLIDOS), 'matricula': str(10000 + i),
+         'especialidad': 'Oftalmología', 'contacto': f'medico{i}@example.com',
+         'porcentaje_comision': rnd.choice([5, 10, 15, 20])}
+        for i in range(medicos)
+    ))
+    paso('pacientes', Paciente, (
+        {'nombre': rnd.choice(NOMBRES), 'apellido': rnd.choice(APELLIDOS),
+         'dni': str(20000000 + i) if rnd.random() < 0.95 else None,
+         'fecha_nacimiento': date(rnd.randint(1940, 2015), rnd.randint(1, 12), rnd.randint(1, 28)),
+         'obra_social': rnd.choice(OBRAS_SOCIALES), 'contacto': f'paciente{i}@example.com'}
+        for i in range(pacientes)
+    ))
+    paso('productos', Producto, (
+        {'codigo': f'P{i:05d}', 'nombre': f'{categoria} {i}', 'descripcion': None, 'categoria': categoria,
+         'precio_unitario': rnd.randint(5, 150) * 1000, 'cantidad': rnd.randint(0, 30), 'stock_minimo': rnd.randint(1, 5)}
+        for i, categoria in ((i, rnd.choice(CATEGORIAS_PRODUCTO)) for i in range(productos))
+    ))
+    with db.engine.begin() as conn:
+        reconstruir_inventario(conn)
+        registrar_stock_inicial(conn)
+
+    # Fecha y total de cada receta, para que los pagos caigan después de la receta y no la excedan
+    fechas_receta = [inicio + timedelta(days=rnd.randint(0, dias)) for _ in range(recetas)]
+    totales_receta = [rnd.randint(30, 600) * 1000 for _ in range(recetas)]
+    paso('recetas', Receta, (
+        {'paciente_id': rnd.randint(1, pacientes), 'medico_id': rnd.randint(1, medicos) if rnd.random() < 0.8 else None,
+         'fecha': fechas_receta[i], 'tipo_lente': rnd.choice(TIPOS_LENTE), 'medida_od': _medida(rnd),
+         'medida_os': _medida(rnd), 'observaciones': None, 'total': totales_receta[i],
+         'armazon_id': rnd.randint(1, productos) if productos and rnd.random() < 0.7 else None}
+        for i in range(recetas)
+    ))
+
+    def fila_pago():
+        i = rnd.randrange(recetas)
+        return {'receta_id': i + 1, 'metodo_pago': rnd.choice(METODOS),
+                'monto': round(totales_receta[i] * rnd.uniform(0.2, 0.6), -2),
+                'fecha': min(hoy, fechas_receta[i] + timedelta(days=rnd.choice([0, 0, 1, 7, 15, 30, 45]))),
+                'descuento': rnd.choice([0, 0, 0, 0, 5, 10])}
+    paso('pagos', Pago, (fila_pago() for _ in range(pagos)))
+    paso('gastos', Gasto, (
+        {'fecha': inicio + timedelta(days=d), 'categoria': categoria, 'descripcion': f'{categoria} {d}',
+         'monto': rnd.randint(1, 80) * 1000}
+        for d in range(dias + 1) for categoria in rnd.sample(CATEGORIAS_GASTO, rnd.randint(0, 3))
+    ))
+
+    t0 = time.perf_counter()
+    recalcular_saldos()
+    cantidades['resumen_diario'] = reconstruir_resumenes()
+    with db.engine.begin() as conn:
+        reconstruir_busqueda(conn)
+    log(f'saldos, resumen diario e índices de búsqueda reconstruidos en {time.perf_counter() - t0:.1f}s')
+
+    # Un cierre por día con pagos, con los totales netos del resumen diario; el de hoy queda abierto
+    def por_metodo(metodo):
+        return func.sum(case((ResumenDiario.metodo_pago == metodo, ResumenDiario.ingresos_netos), else_=0))
+    consulta = (
+        select(ResumenDiario.fecha, por_metodo('Efectivo'), por_metodo('Tarjeta'), por_metodo('Transferencia'),
+               func.sum(ResumenDiario.ingresos_netos), ResumenDiario.fecha == hoy)
+        .where(ResumenDiario.metodo_pago != '')
+        .group_by(ResumenDiario.fecha)
+    )
+    columnas = ['fecha', 'total_efectivo', 'total_tarjeta', 'total_transferencia', 'total_general', 'estado_abierta']
+    cantidades['cierres'] = db.session.execute(CierreCaja.__table__.insert().from_select(columnas, consulta)).rowcount
+    cantidades['cierres_detalle'] = completar_detalles(db.session.connection())
+    db.session.commit()
+    log(f"cierres: {cantidades['cierres']} filas")
+    return cantidades
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera una base con datos sintéticos de varios años.')
+    parser.add_argument('--db', required=True, help='Archivo SQLite a crear (no debe existir)')
+    for nombre, valor in POR_DEFECTO.items():
+        parser.add_argument(f'--{nombre}', type=int, default=valor)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--lote', type=int, default=5000, help='Filas por executemany')
+    args = parser.parse_args()
+
+    ruta_db = Path(args.db).resolve()
+    if ruta_db.exists():
+        raise SystemExit(f'{ruta_db} ya existe; usar un archivo nuevo')
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from app import create_app
+    from migraciones import migrar
+    app = create_app()
+    with app.app_context():
+        migrar()
+        generar(args.pacientes, args.medicos, args.productos, args.recetas, args.pagos, args.años,
+                seed=args.seed, lote=args.lote)
+    print(f'Base generada en {ruta_db}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Prueba de carga concurrente de la venta de armazones: varios procesos, cada uno con varios
+# hilos, crean recetas por POST /recetas/new con el mismo armazón hasta agotar el stock.
+# Verifica que el stock nunca quede negativo y que coincidan las ventas con las recetas y el
+# libro de movimientos, e informa el throughput bajo contención. Uso:
+#   python tools/stress_stock.py
+#   python tools/stress_stock.py --procesos 4 --hilos 8 --requests 50 --stock 100
+# Sin --db trabaja sobre una base temporal; con --db, sobre una copia de esa base.
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+
+def _cargar_app(ruta_db: Path):
+    sys.path.insert(0, str(RAIZ))
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+    from app import create_app
+    return create_app()
+
+
+# Crea el paciente y el armazón de la prueba; devuelve sus ids
+def _preparar(ruta_db: Path, stock: int) -> tuple:
+    app = _cargar_app(ruta_db)
+    from models.models import db, Paciente, Producto
+    from services.inventario import mover_stock
+    from migraciones import migrar
+    with app.app_context():
+        migrar()
+        paciente = Paciente(nombre='Prueba', apellido='Concurrencia')
+        armazon = Producto(codigo=f'STRESS{int(time.time())}', nombre='Armazón de prueba', categoria='Armazones',
+                           precio_unitario=1000, cantidad=0, stock_minimo=0)
+        db.session.add_all([paciente, armazon])
+        mover_stock(armazon, stock, 'alta')
+        db.session.commit()
+        return paciente.id, armazon.id
+
+
+# Un proceso: `hilos` hilos que hacen `requests` altas cada uno, todos a partir de `inicio`
+def _proceso(parametros: tuple) -> list:
+    ruta_db, paciente_id, armazon_id, hilos, requests, inicio = parametros
+    app = _cargar_app(ruta_db)
+    resultados = []
+    lock = threading.Lock()
+    datos = {'paciente_id': paciente_id, 'armazon_id': armazon_id, 'total': 1000, 'tipo_lente': 'Monofocal'}
+
+    def trabajar():
+        cliente = app.test_client()
+        propios = []
+        while time.time() < inicio:
+            time.sleep(0.001)
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            respuesta = cliente.post('/recetas/new', data=datos)
+            ms = (time.perf_counter() - t0) * 1000
+            cuerpo = respuesta.get_data(as_text=True)
+            if respuesta.status_code == 302:
+                propios.append((ms, 'venta'))
+            elif 'Sin stock disponible' in cuerpo:
+                propios.append((ms, 'sin_stock'))
+            else:
+                propios.append((ms, 'error'))
+        with lock:
+            resultados.extend(propios)
+
+    trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    return resultados
+
+
+def _verificar(ruta_db: Path, armazon_id: int, stock: int, ventas: int) -> list:
+    app = _cargar_app(ruta_db)
+    from sqlalchemy import func
+    from models.models import db, Producto, Receta, MovimientoStock
+    with app.app_context():
+        armazon = db.session.get(Producto, armazon_id)
+        recetas = Receta.query.filter_by(armazon_id=armazon_id).count()
+        libro = db.session.query(func.coalesce(func.sum(MovimientoStock.cantidad), 0)).filter_by(producto_id=armazon_id).scalar()
+        problemas = []
+        if armazon.cantidad < 0:
+            problemas.append(f'stock negativo: {armazon.cantidad}')
+        if armazon.cantidad != stock - ventas:
+            problemas.append(f'stock final {armazon.cantidad}, esperado {stock - ventas} ({ventas} ventas)')
+        if recetas != ventas:
+            problemas.append(f'{recetas} recetas con el armazón, {ventas} ventas informadas')
+        if libro != armazon.cantidad:
+            problemas.append(f'libro de movimientos suma {libro}, stock {armazon.cantidad}')
+        return armazon.cantidad, problemas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ventas concurrentes de un mismo armazón (stock nunca negativo).')
+    parser.add_argument('--db', help='Base SQLite de partida (se trabaja sobre una copia)')
+    parser.add_argument('--procesos', type=int, default=2)
+    parser.add_argument('--hilos', type=int, default=4, help='Hilos por proceso')
+    parser.add_argument('--requests', type=int, default=25, help='Altas por hilo')
+    parser.add_argument('--stock', type=int, default=50, help='Stock inicial del armazón')
+    args = parser.parse_args()
+
+    directorio = Path(tempfile.mkdtemp())
+    ruta_db = directorio / 'stress.db'
+    if args.db:
+        shutil.copyfile(args.db, ruta_db)
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(1) as pool:
+        paciente_id, armazon_id = pool.apply(_preparar, (ruta_db, args.stock))
+
+    total = args.procesos * args.hilos * args.requests
+    print(f'{args.procesos} procesos x {args.hilos} hilos x {args.requests} requests = {total} altas, stock {args.stock}')
+    inicio = time.time() + 3  # margen para que todos los procesos importen la aplicación
+    with contexto.Pool(args.procesos) as pool:
+        partes = pool.map(_proceso, [(ruta_db, paciente_id, armazon_id, args.hilos, args.requests, inicio)] * args.procesos)
+    duracion = time.time() - inicio
+    resultados = [r for parte in partes for r in parte]
+
+    cuenta = {clave: sum(1 for _, r in resultados if r == clave) for clave in ('venta', 'sin_stock', 'error')}
+    tiempos = sorted(ms for ms, _ in resultados)
+    print(f"ventas {cuenta['venta']}  sin stock {cuenta['sin_stock']}  errores {cuenta['error']}")
+    print(f'duración {duracion:.2f}s  throughput {len(resultados) / duracion:.1f} req/s  '
+          f"ventas {cuenta['venta'] / duracion:.1f}/s")
+    print(f'latencia p50 {statistics.median(tiempos):.1f}ms  p95 {tiempos[int(len(tiempos) * 0.95) - 1]:.1f}ms  '
+          f'máx {tiempos[-1]:.1f}ms')
+
+    with contexto.Pool(1) as pool:
+        stock_final, problemas = pool.apply(_verificar, (ruta_db, armazon_id, args.stock, cuenta['venta']))
+    shutil.rmtree(directorio, ignore_errors=True)
+    print(f'stock final {stock_final}')
+    if problemas:
+        for problema in problemas:
+            print(f'ERROR: {problema}')
+        sys.exit(1)
+    print('OK: el stock nunca quedó negativo y coincide con las recetas y el libro de movimientos')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+# Punto de entrada WSGI para servidores de producción:
+#   gunicorn --preload -w 4 --threads 8 -b 0.0.0.0:5000 wsgi:application
+#   waitress-serve --threads 8 --port 5000 wsgi:application
+# o directamente `python serve.py`, que toma workers e hilos de la configuración.
+# El esquema se prepara antes, con `flask --app app migrar`.
+from app import create_app
+
+application = create_app()